@@ -1,5 +1,8 @@
 import os, sys, time
 
+# Python 3 has no implicit relative imports, the modules next to this one are
+# found as top level modules instead.
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/modules/')
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/modules/qualisys_python_sdk')
 
@@ -15,13 +18,48 @@ import maya.api.OpenMayaAnim as omanim
 import maya.cmds as cmds
 from maya.app.general.mayaMixin import MayaQWidgetDockableMixin
 
-from qtm.packet import QRTComponentType
+from qtm.packet import QRTComponentType, QRTPacket
+from qtm.instrumentation import INSTRUMENTATION, clock
+from qtm.telemetry import StreamTelemetry
 from qqtmrt import QQtmRt
 from mayautil import MayaUtil
 from mayaui import QtmConnectShelf
-from markerstreamer import MarkerStreamer
+from componentlist import ComponentListModel, replace_list_widget
+from markerstreamer import MarkerStreamer, GAP_POLICIES
 from skeletonstreamer import SkeletonStreamer
 from rigidbodystreamer import RigidBodyStreamer
+from imagestreamer import ImageStreamer
+
+# Resampling to the scene rate, prediction, filters and the receiver node
+# need numpy.
+try:
+    from playback import ScenePlayback, scene_rate
+    from prediction import PosePrediction, MODELS as PREDICTION_MODELS
+    from filtering import StreamFilters
+    from receivernode import ReceiverDriver
+    from takeplayer import TakePlayer
+    from gazestreamer import GazeStreamer
+    from forcestreamer import ForceStreamer
+    from qtm.filters import FILTERS
+    from qtm.takes import TakeWriter
+except ImportError:
+    ScenePlayback = None
+    PosePrediction = None
+    StreamFilters = None
+    ReceiverDriver = None
+    TakePlayer = None
+    GazeStreamer = None
+    ForceStreamer = None
+    TakeWriter = None
+    PREDICTION_MODELS = {}
+    FILTERS = {}
+
+# Decoding in a separate process needs numpy and shared memory, which came
+# with Python 3.8.
+try:
+    from decodeworker import DecodeWorker
+except ImportError:
+    DecodeWorker = None
 
 MAYA = False
 
@@ -68,11 +106,14 @@ def start():
     if not hasattr(parent, '_qtmConnect'):
         cmds.warning('Not connected to QTM.')
     else:
-        if not parent._qtmConnect._qtm.connected:
-            parent._qtmConnect.connect_qtm()
-
         if parent._qtmConnect._qtm.connected:
             parent._qtmConnect.stream()
+        else:
+            # Streaming starts once the connection has been established.
+            parent._qtmConnect._stream_on_connect = True
+
+            if not parent._qtmConnect._qtm.connecting:
+                parent._qtmConnect.connect_qtm()
     
 def stop():
     parent = _get_maya_main_window()
@@ -84,6 +125,271 @@ def stop():
 
         QtCore.QTimer.singleShot(750, set_start_button)
 
+def set_instrumentation(enabled):
+    """
+    Turn recording of per-frame timing statistics on or off. When the dialog
+    is open the statistics are also shown at its bottom.
+    """
+    parent = _get_maya_main_window()
+
+    if hasattr(parent, '_qtmConnect'):
+        parent._qtmConnect.set_instrumentation(enabled)
+    else:
+        INSTRUMENTATION.enabled = enabled
+
+def instrumentation_stats():
+    """
+    Returns frame rate, QTM timestamp to apply latency and latency summaries
+    per stage (read, receive, parse, decode, markers, skeletons, rigid bodies)
+    in ms.
+    """
+    return INSTRUMENTATION.snapshot()
+
+def set_scene_playback(enabled):
+    """
+    Apply frames at the scene frame rate, interpolated between the buffered
+    QTM frames, instead of applying every frame as it arrives. Needs numpy.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    elif ScenePlayback is None:
+        cmds.warning('Resampling to the scene rate requires numpy.')
+    else:
+        parent._qtmConnect._playback_button.setChecked(enabled)
+
+def set_prediction(enabled, latency_ms=None, model=None):
+    """
+    Extrapolate rigid bodies and skeletons latency_ms ahead of the received
+    frames to compensate for the delay to the viewport. model is one of
+    'Constant velocity' and 'Kalman'. Needs numpy.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    elif PosePrediction is None:
+        cmds.warning('Prediction requires numpy.')
+    else:
+        dialog = parent._qtmConnect
+
+        if latency_ms is not None:
+            dialog._latency_field.setValue(latency_ms)
+
+        if model is not None:
+            dialog._prediction_model.setCurrentText(model)
+
+        dialog._prediction_button.setChecked(enabled)
+
+def set_receiver_node(enabled):
+    """
+    Drive the streamed markers, rigid bodies and skeletons through a
+    qtmReceiver node, which is created if there is none, instead of writing
+    their transforms from Python. Other rigs can connect to its positions,
+    matrices, translations and rotations outputs. Needs numpy.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    elif ReceiverDriver is None:
+        cmds.warning('The receiver node requires numpy.')
+    else:
+        parent._qtmConnect._receiver_button.setChecked(enabled)
+
+def set_decode_process(enabled):
+    """
+    Receive and decode frames in a separate Python process, which hands the
+    latest frame over through shared memory, so that decoding does not
+    compete with Maya for the GIL. Takes effect when streaming starts. Needs
+    numpy and a Maya with Python 3.8 or later (Maya 2022 and later); in
+    Maya with Python 2 the option stays disabled.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    elif DecodeWorker is None:
+        cmds.warning('Decoding in a separate process requires numpy and a Maya with Python 3.8 or later.')
+    else:
+        parent._qtmConnect._process_button.setChecked(enabled)
+
+def set_gaze_vectors(enabled):
+    """
+    Stream the gaze vectors of eye trackers to a transform per tracker, at
+    the eye position and aimed along the gaze with its X axis. Takes effect
+    when streaming starts. Needs numpy.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    elif GazeStreamer is None:
+        cmds.warning('Gaze vectors require numpy.')
+    else:
+        parent._qtmConnect._gaze_button.setChecked(enabled)
+
+def set_force_plates(enabled):
+    """
+    Stream the force plates to an arrow per plate, from the center of
+    pressure along the force. Samples are averaged down to the scene rate.
+    Takes effect when streaming starts. Needs numpy.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    elif ForceStreamer is None:
+        cmds.warning('Force plates require numpy.')
+    else:
+        parent._qtmConnect._force_button.setChecked(enabled)
+
+def set_camera_images(enabled):
+    """
+    Show the camera images of QTM on an image plane per camera. Only the
+    latest image of every camera is shown. Takes effect when streaming
+    starts.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    else:
+        parent._qtmConnect._images_button.setChecked(enabled)
+
+def start_recording(path):
+    """
+    Record the streamed frames to a take in the directory path, stored as
+    chunked columns that can be memory mapped. Frames are recorded as they
+    arrive until stop_recording is called or streaming stops. Needs numpy.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    elif TakeWriter is None:
+        cmds.warning('Recording requires numpy.')
+    else:
+        parent._qtmConnect.start_recording(path)
+
+def stop_recording():
+    """
+    Stop recording, returns the number of frames recorded.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        return 0
+
+    return parent._qtmConnect.stop_recording()
+
+def open_take(path):
+    """
+    Show a recorded take on the markers, rigid bodies and skeletons of the
+    dialog at the current time of the scene, so that it can be scrubbed with
+    the time slider. The playback range is set to the length of the take.
+    Needs numpy.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    elif TakePlayer is None:
+        cmds.warning('Takes require numpy.')
+    else:
+        parent._qtmConnect.open_take(path)
+
+def close_take():
+    parent = _get_maya_main_window()
+
+    if hasattr(parent, '_qtmConnect'):
+        parent._qtmConnect.close_take()
+
+def bake_take():
+    """
+    Key every frame of the open take on the markers, rigid bodies and joints
+    at its scene time, then close the take.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    else:
+        parent._qtmConnect.bake_take()
+
+def set_timecode_lock(enabled):
+    """
+    Stream the timecode of QTM along with the frames, so that recorded takes
+    are placed at their timecode through the production start time code of
+    the scene (Windows > Settings/Preferences > Preferences > Time Slider).
+    SMPTE timecodes are taken to run at the scene rate. Needs numpy.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    elif TakeWriter is None:
+        cmds.warning('Timecode requires numpy.')
+    else:
+        parent._qtmConnect._timecode_lock = enabled
+
+def set_gap_policy(policy):
+    """
+    Set what happens to occluded markers: 'Hold' keeps them where they were
+    last seen, 'Hide' hides them and 'Interpolate on bake' holds them. Baking
+    a take keys the held positions, the visibility or positions interpolated
+    over the gaps accordingly. Needs numpy.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+    else:
+        parent._qtmConnect._gap_policy_box.setCurrentIndex(GAP_POLICIES.index(policy))
+
+def write_stats():
+    """
+    Returns per streamer how many transforms were written and how many writes
+    were skipped because the marker, body or segment did not move. None for
+    streamers that write every frame, which is the case without numpy.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        return None
+
+    return parent._qtmConnect._write_stats()
+
+def set_write_epsilon(epsilon):
+    """
+    Set how far, in Maya units and quaternion components, a marker, body or
+    segment has to move before its transform is written again.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('QTM Connect is not open.')
+        return
+
+    dialog = parent._qtmConnect
+
+    for streamer in (dialog._marker_streamer, dialog._skeleton_streamer, dialog._rigid_body_streamer):
+        if streamer._write_cache is not None:
+            streamer._write_cache.epsilon = epsilon
+
+def stream_health():
+    """
+    Returns loss, jitter, effective and capture rate of the stream together
+    with the latest drop and out of sync rates reported by QTM.
+    """
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        return None
+
+    return parent._qtmConnect._telemetry.snapshot()
+
 def set_start_button():
     parent = _get_maya_main_window()
 
@@ -95,7 +401,7 @@ def _get_maya_main_window():
     if ptr is None:
         raise RuntimeError('No Maya window found.')
 
-    return wrapInstance(long(ptr), QtWidgets.QWidget)
+    return wrapInstance(int(ptr), QtWidgets.QWidget)
 
 def show_gui(restore=False):
     parent = _get_maya_main_window()
@@ -115,7 +421,7 @@ def show_gui(restore=False):
     if restore == True:
         # Add custom mixin widget to the workspace control.
         mixinPtr = omui.MQtUtil.findControl(parent.customMixinWindow.objectName())
-        omui.MQtUtil.addWidgetToMayaLayout(long(mixinPtr), long(restoredControl))
+        omui.MQtUtil.addWidgetToMayaLayout(int(mixinPtr), int(restoredControl))
     else:
         # Create a workspace control for the mixin widget by passing all the
         # needed parameters. See workspaceControl command documentation for all
@@ -138,17 +444,116 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
 
         layout.addWidget(self.widget)
 
+        self._instrumentation_button = QtWidgets.QCheckBox('Show timing')
+        self._stats_label = QtWidgets.QLabel()
+        self._stats_label.setWordWrap(True)
+        self._stats_label.setVisible(False)
+        self._stats_timer = QtCore.QTimer(self)
+        self._stats_timer.setInterval(500)
+        self._stats_timer.timeout.connect(self._update_stats)
+        self._instrumentation_button.toggled.connect(self.set_instrumentation)
+
+        self._playback_button = QtWidgets.QCheckBox('Resample to scene rate')
+        self._playback_button.setEnabled(ScenePlayback is not None)
+        self._playback_button.toggled.connect(self.set_scene_playback)
+
+        if ScenePlayback is None:
+            self._playback_button.setToolTip('Requires numpy.')
+
+        self._receiver_button = QtWidgets.QCheckBox('Drive receiver node')
+        self._receiver_button.setEnabled(ReceiverDriver is not None)
+        self._receiver_button.setToolTip('Connect the streamed transforms to a qtmReceiver node.' if ReceiverDriver is not None else 'Requires numpy.')
+
+        self._process_button = QtWidgets.QCheckBox('Decode in separate process')
+        self._process_button.setEnabled(DecodeWorker is not None)
+        self._process_button.setToolTip('Takes effect when streaming starts, without resampling and prediction.' if DecodeWorker is not None else 'Requires numpy and a Maya with Python 3.8 or later (Maya 2022 and later).')
+
+        self._gaze_button = QtWidgets.QCheckBox('Gaze vectors')
+        self._gaze_button.setEnabled(GazeStreamer is not None)
+        self._gaze_button.setToolTip('Aim a transform per eye tracker, takes effect when streaming starts.' if GazeStreamer is not None else 'Requires numpy.')
+
+        self._force_button = QtWidgets.QCheckBox('Force plates')
+        self._force_button.setEnabled(ForceStreamer is not None)
+        self._force_button.setToolTip('Show an arrow per force plate, takes effect when streaming starts.' if ForceStreamer is not None else 'Requires numpy.')
+
+        self._images_button = QtWidgets.QCheckBox('Camera images')
+        self._images_button.setToolTip('Show the camera images on an image plane per camera, takes effect when streaming starts.')
+
+        self._prediction_button = QtWidgets.QCheckBox('Predict ahead')
+        self._latency_field = QtWidgets.QSpinBox()
+        self._latency_field.setRange(0, 200)
+        self._latency_field.setSuffix(' ms')
+        self._latency_field.setValue(30)
+        self._prediction_model = QtWidgets.QComboBox()
+        self._prediction_model.addItems(list(PREDICTION_MODELS))
+        prediction_layout = QtWidgets.QHBoxLayout()
+
+        for widget in (self._prediction_button, self._latency_field, self._prediction_model):
+            widget.setEnabled(PosePrediction is not None)
+            prediction_layout.addWidget(widget)
+
+        if PosePrediction is None:
+            self._prediction_button.setToolTip('Requires numpy.')
+
+        layout.addWidget(self._playback_button)
+        layout.addLayout(prediction_layout)
+        layout.addWidget(self._receiver_button)
+        layout.addWidget(self._process_button)
+        layout.addWidget(self._gaze_button)
+        layout.addWidget(self._force_button)
+        layout.addWidget(self._images_button)
+        layout.addWidget(self._instrumentation_button)
+        layout.addWidget(self._stats_label)
+
         self.marker_groups = None
 
         if hasattr(parent, '_qtmConnect'):
             parent._qtmConnect.stop_stream()
             parent._qtmConnect._qtm.disconnect()
 
+        self.widget.skeletonList  = replace_list_widget(self.widget.skeletonList)
+        self.widget.markerList    = replace_list_widget(self.widget.markerList)
+        self.widget.rigidBodyList = replace_list_widget(self.widget.rigidBodyList)
+
         self._qtm                 = QQtmRt()
         self._skeleton_streamer   = SkeletonStreamer(self._qtm, self.widget.skeletonList)
         self._marker_streamer     = MarkerStreamer(self._qtm, self.widget.markerList, self.widget.groupNameField)
         self._rigid_body_streamer = RigidBodyStreamer(self._qtm, self.widget.rigidBodyList)
         self._shelf               = QtmConnectShelf()
+        self._telemetry           = StreamTelemetry(on_warning=self._telemetry_warning)
+        self._playback            = None
+        self._prediction          = None
+        self._filters             = None
+        self._receiver            = None
+        self._worker              = None
+        self._recorder            = None
+        self._timecode_lock       = False
+        self._take_player         = None
+        self._gaze_streamer       = GazeStreamer() if GazeStreamer is not None else None
+        self._force_streamer      = ForceStreamer() if ForceStreamer is not None else None
+        self._image_streamer      = ImageStreamer(parent=self)
+
+        if ScenePlayback is not None:
+            self._filters = StreamFilters(self._marker_streamer, self._rigid_body_streamer)
+            self._playback = ScenePlayback(self._marker_streamer, self._skeleton_streamer, self._rigid_body_streamer, self._filters, self)
+            self._prediction = PosePrediction(self._skeleton_streamer, self._rigid_body_streamer, self._filters)
+            self._receiver = ReceiverDriver(self._marker_streamer, self._skeleton_streamer, self._rigid_body_streamer, self._filters)
+            self._receiver_button.toggled.connect(self._update_receiver)
+            self._prediction_button.toggled.connect(self._prediction_changed)
+            self._latency_field.valueChanged.connect(self._prediction_changed)
+            self._prediction_model.currentIndexChanged.connect(self._prediction_changed)
+
+        if DecodeWorker is not None:
+            self._worker = DecodeWorker(
+                self._marker_streamer,
+                self._skeleton_streamer,
+                self._rigid_body_streamer,
+                self._filters,
+                self._receiver,
+                on_frame=self._worker_frame,
+                on_exit=self._worker_exited,
+                parent=self,
+            )
 
         self._shelf.toggle_stream_button('start')
 
@@ -158,6 +563,9 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         parent._qtmConnect = self
 
         self._qtm.connectedChanged.connect(self._connected_changed)
+        self._qtm.settingsChanged.connect(self._settings_changed)
+        self._qtm.connectFailed.connect(self._connect_failed)
+        self._qtm.errorOccurred.connect(self._error_occurred)
         self._qtm.streamingChanged.connect(self._streaming_changed)
         self._qtm.packetReceived.connect(self._packet_received)
         self._qtm.eventReceived.connect(self._event_received)
@@ -180,6 +588,18 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         self.widget.rigidBodyComponentButton.toggled.connect(self.component_changed)
         self.widget.tPoseButton.clicked.connect(self.toggle_t_pose)
 
+        self._marker_filter_box = self._add_filter_box(self.widget.markerComponentLayout, self._marker_filter_chosen)
+        self._rigid_body_filter_box = self._add_filter_box(self.widget.rigidBodyComponentLayout, self._rigid_body_filter_chosen)
+        self._gap_policy_box = QtWidgets.QComboBox()
+        self._gap_policy_box.addItems(GAP_POLICIES)
+        self._gap_policy_box.setToolTip('What to do with occluded markers.' if self._filters is not None else 'Requires numpy.')
+        self._gap_policy_box.setEnabled(self._filters is not None)
+        self._gap_policy_box.currentIndexChanged.connect(self._gap_policy_changed)
+        self.widget.markerComponentLayout.addWidget(self._gap_policy_box)
+        self.widget.groupButton.clicked.connect(self._marker_groups_changed)
+        self.widget.markerList.selectionModel().selectionChanged.connect(self._marker_selection_changed)
+        self.widget.rigidBodyList.selectionModel().selectionChanged.connect(self._rigid_body_selection_changed)
+
         self.widget.streamingComponentsLayout.setContentsMargins(0, 11, 0, 0)
         self.widget.connectionContainer.setFixedHeight(88)
         self.widget.skeletonComponentLayout.setContentsMargins(0, 11, 0, 0)
@@ -195,6 +615,7 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         self.widget.hostField.setText(hostname)
         self._host = self.widget.hostField.text()
         self.is_streaming = False
+        self._stream_on_connect = False
 
         self._connected_changed(self._qtm.connected)
         self.component_changed()
@@ -208,6 +629,10 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
             self._qtm.stop_stream()
             self._shelf.toggle_stream_button('start')
 
+        self._create_streamers()
+        self._update_receiver()
+
+    def _create_streamers(self):
         if self.widget.skeletonComponentButton.isChecked():
             self._skeleton_streamer.create()
 
@@ -227,15 +652,234 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         self._qtm.disconnect()
 
     def _packet_received(self, packet):
-        if not isinstance(packet, basestring):
+        # Errors from QTM arrive as text.
+        if isinstance(packet, QRTPacket):
+            if self._recorder is not None:
+                self._recorder.append_packet(packet)
+
+            if self._gaze_streamer is not None and QRTComponentType.ComponentGazeVector in packet.components:
+                self._apply('gaze vectors', self._gaze_streamer._packet_received, packet)
+
+            if self._force_streamer is not None and (
+                QRTComponentType.ComponentForce in packet.components
+                or QRTComponentType.ComponentForceSingle in packet.components
+            ):
+                self._apply('force plates', self._force_streamer._packet_received, packet)
+
+            if QRTComponentType.ComponentImage in packet.components:
+                self._apply('images', self._image_streamer._packet_received, packet)
+
+            if self._receiver is not None and self._receiver.active:
+                self._apply('receiver', self._receiver.apply, packet)
+
+                if INSTRUMENTATION.enabled:
+                    INSTRUMENTATION.frame_applied(packet.timestamp)
+
+                self._update_telemetry(packet)
+                return
+
+            if self._playback is not None and self._playback.active:
+                self._playback.push(packet)
+                self._update_telemetry(packet)
+                return
+
+            predict = self._prediction is not None and self._prediction.enabled
+
+            filter_markers = self._filters is not None and self._filters.markers_active
+            filter_bodies = self._filters is not None and self._filters.bodies_active
+
             if QRTComponentType.Component3d in packet.components:
-                self._marker_streamer._packet_received(packet)
+                if filter_markers:
+                    self._apply('markers', self._filters.apply_3d, packet)
+                else:
+                    self._apply('markers', self._marker_streamer._packet_received, packet)
 
             if QRTComponentType.ComponentSkeleton in packet.components:
-                self._skeleton_streamer._packet_received(packet)
+                if predict:
+                    self._apply('skeletons', self._prediction.apply_skeletons, packet)
+                else:
+                    self._apply('skeletons', self._skeleton_streamer._packet_received, packet)
 
             if QRTComponentType.Component6d in packet.components:
-                self._rigid_body_streamer._packet_received(packet)
+                if predict:
+                    self._apply('rigid bodies', self._prediction.apply_6d, packet)
+                elif filter_bodies:
+                    self._apply('rigid bodies', self._filters.apply_6d, packet)
+                else:
+                    self._apply('rigid bodies', self._rigid_body_streamer._packet_received, packet)
+
+            if INSTRUMENTATION.enabled:
+                INSTRUMENTATION.frame_applied(packet.timestamp)
+
+            self._update_telemetry(packet)
+
+    def _update_telemetry(self, packet):
+        drop_rate = 0
+        out_of_sync_rate = 0
+
+        for streamer, component in (
+            (self._marker_streamer, QRTComponentType.Component3d),
+            (self._rigid_body_streamer, QRTComponentType.Component6d),
+        ):
+            if component in packet.components and streamer.component_info is not None:
+                drop_rate = max(drop_rate, streamer.component_info.drop_rate)
+                out_of_sync_rate = max(out_of_sync_rate, streamer.component_info.out_of_sync_rate)
+
+        self._telemetry.update(packet.framenumber, drop_rate, out_of_sync_rate)
+
+    def start_recording(self, path):
+        self.stop_recording()
+
+        components = ['3d', '6d', 'skeleton']
+
+        if self._timecode_lock:
+            components.append('timecode')
+
+        if self._worker is not None and self._worker.active:
+            cmds.warning('Recording is not available when decoding in a separate process.')
+        elif self._qtm.settings_xml is None:
+            cmds.warning('Not connected to QTM.')
+        else:
+            self._recorder = TakeWriter(path, self._qtm.settings_xml, components, smpte_rate=scene_rate())
+
+    def stop_recording(self):
+        if self._recorder is None:
+            return 0
+
+        count = self._recorder.count
+        self._recorder.close()
+        self._recorder = None
+
+        return count
+
+    def open_take(self, path):
+        self.close_take()
+
+        if self.is_streaming:
+            self.stop_stream()
+
+        self._take_player = TakePlayer(path, self._marker_streamer, self._skeleton_streamer, self._rigid_body_streamer)
+        self._take_player.start()
+
+    def close_take(self):
+        if self._take_player is not None:
+            self._take_player.stop()
+            self._take_player = None
+
+    def bake_take(self):
+        if self._take_player is None:
+            cmds.warning('No take is open.')
+            return
+
+        self._take_player.bake()
+        self.close_take()
+
+    def _worker_frame(self, framenumber, timestamp, drop_rate, out_of_sync_rate):
+        if INSTRUMENTATION.enabled:
+            INSTRUMENTATION.frame_applied(timestamp)
+
+        self._telemetry.update(framenumber, drop_rate, out_of_sync_rate)
+
+    def _worker_exited(self, message):
+        cmds.warning('QTM Connect: ' + message)
+        self.stop_stream()
+
+    def _telemetry_warning(self, message):
+        cmds.warning('QTM stream: ' + message)
+
+    # Decoding by the packet getters is recorded as a stage of its own and
+    # left out of the streamer stages.
+    def _apply(self, stage, function, packet):
+        if INSTRUMENTATION.enabled:
+            decoded = INSTRUMENTATION.total('decode')
+            start = clock()
+            function(packet)
+            elapsed = clock() - start
+            INSTRUMENTATION.record(stage, elapsed - (INSTRUMENTATION.total('decode') - decoded))
+        else:
+            function(packet)
+
+    def set_scene_playback(self, enabled):
+        self._update_playback(self._qtm.streaming)
+
+    def _update_playback(self, streaming):
+        if self._playback is None:
+            return
+
+        # The decoding process hands over the latest frame only.
+        worker = self._worker is not None and self._worker.active
+
+        if streaming and self._playback_button.isChecked() and not worker:
+            self._playback.start()
+        else:
+            self._playback.stop()
+
+    # The node is connected to the transforms that exist, so it is attached
+    # again whenever the streamers have created theirs.
+    def _update_receiver(self, *args):
+        if self._receiver is None:
+            return
+
+        if self._receiver_button.isChecked() and self._qtm.connected:
+            self._receiver.attach()
+        else:
+            self._receiver.detach()
+
+    def _prediction_changed(self, *args):
+        model = self._prediction_model.currentText()
+
+        if model != self._prediction.model:
+            self._prediction.set_model(model)
+        else:
+            self._prediction.reset()
+
+        self._prediction.latency = self._latency_field.value() / 1000.0
+        self._prediction.enabled = self._prediction_button.isChecked()
+
+    def set_instrumentation(self, enabled):
+        INSTRUMENTATION.reset()
+        INSTRUMENTATION.enabled = enabled
+
+        self._instrumentation_button.setChecked(enabled)
+        self._stats_label.setVisible(enabled)
+        self._stats_label.setText('Waiting for frames...')
+
+        if enabled:
+            self._stats_timer.start()
+        else:
+            self._stats_timer.stop()
+
+    def _update_stats(self):
+        stats = INSTRUMENTATION.snapshot()
+        parts = ['{:.1f} fps'.format(stats['fps']) if stats['fps'] else '- fps']
+
+        for stage, summary in stats['stages'].items():
+            parts.append('{} {:.2f}'.format(stage, summary['mean']))
+
+        if stats['latency']['count']:
+            parts.append('latency p95 {:.1f}'.format(stats['latency']['p95']))
+
+        written = skipped = 0
+
+        for counts in self._write_stats().values():
+            if counts is not None:
+                written += counts['written']
+                skipped += counts['skipped']
+
+        if written + skipped:
+            parts.append('skipped {:.0f}%'.format(100.0 * skipped / (written + skipped)))
+
+        self._stats_label.setText(' | '.join(parts) + ' (ms)')
+
+    def _write_stats(self):
+        return {
+            'markers': self._marker_streamer.write_stats(),
+            'skeletons': self._skeleton_streamer.write_stats(),
+            'rigid bodies': self._rigid_body_streamer.write_stats(),
+            'gaze vectors': self._gaze_streamer.write_stats() if self._gaze_streamer is not None else None,
+            'force plates': self._force_streamer.write_stats() if self._force_streamer is not None else None,
+            'images': self._image_streamer.write_stats(),
+        }
 
     def _event_received(self, event):
         self._output('Event received: {}'.format(event))
@@ -252,21 +896,58 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         self._shelf.toggle_connect_button(connected)
 
         if connected:
-            event = self._qtm.get_latest_event()
+            self._qtm.request_latest_event()
+            self._create_streamers()
+            self._update_receiver()
+
+            if self._stream_on_connect:
+                self.stream()
+        else:
+            if self._filters is not None:
+                # Groups and bodies of the next connection may differ.
+                self._filters.clear()
+
+            if self._receiver is not None:
+                self._receiver.detach()
+
+            if self._worker is not None and self._worker.active:
+                self.stop_stream()
+
+            self.stop_recording()
+
+        self._stream_on_connect = False
+
+    # The streamers have followed the new settings by the time this is
+    # called, they were connected to settingsChanged first.
+    def _settings_changed(self, settings):
+        self._create_streamers()
+        self._update_receiver()
+
+        if self._filters is not None:
+            self._filters.refresh_marker_groups()
+            self._filters.refresh_bodies(len(settings.bodies))
+            self._marker_selection_changed()
+            self._rigid_body_selection_changed()
 
-            if self.widget.skeletonComponentButton.isChecked():
-                self._skeleton_streamer.create()
+        if self._recorder is not None:
+            cmds.warning('QTM settings changed, recording stopped after {} frames.'.format(self.stop_recording()))
 
-            if self.widget.markerComponentButton.isChecked():
-                self._marker_streamer.create()
+        # The decoding process is sized for the old settings.
+        if self._worker is not None and self._worker.active:
+            self.stop_stream()
+            self.stream()
 
-            if self.widget.rigidBodyComponentButton.isChecked():
-                self._rigid_body_streamer.create()
+    def _connect_failed(self, message):
+        self._stream_on_connect = False
+        self.widget.connectButton.setText('Connect')
+        self.widget.hostField.setEnabled(True)
+        cmds.warning('Could not connect to host \'' + self._host + '\': ' + message)
 
-            self._output('Latest event: {}'.format(event))
+    def _error_occurred(self, message):
+        cmds.warning('QTM connection error: ' + message)
 
     def group_name_changed(self):
-        if self.widget.groupNameField.text() != '' and len(self.widget.markerList.selectedItems()) > 0:
+        if self.widget.groupNameField.text() != '' and self.widget.markerList.selectionModel().hasSelection():
             self.widget.groupButton.setEnabled(True)
 
     def marker_selected(self, index):
@@ -276,47 +957,122 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
     def skeleton_selected(self, index):
         self.widget.tPoseButton.setEnabled(not self.is_streaming)
 
-        item = self.widget.skeletonList.itemFromIndex(index)
+        skeleton_name = index.data(ComponentListModel.KeyRole)
 
-        if self._skeleton_streamer.is_in_t_pose(item.text().replace(' [T-pose]', '')):
+        if self._skeleton_streamer.is_in_t_pose(skeleton_name):
             self.widget.tPoseButton.setText('Resume pose')
         else:
             self.widget.tPoseButton.setText('Go to T-pose')
 
     def toggle_t_pose(self):
-        selected = self.widget.skeletonList.selectedItems()
+        if self._receiver is not None and self._receiver.active:
+            cmds.warning('The joints are driven by the receiver node, uncheck Drive receiver node first.')
+            return
 
-        for item in selected:
-            skeleton_name = item.text().replace(' [T-pose]', '')
+        model = self.widget.skeletonList.model()
+        selected = self.widget.skeletonList.selectionModel().selectedRows()
+
+        for index in selected:
+            skeleton_name = index.data(ComponentListModel.KeyRole)
 
             if self._skeleton_streamer.is_in_t_pose(skeleton_name):
                 self._skeleton_streamer.resume_pose(skeleton_name)
-                item.setText(skeleton_name)
+                model.set_text(index.row(), skeleton_name)
                 self.widget.tPoseButton.setText('Go to T-pose')
             else:
                 self._skeleton_streamer.t_pose(skeleton_name)
-                item.setText(skeleton_name + ' [T-pose]')
+                model.set_text(index.row(), skeleton_name + ' [T-pose]')
                 self.widget.tPoseButton.setText('Resume pose')
     
     def _reset_skeleton_names(self):
-        items = []
-        for index in xrange(self.widget.skeletonList.count()):
-            items.append(self.widget.skeletonList.item(index))
+        model = self.widget.skeletonList.model()
 
-        for item in items:
-            skeleton_name = item.text().replace(' [T-pose]', '')
+        for row in range(model.rowCount()):
+            skeleton_name = model.key(row)
 
             self._skeleton_streamer.resume_pose(skeleton_name)
-            item.setText(skeleton_name)
+            model.set_text(row, skeleton_name)
 
         self.widget.tPoseButton.setText('Go to T-pose')
 
+    def _add_filter_box(self, layout, chosen):
+        box = QtWidgets.QComboBox()
+        box.addItems(['No filter'] + list(FILTERS))
+        box.setEnabled(False)
+        box.activated.connect(chosen)
+
+        if self._filters is None:
+            box.setToolTip('Filters require numpy.')
+
+        layout.addWidget(box)
+        return box
+
+    def _show_filter(self, box, kinds):
+        box.setEnabled(self._filters is not None and len(kinds) > 0)
+
+        if kinds:
+            box.setCurrentIndex(box.findText(kinds[0] or 'No filter'))
+
+    def _selected_marker_groups(self):
+        groups = []
+
+        for index in self.widget.markerList.selectionModel().selectedRows():
+            key = index.data(ComponentListModel.KeyRole)
+            # Marker rows are keyed by label index, group rows by name, which
+            # is unicode on Python 2.
+            group_name = self._marker_streamer.group_of(key) if isinstance(key, int) else key
+
+            if group_name is not None and group_name not in groups:
+                groups.append(group_name)
+
+        return groups
+
+    def _selected_rigid_bodies(self):
+        return [index.data(ComponentListModel.KeyRole) for index in self.widget.rigidBodyList.selectionModel().selectedRows()]
+
+    def _marker_selection_changed(self, *args):
+        if self._filters is not None:
+            self._show_filter(self._marker_filter_box, [self._filters.marker_filter(group_name) for group_name in self._selected_marker_groups()])
+
+    def _rigid_body_selection_changed(self, *args):
+        if self._filters is not None:
+            self._show_filter(self._rigid_body_filter_box, [self._filters.body_filter(body_index) for body_index in self._selected_rigid_bodies()])
+
+    def _marker_filter_chosen(self, row):
+        kind = self._marker_filter_box.itemText(row) if row > 0 else None
+
+        for group_name in self._selected_marker_groups():
+            self._filters.set_marker_filter(group_name, kind)
+
+    def _rigid_body_filter_chosen(self, row):
+        kind = self._rigid_body_filter_box.itemText(row) if row > 0 else None
+
+        for body_index in self._selected_rigid_bodies():
+            self._filters.set_body_filter(body_index, kind)
+
+    def _gap_policy_changed(self, row):
+        self._marker_streamer.set_gap_policy(GAP_POLICIES[row])
+
+    def _marker_groups_changed(self):
+        if self._filters is not None:
+            self._filters.refresh_marker_groups()
+            self._marker_selection_changed()
+
     def _streaming_changed(self, streaming):
+        self._update_playback(streaming)
         self.widget.startButton.setEnabled(not streaming)
         self.widget.stopButton.setEnabled(streaming)
         self.widget.tPoseButton.setEnabled(not streaming)
     
+    # Labels, bodies and skeletons may have changed in QTM since they were
+    # fetched, the stream starts once they have been fetched again.
     def stream(self):
+        self._qtm.refresh_settings(self._start_stream)
+
+    def _start_stream(self, settings):
+        if self.is_streaming:
+            return
+
         components = []
 
         if self.widget.skeletonComponentButton.isChecked():
@@ -328,32 +1084,69 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         if self.widget.rigidBodyComponentButton.isChecked():
             components.append('6d')
 
-        self._qtm.stream(' '.join(components))
+        self._telemetry.reset()
+        self.close_take()
+
+        if self._prediction is not None:
+            self._prediction.reset()
+
+        if self._filters is not None:
+            self._filters.reset()
+
+        if self._receiver is not None:
+            self._receiver.reset()
+
+        if self._worker is not None and self._process_button.isChecked():
+            self._worker.start(self._host, settings, components)
+            self._streaming_changed(True)
+        else:
+            if self._timecode_lock:
+                components.append('timecode')
+
+            if self._gaze_button.isChecked():
+                components.append('gazevector')
+
+            if self._force_button.isChecked():
+                components.append('force')
+                self._force_streamer.start(scene_rate())
+
+            if self._images_button.isChecked():
+                components.append('image')
+                self._image_streamer.start()
+
+            self._qtm.stream(' '.join(components))
+
         self._reset_skeleton_names()
         self._shelf.toggle_stream_button('stop')
 
         self.is_streaming = True
 
     def stop_stream(self):
-        self._qtm.stop_stream()
+        if self._worker is not None and self._worker.active:
+            self._worker.stop()
+            self._streaming_changed(False)
+        else:
+            self._qtm.stop_stream()
+
+        self._image_streamer.stop()
+        self.stop_recording()
         self.is_streaming = False
 
         self._shelf.toggle_stream_button('start')
 
     def get_settings_3d(self):
-        self._output(str(self._qtm.get_settings('3d')))
+        self._output(str(self._qtm.settings.labels))
 
     def connect_qtm(self):
         if self._qtm.connected:
             self._qtm.disconnect()
             self._shelf.toggle_stream_button('start')
+        elif self._qtm.connecting:
+            self._qtm.cancel()
         else:
-            self.widget.connectButton.setEnabled(False)
+            self.widget.connectButton.setText('Cancel')
+            self.widget.hostField.setEnabled(False)
             self._qtm.connect_to_qtm(self._host, 4000)
-            self.widget.connectButton.setEnabled(True)
-
-            if not self._qtm.connected:
-                cmds.warning('Could not connect to host \'' + self._host + '\'.')
 
 def main():
     if not MAYA:
@@ -0,0 +1,83 @@
+"""
+    Compares decoding 2000 packets of 300 markers, 40 bodies and 10 x 51
+    segments into (frames, ...) arrays packet by packet, with QRTPacket and
+    the qtm.arrays getters, against qtm.batch.decode_packets.
+
+    python benchmarks/batch_bench.py
+"""
+
+import os
+import struct
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(ROOT + '/modules/')
+sys.path.append(ROOT + '/modules/qualisys_python_sdk')
+
+from qtm.arrays import get_3d_array, get_6d_arrays, get_skeleton_arrays
+from qtm.batch import PacketLayout, decode_packets
+from qtm.packet import QRTPacket, QRTComponentType
+
+FRAMES = 2000
+MARKERS = 300
+BODIES = 40
+ACTORS = 10
+SEGMENTS = 51
+
+
+def component(component_type, body):
+    return struct.pack('<II', len(body) + 8, component_type.value) + body
+
+
+def make_data(frame):
+    markers = struct.pack('<Ihh', MARKERS, 0, 0) + struct.pack('<{}f'.format(MARKERS * 3), *range(MARKERS * 3))
+    bodies = struct.pack('<ihh', BODIES, 0, 0) + struct.pack('<{}f'.format(BODIES * 12), *range(BODIES * 12))
+    skeletons = struct.pack('<i', ACTORS)
+
+    for actor in range(ACTORS):
+        skeletons += struct.pack('<i', SEGMENTS)
+
+        for segment in range(SEGMENTS):
+            skeletons += struct.pack('<i3f4f', actor * SEGMENTS + segment + 1, 1, 2, 3, 0, 0, 0, 1)
+
+    return struct.pack('<qII', 1000 * frame, frame, 3) + b''.join((
+        component(QRTComponentType.Component3d, markers),
+        component(QRTComponentType.Component6d, bodies),
+        component(QRTComponentType.ComponentSkeleton, skeletons),
+    ))
+
+
+def decode_each(packets, arrays):
+    for frame, data in enumerate(packets):
+        packet = QRTPacket(data)
+        arrays['framenumbers'][frame] = packet.framenumber
+        arrays['timestamps'][frame] = packet.timestamp
+        arrays['positions'][frame] = get_3d_array(packet)[1]
+        _, arrays['body_positions'][frame], arrays['body_rotations'][frame] = get_6d_arrays(packet)
+        (
+            _,
+            arrays['segment_ids'][frame],
+            arrays['segment_positions'][frame],
+            arrays['segment_rotations'][frame],
+        ) = get_skeleton_arrays(packet)
+
+
+def main():
+    packets = [make_data(frame) for frame in range(FRAMES)]
+    layout = PacketLayout(QRTPacket(packets[0]))
+    arrays = layout.empty(FRAMES)
+
+    print('{} packets of {} kB'.format(FRAMES, layout.size // 1024))
+
+    for name, function in (
+        ('packet by packet', lambda: decode_each(packets, arrays)),
+        ('decode_packets', lambda: decode_packets(packets, layout, **arrays)),
+    ):
+        seconds = min(timeit.repeat(function, number=1, repeat=5))
+        print('{0:>18}: {1:8.1f} ms, {2:6.2f} us per frame'.format(
+            name, seconds * 1e3, seconds / FRAMES * 1e6))
+
+
+if __name__ == '__main__':
+    main()
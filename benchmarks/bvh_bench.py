@@ -0,0 +1,76 @@
+"""
+    Export speed of the streaming BVH writer for 10 actors of 51 segments,
+    as multiples of real time at 100 Hz, with the quaternions converted a
+    block of frames at a time against a frame at a time.
+
+    python benchmarks/bvh_bench.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(ROOT + '/modules/')
+sys.path.append(ROOT + '/modules/qualisys_python_sdk')
+
+import numpy as np
+
+from qtm.bvh import BVHExport
+from qtm.settings import Segment, Settings, Skeleton
+
+ACTORS = 10
+SEGMENTS = 51
+RATE = 100
+FRAMES = 2000
+
+
+def make_settings():
+    skeletons = []
+
+    for actor in range(ACTORS):
+        segments = []
+
+        for segment in range(SEGMENTS):
+            # A chain with a branch every third segment.
+            parent = None if segment == 0 else actor * SEGMENTS + max(segment - 1 - segment % 3, 0) + 1
+            segments.append(Segment(actor * SEGMENTS + segment + 1, 'segment{}'.format(segment),
+                                    parent, (0, 0, 100), (0, 0, 0, 1)))
+
+        skeletons.append(Skeleton('actor{}'.format(actor), segments))
+
+    return Settings(skeletons=skeletons)
+
+
+def export(directory, settings, block_frames):
+    ids = np.arange(1, ACTORS * SEGMENTS + 1)
+    positions = np.random.rand(ACTORS * SEGMENTS, 3) * 1000
+    rotations = np.random.rand(ACTORS * SEGMENTS, 4)
+    rotations /= np.linalg.norm(rotations, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+
+    with BVHExport(directory + '/%s.bvh', settings, RATE, block_frames=block_frames) as bvh:
+        for _ in range(FRAMES):
+            bvh.append(ids, positions, rotations)
+
+    return time.perf_counter() - start
+
+
+def main():
+    settings = make_settings()
+    directory = tempfile.mkdtemp()
+
+    try:
+        for name, block_frames in (('frame at a time', 1), ('blocks of 1024', 1024)):
+            seconds = export(directory, settings, block_frames)
+            print('{0:>16}: {1:6.0f} frames/s, {2:5.1f} x real time'.format(
+                name, FRAMES / seconds, FRAMES / seconds / RATE))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+    Throughput of the streaming C3D writer in MB/s, for 300 markers and 64
+    analog channels at ten samples per frame, and the memory it holds while
+    writing takes of increasing length.
+
+    python benchmarks/c3d_bench.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(ROOT + '/modules/')
+sys.path.append(ROOT + '/modules/qualisys_python_sdk')
+
+import numpy as np
+
+from qtm.c3d import C3DWriter
+
+MARKERS = 300
+CHANNELS = 64
+RATE = 100
+SAMPLES = 10
+
+
+def write(path, frames):
+    positions = np.random.rand(MARKERS, 3).astype(np.float32) * 1000
+    positions[::10] = np.nan
+    analog = np.random.rand(CHANNELS, SAMPLES).astype(np.float32)
+    labels = ['marker{}'.format(i) for i in range(MARKERS)]
+    channels = ['channel{}'.format(i) for i in range(CHANNELS)]
+
+    with C3DWriter(path, labels, RATE, channels, analog_rate=RATE * SAMPLES) as writer:
+        for _ in range(frames):
+            writer.append(positions, analog=analog)
+
+
+def main():
+    handle, path = tempfile.mkstemp(suffix='.c3d')
+    os.close(handle)
+
+    try:
+        for frames in (1000, 10000, 30000):
+            start = time.perf_counter()
+            write(path, frames)
+            seconds = time.perf_counter() - start
+
+            # Traced separately, tracing slows the writer down.
+            tracemalloc.start()
+            write(path, frames)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            size = os.path.getsize(path) / 1e6
+            print('{0:>6} frames: {1:7.1f} MB in {2:5.2f} s, {3:6.1f} MB/s, peak {4:5.2f} MB held'.format(
+                frames, size, seconds, size / seconds, peak / 1e6))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+    Compares decoding the 2D markers of 40 cameras with 100 markers each
+    through QRTPacket.get_2d_markers against qtm.arrays.get_2d_arrays, for
+    all cameras and for the last camera alone.
+
+    python benchmarks/markers2d_bench.py
+"""
+
+import os
+import struct
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(ROOT + '/modules/')
+sys.path.append(ROOT + '/modules/qualisys_python_sdk')
+
+from qtm.arrays import get_2d_arrays
+from qtm.packet import QRTPacket, QRTComponentType
+
+CAMERAS = 40
+MARKERS = 100
+
+
+def make_data():
+    markers = struct.pack('<Ihh', CAMERAS, 0, 0)
+
+    for camera in range(CAMERAS):
+        markers += struct.pack('<ib', MARKERS, 0)
+        markers += struct.pack('<' + 'iihh' * MARKERS, *range(MARKERS * 4))
+
+    body = struct.pack('<II', len(markers) + 8, QRTComponentType.Component2d.value) + markers
+    return struct.pack('<qII', 1000, 7, 1) + body
+
+
+def main():
+    data = make_data()
+    runs = 200
+
+    for name, function in (
+        ('get_2d_markers all', lambda: QRTPacket(data).get_2d_markers()),
+        ('get_2d_arrays all', lambda: list(get_2d_arrays(QRTPacket(data))[1])),
+        ('get_2d_markers last', lambda: QRTPacket(data).get_2d_markers(index=CAMERAS - 1)),
+        ('get_2d_arrays last', lambda: get_2d_arrays(QRTPacket(data))[1][CAMERAS - 1]),
+    ):
+        seconds = min(timeit.repeat(function, number=runs, repeat=3)) / runs
+        print('{0:>20}: {1:8.1f} us'.format(name, seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main()
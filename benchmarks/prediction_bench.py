@@ -0,0 +1,154 @@
+"""
+    Replays 6D frames through the predictors and reports the prediction error
+    against the look-ahead time, together with the cost per frame.
+
+    Without arguments a 60 s hand held camera move sampled at 120 Hz with
+    measurement noise is generated. A recording can be replayed instead from
+    an .npz file with times (frames,) in seconds, positions (frames, bodies, 3)
+    in mm and rotations (frames, bodies, 4) as x, y, z, w quaternions.
+
+    python benchmarks/prediction_bench.py [recording.npz]
+"""
+
+import os
+import struct
+import sys
+import timeit
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(ROOT + '/modules/')
+sys.path.append(ROOT + '/modules/qualisys_python_sdk')
+
+from qtm.arrays import get_6d_arrays
+from qtm.packet import QRTPacket, QRTComponentType
+from qtm.predict import ConstantVelocityPredictor, KalmanPredictor
+from qtm.rotation import (
+    conjugate,
+    from_rotation_vectors,
+    matrices_to_quaternions,
+    multiply,
+    quaternions_to_matrices,
+    to_rotation_vectors,
+)
+
+RATE = 120.0
+SECONDS = 60
+BODIES = 4
+LOOKAHEADS_MS = (0, 10, 20, 30, 50, 75, 100)
+
+
+def generate():
+    random = np.random.RandomState(1)
+    times = np.arange(int(SECONDS * RATE)) / RATE
+    positions = np.zeros((len(times), BODIES, 3))
+    rotation_vectors = np.zeros((len(times), BODIES, 3))
+
+    # Sums of slow sinusoids, similar in reach and speed to a hand held camera.
+    for _ in range(6):
+        frequency = random.uniform(0.1, 1.5, (BODIES, 3))
+        phase = random.uniform(0, 2 * np.pi, (BODIES, 3))
+        amplitude = random.uniform(20, 200, (BODIES, 3)) / (1 + frequency)
+        waves = np.sin(2 * np.pi * frequency * times[:, None, None] + phase)
+        positions += amplitude * waves
+        rotation_vectors += 0.15 / (1 + frequency) * waves
+
+    return times, positions, from_rotation_vectors(rotation_vectors)
+
+
+def make_packets(times, positions, rotations):
+    random = np.random.RandomState(2)
+    noisy_positions = positions + random.normal(0, 0.3, positions.shape)
+    noise = from_rotation_vectors(random.normal(0, np.radians(0.05), positions.shape))
+    matrices = quaternions_to_matrices(multiply(noise, rotations))
+
+    packets = []
+
+    for frame, time in enumerate(times):
+        body = struct.pack('<ihh', positions.shape[1], 0, 0)
+
+        for i in range(positions.shape[1]):
+            body += struct.pack('<3f', *noisy_positions[frame, i])
+            # Column major like QTM.
+            body += struct.pack('<9f', *matrices[frame, i].T.ravel())
+
+        component = struct.pack('<II', len(body) + 8, QRTComponentType.Component6d.value) + body
+        header = struct.pack('<qII', int(round(time * 1e6)), frame, 1)
+        packets.append(QRTPacket(header + component))
+
+    return packets
+
+
+def angle_degrees(q0, q1):
+    return np.degrees(np.linalg.norm(to_rotation_vectors(multiply(q0, conjugate(q1))), axis=-1))
+
+
+def replay(predictor, packets, times, positions, rotations, rate):
+    # Look ahead by whole frames so that the truth is a recorded frame.
+    steps = sorted(set(int(round(ms * 1e-3 * rate)) for ms in LOOKAHEADS_MS))
+    errors = dict((step, ([], [])) for step in steps)
+    elapsed = 0.0
+
+    for frame, packet in enumerate(packets):
+        start = timeit.default_timer()
+        _, body_positions, body_matrices = get_6d_arrays(packet)
+        predictor.update(packet.timestamp * 1e-6, body_positions, matrices_to_quaternions(body_matrices))
+        elapsed += timeit.default_timer() - start
+
+        # Skip the first second while the estimates settle.
+        if times[frame] < 1.0:
+            continue
+
+        for step in steps:
+            if frame + step >= len(times):
+                continue
+
+            predicted_positions, predicted_rotations = predictor.predict(times[frame + step] - times[frame])
+            errors[step][0].append(np.linalg.norm(predicted_positions - positions[frame + step], axis=-1))
+            errors[step][1].append(angle_degrees(predicted_rotations, rotations[frame + step]))
+
+    return errors, elapsed / len(packets)
+
+
+class Hold(ConstantVelocityPredictor):
+    def predict(self, lookahead):
+        return self._positions, self._rotations
+
+
+def main():
+    if len(sys.argv) > 1:
+        recording = np.load(sys.argv[1])
+        times, positions, rotations = recording['times'], recording['positions'], recording['rotations']
+        rate = 1.0 / np.median(np.diff(times))
+        print('Replaying {0}: {1} frames at {2:.0f} Hz, {3} bodies'.format(
+            sys.argv[1], len(times), rate, positions.shape[1]))
+    else:
+        times, positions, rotations = generate()
+        rate = RATE
+        print('Generated {0} frames at {1:.0f} Hz, {2} bodies, 0.3 mm / 0.05 deg noise'.format(
+            len(times), RATE, BODIES))
+
+    packets = make_packets(times, positions, rotations)
+
+    for name, predictor in (
+        ('hold', Hold()),
+        ('constant velocity', ConstantVelocityPredictor()),
+        ('kalman', KalmanPredictor()),
+    ):
+        errors, per_frame = replay(predictor, packets, times, positions, rotations, rate)
+        print('\n{0} ({1:.1f} us per frame incl. decode)'.format(name, per_frame * 1e6))
+        print('{0:>10} {1:>12} {2:>12} {3:>12} {4:>12}'.format(
+            'ahead ms', 'pos mean mm', 'pos p95 mm', 'rot mean deg', 'rot p95 deg'))
+
+        for step, (position_errors, rotation_errors) in sorted(errors.items()):
+            position_errors = np.concatenate(position_errors)
+            rotation_errors = np.concatenate(rotation_errors)
+            print('{0:>10.1f} {1:>12.2f} {2:>12.2f} {3:>12.3f} {4:>12.3f}'.format(
+                step * 1000.0 / rate,
+                position_errors.mean(), np.percentile(position_errors, 95),
+                rotation_errors.mean(), np.percentile(rotation_errors, 95)))
+
+
+if __name__ == '__main__':
+    main()
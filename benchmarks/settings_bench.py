@@ -0,0 +1,102 @@
+"""
+    Compares the settings parser against the previous xml2json + json.loads path
+    on a 10 actor skeleton document with labelled markers and rigid bodies.
+
+    python benchmarks/settings_bench.py
+"""
+
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(ROOT + '/modules/')
+sys.path.append(ROOT + '/modules/qualisys_python_sdk')
+
+import xml2json
+from qtm.settings import parse_settings
+
+ACTORS = 10
+SEGMENTS = 51
+LABELS = 300
+BODIES = 40
+
+
+def make_xml():
+    parts = ['<QTM_Parameters_Ver_1.19><The_3D><AxisUpwards>+Z</AxisUpwards>']
+
+    for i in range(LABELS):
+        parts.append(
+            '<Label><Name>marker_{0}</Name><RGBColor>{1}</RGBColor></Label>'.format(i, i * 997)
+        )
+
+    parts.append('</The_3D><The_6D>')
+
+    for i in range(BODIES):
+        parts.append('<Body><Name>body_{0}</Name><RGBColor>255</RGBColor>'.format(i))
+
+        for j in range(4):
+            parts.append('<Point><X>{0}.5</X><Y>{1}.25</Y><Z>12.0</Z></Point>'.format(i, j))
+
+        parts.append('</Body>')
+
+    parts.append('</The_6D><Skeletons>')
+
+    for i in range(ACTORS):
+        parts.append('<Skeleton Name="actor_{0}">'.format(i))
+
+        for j in range(SEGMENTS):
+            parent = '' if j == 0 else ' Parent_ID="{0}"'.format(i * SEGMENTS + j)
+            parts.append(
+                '<Segment Name="segment_{0}" ID="{1}"{2}>'
+                '<Position X="1.5" Y="-2.25" Z="{0}.0"/>'
+                '<Rotation X="0.0" Y="0.7071" Z="0.0" W="0.7071"/>'
+                '</Segment>'.format(j, i * SEGMENTS + j + 1, parent)
+            )
+
+        parts.append('</Skeleton>')
+
+    parts.append('</Skeletons></QTM_Parameters_Ver_1.19>')
+
+    return ''.join(parts)
+
+
+def xml2json_path(xml_text):
+    options = lambda: None
+    options.pretty = False
+    settings = json.loads(xml2json.xml2json(xml_text, options))
+    settings = settings.pop('QTM_Parameters_Ver_1.19')
+
+    # What SkeletonStreamer._assume_t_pose did for every segment.
+    for skeleton in settings['Skeletons']['Skeleton']:
+        for segment in skeleton['Segment']:
+            int(segment['@ID'])
+            [float(segment['Position'][axis]) for axis in ('@X', '@Y', '@Z')]
+            [float(segment['Rotation'][axis]) for axis in ('@X', '@Y', '@Z', '@W')]
+
+
+def parser_path(xml_text):
+    settings = parse_settings(xml_text)
+
+    for skeleton in settings.skeletons:
+        for segment in skeleton.segments:
+            segment.id
+            segment.position
+            segment.rotation
+
+
+def main():
+    xml_text = make_xml()
+    runs = 20
+
+    print('Document: {0} kB, {1} actors x {2} segments, {3} labels, {4} bodies'.format(
+        len(xml_text) // 1024, ACTORS, SEGMENTS, LABELS, BODIES))
+
+    for name, function in (('xml2json', xml2json_path), ('parse_settings', parser_path)):
+        seconds = min(timeit.repeat(lambda: function(xml_text), number=runs, repeat=3)) / runs
+        print('{0:>16}: {1:8.2f} ms'.format(name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
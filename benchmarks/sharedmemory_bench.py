@@ -0,0 +1,90 @@
+"""
+    Compares the per frame cost in the Maya process of decoding packets there
+    against copying the latest frame out of a SharedFrameBuffer filled by a
+    decoding process, for 300 markers, 40 bodies and 10 x 51 segments.
+
+    python benchmarks/sharedmemory_bench.py
+"""
+
+import os
+import struct
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(ROOT + '/modules/')
+sys.path.append(ROOT + '/modules/qualisys_python_sdk')
+
+from qtm.arrays import get_3d_array, get_6d_arrays, get_skeleton_arrays
+from qtm.packet import QRTPacket, QRTComponentType
+from qtm.sharedmemory import SharedFrameBuffer
+
+MARKERS = 300
+BODIES = 40
+ACTORS = 10
+SEGMENTS = 51
+
+
+def component(component_type, body):
+    return struct.pack('<II', len(body) + 8, component_type.value) + body
+
+
+def make_data():
+    markers = struct.pack('<Ihh', MARKERS, 0, 0) + struct.pack('<{}f'.format(MARKERS * 3), *range(MARKERS * 3))
+    bodies = struct.pack('<ihh', BODIES, 0, 0) + struct.pack('<{}f'.format(BODIES * 12), *range(BODIES * 12))
+    skeletons = struct.pack('<i', ACTORS)
+
+    for actor in range(ACTORS):
+        skeletons += struct.pack('<i', SEGMENTS)
+
+        for segment in range(SEGMENTS):
+            skeletons += struct.pack('<i3f4f', actor * SEGMENTS + segment + 1, 1, 2, 3, 0, 0, 0, 1)
+
+    return struct.pack('<qII', 1000, 7, 3) + b''.join((
+        component(QRTComponentType.Component3d, markers),
+        component(QRTComponentType.Component6d, bodies),
+        component(QRTComponentType.ComponentSkeleton, skeletons),
+    ))
+
+
+def decode(data):
+    packet = QRTPacket(data)
+    get_3d_array(packet)
+    get_6d_arrays(packet)
+    get_skeleton_arrays(packet)
+
+
+def main():
+    data = make_data()
+    packet = QRTPacket(data)
+    runs = 2000
+
+    with SharedFrameBuffer.create(MARKERS, BODIES, ACTORS * SEGMENTS) as buffer:
+        _, positions = get_3d_array(packet)
+        _, body_positions, body_rotations = get_6d_arrays(packet)
+        _, ids, segment_positions, segment_rotations = get_skeleton_arrays(packet)
+        buffer.write(
+            packet.framenumber,
+            packet.timestamp,
+            positions=positions,
+            body_positions=body_positions,
+            body_rotations=body_rotations,
+            segment_ids=ids,
+            segment_positions=segment_positions,
+            segment_rotations=segment_rotations,
+        )
+        frame = buffer.frame()
+
+        print('Frame: {} kB in the packet, {} kB in the buffer'.format(
+            len(data) // 1024, buffer.dtype.itemsize // 1024))
+
+        for name, function in (
+            ('decode in Maya', lambda: decode(data)),
+            ('read latest slot', lambda: buffer.read(frame)),
+        ):
+            seconds = min(timeit.repeat(function, number=runs, repeat=3)) / runs
+            print('{0:>18}: {1:8.1f} us'.format(name, seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+from PySide2 import QtCore
+from PySide2 import QtGui
+from PySide2 import QtWidgets
+
+from mayaui import load_icon
+
+
+class ComponentItem(object):
+    __slots__ = ("key", "text", "icon_path", "color")
+
+    def __init__(self, key, text, icon_path, color):
+        self.key = key
+        self.text = text
+        self.icon_path = icon_path
+        self.color = color
+
+
+class ComponentListModel(QtCore.QAbstractListModel):
+    """List model for markers, rigid bodies and skeletons.
+
+    Rows are identified by a key so that updates can be applied as row
+    inserts, moves and removals, which keeps the selection of untouched rows
+    intact. The row of every key is kept in a dict, so looking up a row does
+    not scan the list. Icons are only created when the view asks for a
+    visible row.
+    """
+
+    KeyRole = QtCore.Qt.UserRole
+
+    def __init__(self, parent=None):
+        super(ComponentListModel, self).__init__(parent)
+
+        self._items = []
+        self._rows = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(self._items)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        item = self._items[index.row()]
+
+        if role == QtCore.Qt.DisplayRole:
+            return item.text
+        elif role == QtCore.Qt.DecorationRole:
+            return load_icon(item.icon_path, QtGui.QColor(*item.color))
+        elif role == self.KeyRole:
+            return item.key
+
+        return None
+
+    def key(self, row):
+        return self._items[row].key
+
+    def keys(self):
+        return [item.key for item in self._items]
+
+    def row(self, key):
+        return self._rows.get(key, -1)
+
+    # Rows first to last, to the end by default, have moved.
+    def _reindex(self, first, last=None):
+        if last is None:
+            last = len(self._items) - 1
+
+        for row in range(first, last + 1):
+            self._rows[self._items[row].key] = row
+
+    def text(self, row):
+        return self._items[row].text
+
+    def set_text(self, row, text):
+        if self._items[row].text == text:
+            return
+
+        self._items[row].text = text
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def clear(self):
+        if not self._items:
+            return
+
+        self.beginRemoveRows(QtCore.QModelIndex(), 0, len(self._items) - 1)
+        del self._items[:]
+        self._rows.clear()
+        self.endRemoveRows()
+
+    def insert(self, row, items):
+        if not items:
+            return
+
+        self.beginInsertRows(QtCore.QModelIndex(), row, row + len(items) - 1)
+        self._items[row:row] = items
+        self._reindex(row)
+        self.endInsertRows()
+
+    def remove(self, row, count=1):
+        if count < 1:
+            return
+
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row + count - 1)
+
+        for item in self._items[row : row + count]:
+            del self._rows[item.key]
+
+        del self._items[row : row + count]
+        self._reindex(row)
+        self.endRemoveRows()
+
+    def move(self, source, destination):
+        """Move the row at source so that it ends up at destination."""
+        if source == destination:
+            return
+
+        # Qt expects the destination row as it is before the move.
+        qt_destination = destination + 1 if destination > source else destination
+        self.beginMoveRows(
+            QtCore.QModelIndex(), source, source, QtCore.QModelIndex(), qt_destination
+        )
+        self._items.insert(destination, self._items.pop(source))
+        self._reindex(min(source, destination), max(source, destination))
+        self.endMoveRows()
+
+    def update(self, items):
+        """Make the model show items, touching only the rows that differ."""
+        wanted = set(item.key for item in items)
+
+        # Remove rows that are gone, in contiguous ranges from the bottom up.
+        row = len(self._items) - 1
+
+        while row >= 0:
+            if self._items[row].key in wanted:
+                row -= 1
+                continue
+
+            last = row
+
+            while row > 0 and self._items[row - 1].key not in wanted:
+                row -= 1
+
+            self.remove(row, last - row + 1)
+            row -= 1
+
+        for row, item in enumerate(items):
+            if item.key not in self._rows:
+                self.insert(row, [item])
+                continue
+
+            if self._items[row].key != item.key:
+                self.move(self.row(item.key), row)
+
+            current = self._items[row]
+
+            if (current.text, current.icon_path, current.color) != (
+                item.text,
+                item.icon_path,
+                item.color,
+            ):
+                self._items[row] = item
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+
+
+def replace_list_widget(list_widget):
+    """Swap a QListWidget loaded from the .ui file for a QListView."""
+    view = QtWidgets.QListView(list_widget.parentWidget())
+
+    view.setObjectName(list_widget.objectName())
+    view.setSizePolicy(list_widget.sizePolicy())
+    view.setMinimumSize(list_widget.minimumSize())
+    view.setMaximumSize(list_widget.maximumSize())
+    view.setSelectionMode(list_widget.selectionMode())
+    view.setUniformItemSizes(True)
+
+    list_widget.parentWidget().layout().replaceWidget(list_widget, view)
+    list_widget.deleteLater()
+
+    return view
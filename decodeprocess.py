@@ -0,0 +1,100 @@
+"""Receives and decodes frames from QTM in a process of its own.
+
+Started by DecodeWorker with the name of a SharedFrameBuffer it has created,
+so that receiving and decoding do not compete with Maya for the GIL. Every
+frame is written to the buffer as it arrives. The process stops when its
+standard input is closed, which also happens when Maya exits.
+
+    python decodeprocess.py <buffer name> <host> <component>...
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/modules/qualisys_python_sdk")
+
+import qtm
+from qtm.arrays import get_3d_array, get_6d_arrays, get_skeleton_arrays
+from qtm.sharedmemory import SharedFrameBuffer
+
+
+def write_packet(buffer, packet):
+    arrays = {}
+    infos = []
+
+    markers = get_3d_array(packet)
+    if markers is not None:
+        infos.append(markers[0])
+        arrays["positions"] = markers[1]
+
+    bodies = get_6d_arrays(packet)
+    if bodies is not None:
+        infos.append(bodies[0])
+        arrays["body_positions"], arrays["body_rotations"] = bodies[1:]
+
+    segments = get_skeleton_arrays(packet)
+    if segments is not None:
+        arrays["segment_ids"], arrays["segment_positions"], arrays["segment_rotations"] = segments[1:]
+
+    buffer.write(
+        packet.framenumber,
+        packet.timestamp,
+        drop_rate=max([info.drop_rate for info in infos] or [0]),
+        out_of_sync_rate=max([info.out_of_sync_rate for info in infos] or [0]),
+        **arrays
+    )
+
+
+async def stream(buffer, host, port, version, components, loop):
+    stopped = asyncio.Event()
+
+    def stop(*args):
+        loop.call_soon_threadsafe(stopped.set)
+
+    # Reading blocks until the other end of the pipe is closed.
+    threading.Thread(target=lambda: (sys.stdin.read(), stop()), daemon=True).start()
+
+    connection = await qtm.connect(host, port=port, version=version, on_disconnect=stop, loop=loop)
+
+    if connection is None:
+        return 1
+
+    await connection.stream_frames(
+        components=components, on_packet=lambda packet: write_packet(buffer, packet)
+    )
+    await stopped.wait()
+
+    if connection.has_transport():
+        await connection.stream_frames_stop()
+        connection.disconnect()
+
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("buffer", help="Name of the shared frame buffer.")
+    parser.add_argument("host", help="Address of the computer running QTM.")
+    parser.add_argument("components", nargs="+", help="Components to stream.")
+    parser.add_argument("--port", type=int, default=22223)
+    parser.add_argument("--version", default="1.19")
+    args = parser.parse_args(argv)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    buffer = SharedFrameBuffer.open(args.buffer)
+
+    try:
+        return loop.run_until_complete(
+            stream(buffer, args.host, args.port, args.version, args.components, loop)
+        )
+    finally:
+        buffer.close()
+        loop.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import os
+import subprocess
+import sys
+
+from PySide2 import QtCore
+
+import maya.cmds as cmds
+
+from qtm.rotation import matrices_to_quaternions
+from qtm.sharedmemory import SharedFrameBuffer
+
+from mayautil import MayaUtil
+
+PROCESS_PATH = os.path.dirname(os.path.abspath(__file__)) + "/decodeprocess.py"
+
+# How often the buffer is checked for a new frame, in milliseconds.
+POLL_INTERVAL = 4
+
+
+def python_executable():
+    """mayapy next to the Maya executable, the running Python outside Maya."""
+    mayapy = os.path.join(
+        os.path.dirname(sys.executable), "mayapy" + (".exe" if os.name == "nt" else "")
+    )
+    return mayapy if os.path.exists(mayapy) else sys.executable
+
+
+class DecodeWorker(QtCore.QObject):
+    """Streams from QTM through a decoding process of its own.
+
+    The process, see decodeprocess.py, keeps a connection to QTM and writes
+    every decoded frame to a shared frame buffer. Here only the latest frame
+    is copied out of the buffer, when its sequence number has changed, and
+    applied to the streamers or published to the receiver node.
+
+    :param on_frame: Called with the frame number, timestamp, drop rate and
+        out of sync rate of every applied frame.
+    :param on_exit: Called with a message when the process stopped by itself.
+    """
+
+    def __init__(
+        self,
+        marker_streamer,
+        skeleton_streamer,
+        rigid_body_streamer,
+        filters=None,
+        receiver=None,
+        on_frame=None,
+        on_exit=None,
+        parent=None,
+    ):
+        super(DecodeWorker, self).__init__(parent)
+        self._marker_streamer = marker_streamer
+        self._skeleton_streamer = skeleton_streamer
+        self._rigid_body_streamer = rigid_body_streamer
+        self._filters = filters
+        self._receiver = receiver
+        self._on_frame = on_frame
+        self._on_exit = on_exit
+        self._process = None
+        self._buffer = None
+        self._frame = None
+        self._sequence = 0
+        self._up_axis = "z"
+        self._unit_conversion = 0.1
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._timer.setInterval(POLL_INTERVAL)
+        self._timer.timeout.connect(self._poll)
+
+    @property
+    def active(self):
+        return self._process is not None
+
+    def start(self, host, settings, components):
+        """Start streaming components, a list such as ['3d', 'skeleton'],
+        sized for the markers, bodies and segments in settings."""
+        self.stop()
+
+        self._up_axis = cmds.upAxis(q=True, axis=True)
+        self._buffer = SharedFrameBuffer.create(
+            markers=len(settings.labels) if "3d" in components else 0,
+            bodies=len(settings.bodies) if "6d" in components else 0,
+            segments=sum(len(skeleton.segments) for skeleton in settings.skeletons)
+            if "skeleton" in components
+            else 0,
+        )
+        self._frame = self._buffer.frame()
+        self._sequence = 0
+
+        # The process stops when its standard input is closed.
+        self._process = subprocess.Popen(
+            [python_executable(), PROCESS_PATH, self._buffer.name, host] + list(components),
+            stdin=subprocess.PIPE,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+        if self._process is not None:
+            self._process.stdin.close()
+
+            try:
+                self._process.wait(1)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+            self._process = None
+
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+    def _poll(self):
+        if self._process.poll() is not None:
+            code = self._process.returncode
+            self.stop()
+
+            if self._on_exit is not None:
+                self._on_exit("The decoding process stopped with exit code {}.".format(code))
+            return
+
+        if self._buffer.sequence == self._sequence:
+            return
+
+        sequence = self._buffer.read(self._frame)
+
+        if sequence is None:
+            return
+
+        self._sequence = sequence
+        self._apply(self._frame)
+
+        if self._on_frame is not None:
+            self._on_frame(
+                int(self._frame["framenumber"]),
+                int(self._frame["timestamp"]),
+                int(self._frame["drop_rate"]),
+                int(self._frame["out_of_sync_rate"]),
+            )
+
+    def _apply(self, frame):
+        time = int(frame["timestamp"]) * 1e-6
+        positions = frame["positions"] if len(frame["positions"]) else None
+        body_positions = None
+        body_rotations = None
+        segment_ids = None
+
+        if len(frame["body_positions"]):
+            body_positions = frame["body_positions"]
+            body_rotations = matrices_to_quaternions(frame["body_rotations"])
+
+        if len(frame["segment_ids"]):
+            segment_ids = frame["segment_ids"]
+
+        if self._receiver is not None and self._receiver.active:
+            self._receiver.publish(
+                time,
+                positions,
+                body_positions,
+                body_rotations,
+                segment_ids,
+                frame["segment_positions"],
+                frame["segment_rotations"],
+            )
+            return
+
+        if positions is not None:
+            if self._filters is not None:
+                positions = self._filters.filter_3d(time, positions)
+
+            positions, _ = MayaUtil.to_maya_axes(
+                positions, None, self._up_axis, self._unit_conversion
+            )
+            self._marker_streamer.set_positions(positions, int(frame["framenumber"]))
+
+        if body_positions is not None:
+            if self._filters is not None:
+                body_positions, body_rotations = self._filters.filter_6d(
+                    time, body_positions, body_rotations
+                )
+
+            self._rigid_body_streamer.set_poses(
+                *MayaUtil.to_maya_axes(
+                    body_positions, body_rotations, self._up_axis, self._unit_conversion
+                )
+            )
+
+        if segment_ids is not None:
+            self._skeleton_streamer.set_poses(
+                segment_ids,
+                *MayaUtil.to_maya_axes(
+                    frame["segment_positions"],
+                    frame["segment_rotations"],
+                    self._up_axis,
+                    self._unit_conversion,
+                )
+            )
@@ -0,0 +1,122 @@
+import maya.cmds as cmds
+
+from qtm.arrays import get_3d_array, get_6d_arrays
+from qtm.filters import FilterBank
+from qtm.rotation import matrices_to_quaternions
+
+from mayautil import MayaUtil
+
+# Parameters for positions in millimeters.
+FILTER_PARAMETERS = {
+    "Exponential": dict(alpha=0.5),
+    "One Euro": dict(min_cutoff=1.0, beta=0.007, d_cutoff=1.0),
+    "Butterworth": dict(cutoff=6.0),
+}
+
+# Parameters for rotations as unit quaternions, whose components change by
+# about one per second where positions change by a thousand millimeters.
+ROTATION_FILTER_PARAMETERS = {
+    "Exponential": dict(alpha=0.5),
+    "One Euro": dict(min_cutoff=1.0, beta=5.0, d_cutoff=1.0),
+    "Butterworth": dict(cutoff=6.0),
+}
+
+
+class StreamFilters(object):
+    """Filters selected per marker group and per rigid body, applied to each
+    frame before it is written to the scene."""
+
+    def __init__(self, marker_streamer, rigid_body_streamer):
+        self._marker_streamer = marker_streamer
+        self._rigid_body_streamer = rigid_body_streamer
+        self._markers = FilterBank()
+        self._bodies = FilterBank()
+        self._up_axis = "z"
+        self._unit_conversion = 0.1
+
+    @property
+    def markers_active(self):
+        return len(self._markers) > 0
+
+    @property
+    def bodies_active(self):
+        return len(self._bodies) > 0
+
+    def marker_filter(self, group_name):
+        return self._markers.kind(group_name)
+
+    def set_marker_filter(self, group_name, kind):
+        self._markers.set_filter(
+            group_name,
+            self._marker_streamer.group_rows(group_name),
+            kind,
+            **FILTER_PARAMETERS.get(kind, {})
+        )
+
+    def refresh_marker_groups(self):
+        """Follow markers that have moved to another group."""
+        for group_name in self._markers:
+            rows = self._marker_streamer.group_rows(group_name)
+
+            if rows:
+                self._markers.set_rows(group_name, rows)
+            else:
+                self._markers.remove(group_name)
+
+    def body_filter(self, body_index):
+        return self._bodies.kind(body_index)
+
+    def set_body_filter(self, body_index, kind):
+        self._bodies.set_filter(
+            body_index,
+            [body_index],
+            kind,
+            rotation_parameters=ROTATION_FILTER_PARAMETERS.get(kind, {}),
+            **FILTER_PARAMETERS.get(kind, {})
+        )
+
+    def refresh_bodies(self, body_count):
+        """Drop the filters of bodies that are gone."""
+        for body_index in self._bodies:
+            if body_index >= body_count:
+                self._bodies.remove(body_index)
+
+    def clear(self):
+        self._markers.clear()
+        self._bodies.clear()
+
+    def reset(self):
+        self._up_axis = cmds.upAxis(q=True, axis=True)
+        self._markers.reset()
+        self._bodies.reset()
+
+    def filter_3d(self, time, positions):
+        if not self.markers_active:
+            return positions
+
+        positions, _ = self._markers.filter(time, positions)
+        return positions
+
+    def filter_6d(self, time, positions, rotations):
+        if not self.bodies_active:
+            return positions, rotations
+
+        return self._bodies.filter(time, positions, rotations)
+
+    def apply_3d(self, packet):
+        self._marker_streamer.component_info, positions = get_3d_array(packet)
+        positions = self.filter_3d(packet.timestamp * 1e-6, positions)
+        positions, _ = MayaUtil.to_maya_axes(positions, None, self._up_axis, self._unit_conversion)
+
+        self._marker_streamer.set_positions(positions, packet.framenumber)
+
+    def apply_6d(self, packet):
+        self._rigid_body_streamer.component_info, positions, matrices = get_6d_arrays(packet)
+        positions, rotations = self.filter_6d(
+            packet.timestamp * 1e-6, positions, matrices_to_quaternions(matrices)
+        )
+        positions, rotations = MayaUtil.to_maya_axes(
+            positions, rotations, self._up_axis, self._unit_conversion
+        )
+
+        self._rigid_body_streamer.set_poses(positions, rotations)
@@ -0,0 +1,159 @@
+from timeit import default_timer
+
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+
+import numpy as np
+
+from qtm.arrays import get_force_arrays, get_force_single_arrays
+from qtm.changes import WriteCache
+from qtm.forceplates import ForceDecimator
+from qtm.rotation import aim_quaternions
+
+from mayautil import MayaUtil
+
+# Transforms are named with the id of the force plate.
+NAME_FORMAT = "QTM_force_{}"
+
+# An arrow along X of length one.
+ARROW_POINTS = [(0, 0, 0), (1, 0, 0), (0.9, 0.04, 0), (1, 0, 0), (0.9, -0.04, 0)]
+
+
+class ForceStreamer(object):
+    """Drives an arrow per force plate from the force component.
+
+    Every arrow starts at the center of pressure of its plate, points along
+    the force and is scaled along X by the size of the force. The samples of
+    a plate are averaged down to the scene rate, see
+    :class:`qtm.forceplates.ForceDecimator`, and only the arrows that
+    changed are written. Arrows of plates without load are collapsed.
+    """
+
+    def __init__(self):
+        self._transform_fns = []
+        self._ids = None
+        self._up_axis = "z"
+        self._unit_conversion = 0.1
+        # Arrow length in Maya units per newton.
+        self.force_scale = 0.1
+        self.component_info = None
+        self.creation_time = None
+        self._decimator = ForceDecimator(rate=24.0)
+        self._write_cache = WriteCache(epsilon=1e-3)
+
+    def start(self, rate):
+        """Average the samples down to rate frames per second."""
+        self._decimator.rate = rate
+        self._decimator.reset()
+
+    def _packet_received(self, packet):
+        arrays = get_force_arrays(packet)
+
+        if arrays is not None:
+            self.component_info, ids, counts, _, forces, _, points = arrays
+        else:
+            self.component_info, ids, forces, _, points = get_force_single_arrays(packet)
+            counts = np.ones(len(ids), dtype=np.int64)
+
+        if self._ids is None or not np.array_equal(ids, self._ids):
+            self.create(ids)
+
+        loads = self._decimator.push(packet.timestamp * 1e-6, counts, forces, points)
+
+        if loads is None:
+            return
+
+        forces, centers = loads
+        positions, _ = MayaUtil.to_maya_axes(centers, None, self._up_axis, self._unit_conversion)
+        directions, _ = MayaUtil.to_maya_axes(forces, None, self._up_axis, 1.0)
+        self.set_poses(
+            positions, aim_quaternions(directions), np.linalg.norm(forces, axis=1) * self.force_scale
+        )
+
+    def set_poses(self, positions, rotations, lengths):
+        """Move the arrows to (n, 3) positions and (n, 4) x, y, z, w
+        quaternions given in Maya units and axes, with n lengths. Arrows with
+        a NaN length are held, arrows with a NaN position or rotation are
+        collapsed and arrows that did not change are not written."""
+        poses = np.column_stack((positions, rotations, lengths))
+        held = np.isnan(poses[:, 7])
+        unloaded = np.isnan(poses[:, :7]).any(axis=1) & ~held
+        poses[unloaded] = [0, 0, 0, 0, 0, 0, 1, 0]
+
+        rows = self._write_cache.changed(poses, np.flatnonzero(~held))
+
+        for i, pose in zip(rows.tolist(), poses[rows].tolist()):
+            transformFn = self._transform_fns[i]
+            transformFn.setRotation(om.MQuaternion(pose[3:7]), om.MSpace.kTransform)
+            transformFn.setTranslation(om.MVector(pose[:3]), om.MSpace.kTransform)
+            transformFn.setScale([pose[7], 1.0, 1.0])
+
+    def write_stats(self):
+        """Arrows written and skipped because they did not change."""
+        return self._write_cache.stats()
+
+    def nodes(self):
+        """Transforms that exist in the scene by force plate id."""
+        if self._ids is None:
+            return {}
+
+        return dict(
+            (plate_id, transformFn.object())
+            for plate_id, transformFn in zip(self._ids.tolist(), self._transform_fns)
+            if om.MObjectHandle(transformFn.object()).isValid()
+        )
+
+    def reset(self):
+        self._transform_fns = []
+        self._ids = None
+        self._decimator.reset()
+        self._write_cache.reset()
+
+    def create(self, ids):
+        """Find or create the arrows of the force plates with ids."""
+        start = default_timer()
+        self._up_axis = cmds.upAxis(q=True, axis=True)
+
+        names = [NAME_FORMAT.format(plate_id) for plate_id in ids.tolist()]
+        existing = MayaUtil.get_nodes_by_name(names)
+        modifier = om.MDagModifier()
+        transforms = []
+        created = []
+
+        for name in names:
+            transform = existing.get(name)
+
+            if transform is None:
+                transform = modifier.createNode("transform")
+                modifier.renameNode(transform, name)
+                created.append(transform)
+
+            transforms.append(transform)
+
+        modifier.doIt()
+
+        curveFn = om.MFnNurbsCurve()
+        knots = list(range(len(ARROW_POINTS)))
+
+        for transform in created:
+            curveFn.create(
+                [om.MPoint(point) for point in ARROW_POINTS],
+                knots,
+                1,
+                om.MFnNurbsCurve.kOpen,
+                False,
+                False,
+                transform,
+            )
+
+        self._transform_fns = [om.MFnTransform(transform) for transform in transforms]
+        self._ids = np.array(ids)
+        self._decimator.reset()
+        self._write_cache.invalidate()
+
+        self.creation_time = default_timer() - start
+        om.MGlobal.displayInfo(
+            "QTM Connect: created {} force plates in {:.1f} ms".format(
+                len(names), self.creation_time * 1000
+            )
+        )
@@ -0,0 +1,109 @@
+from timeit import default_timer
+
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+
+import numpy as np
+
+from qtm.arrays import get_gaze_arrays, last_samples
+from qtm.changes import WriteCache
+from qtm.rotation import aim_quaternions
+
+from mayautil import MayaUtil
+
+# Transforms are named with the index of the eye tracker.
+NAME_FORMAT = "QTM_gaze_{}"
+
+
+class GazeStreamer(object):
+    """Drives a transform per eye tracker from the gaze vector component.
+
+    Every transform sits at the eye position with its X axis aimed along
+    the gaze vector. Eye trackers send several samples per frame, only the
+    newest one of every tracker is shown. The aims of all trackers are
+    computed together and only the transforms that moved are written.
+    """
+
+    def __init__(self):
+        self._transform_fns = []
+        self._up_axis = "z"
+        self._unit_conversion = 0.1
+        self.component_info = None
+        self.creation_time = None
+        # Trackers that moved less than this, in Maya units and quaternion
+        # components, are not written.
+        self._write_cache = WriteCache(epsilon=1e-3)
+
+    def _packet_received(self, packet):
+        self.component_info, counts, _, vectors, positions = get_gaze_arrays(packet)
+
+        if len(counts) != len(self._transform_fns):
+            self.create(len(counts))
+
+        positions, _ = MayaUtil.to_maya_axes(
+            last_samples(counts, positions), None, self._up_axis, self._unit_conversion
+        )
+        directions, _ = MayaUtil.to_maya_axes(
+            last_samples(counts, vectors), None, self._up_axis, 1.0
+        )
+        self.set_poses(positions, aim_quaternions(directions))
+
+    def set_poses(self, positions, rotations):
+        """Move the trackers to (n, 3) positions and (n, 4) x, y, z, w
+        quaternions given in Maya units and axes. Trackers without a sample,
+        NaN rows, are held and trackers that did not move are not written."""
+        poses = np.hstack((positions, rotations))
+        rows = self._write_cache.changed(poses, np.flatnonzero(~np.isnan(poses).any(axis=1)))
+
+        for i, pose in zip(rows.tolist(), poses[rows].tolist()):
+            transformFn = self._transform_fns[i]
+            transformFn.setRotation(om.MQuaternion(pose[3:]), om.MSpace.kTransform)
+            transformFn.setTranslation(om.MVector(pose[:3]), om.MSpace.kTransform)
+
+    def write_stats(self):
+        """Trackers written and skipped because they did not move."""
+        return self._write_cache.stats()
+
+    def nodes(self):
+        """Transforms that exist in the scene by tracker index."""
+        return dict(
+            (i, transformFn.object())
+            for i, transformFn in enumerate(self._transform_fns)
+            if om.MObjectHandle(transformFn.object()).isValid()
+        )
+
+    def reset(self):
+        self._transform_fns = []
+        self._write_cache.reset()
+
+    def create(self, count):
+        """Find or create the transforms of count trackers."""
+        start = default_timer()
+        self._up_axis = cmds.upAxis(q=True, axis=True)
+
+        names = [NAME_FORMAT.format(i) for i in range(count)]
+        existing = MayaUtil.get_nodes_by_name(names)
+        modifier = om.MDagModifier()
+        transforms = []
+
+        for name in names:
+            transform = existing.get(name)
+
+            if transform is None:
+                transform = modifier.createNode("transform")
+                modifier.renameNode(transform, name)
+                modifier.createNode("locator", transform)
+
+            transforms.append(transform)
+
+        modifier.doIt()
+
+        self._transform_fns = [om.MFnTransform(transform) for transform in transforms]
+        self._write_cache.invalidate()
+
+        self.creation_time = default_timer() - start
+        om.MGlobal.displayInfo(
+            "QTM Connect: created {} gaze vectors in {:.1f} ms".format(
+                count, self.creation_time * 1000
+            )
+        )
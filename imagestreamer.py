@@ -0,0 +1,102 @@
+import os
+import tempfile
+
+from PySide2 import QtCore
+
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+
+from qtm.images import ImageFiles
+
+# Image planes are named with the id of the camera.
+NAME_FORMAT = "QTM_camera_{}"
+
+# How often image planes are updated, in milliseconds.
+DISPLAY_INTERVAL = 33
+
+
+class ImageStreamer(object):
+    """Shows the camera images of QTM on an image plane per camera.
+
+    Images are written to files on a thread of their own, see
+    :class:`qtm.images.ImageFiles`, and the image planes are pointed at the
+    newest file of their camera at display rate. Images that arrive faster
+    than they are written or shown are dropped, so the video never lags
+    behind the motion capture data.
+
+    :param directory: Directory of the image files, a directory in the
+        temporary directory by default.
+    """
+
+    def __init__(self, directory=None, parent=None):
+        self._directory = directory or os.path.join(tempfile.gettempdir(), "qtm_connect_images")
+        self._files = None
+        self._planes = {}
+        self.component_info = None
+
+        self._timer = QtCore.QTimer(parent)
+        self._timer.setInterval(DISPLAY_INTERVAL)
+        self._timer.timeout.connect(self.update)
+
+    @property
+    def active(self):
+        return self._files is not None
+
+    def start(self):
+        if self._files is not None:
+            return
+
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+
+        self._files = ImageFiles(self._directory)
+        self._timer.start()
+
+    def stop(self):
+        if self._files is None:
+            return
+
+        self._timer.stop()
+        self._files.close()
+        self._files = None
+
+    def _packet_received(self, packet):
+        if self._files is None:
+            return
+
+        self.component_info, images = packet.get_image()
+        self._files.put(images)
+
+    def update(self):
+        """Point the image planes at the newest images."""
+        for camera, path in self._files.take().items():
+            plane = self._planes.get(camera)
+
+            if plane is None or not cmds.objExists(plane):
+                plane = self._planes[camera] = self.create(camera, path)
+
+            cmds.setAttr(plane + ".imageName", path, type="string")
+
+        if self._files.error is not None:
+            om.MGlobal.displayWarning("QTM Connect: " + str(self._files.error))
+            self._files.error = None
+
+    def write_stats(self):
+        """Images written and skipped because newer ones came first."""
+        return self._files.stats() if self._files is not None else None
+
+    def reset(self):
+        self._planes = {}
+
+    def create(self, camera, path):
+        """Find or create the image plane of a camera."""
+        name = NAME_FORMAT.format(camera)
+
+        if cmds.objExists(name):
+            planes = cmds.listRelatives(name, shapes=True, type="imagePlane")
+
+            if planes:
+                return planes[0]
+
+        _, plane = cmds.imagePlane(name=name, fileName=path)
+        return plane
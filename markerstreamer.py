@@ -1,25 +1,56 @@
-import hashlib, os
-
-from PySide2 import QtGui
-from PySide2 import QtWidgets
+import os
+from collections import OrderedDict
+from timeit import default_timer
 
 import maya.cmds as cmds
 import maya.api.OpenMaya as om
 
-from mayaui import load_icon
+from componentlist import ComponentItem, ComponentListModel
 from mayautil import MayaUtil
 
+# Without numpy occluded markers are always held at their last position.
+try:
+    import numpy as np
+    from qtm.arrays import get_3d_array
+    from qtm.changes import WriteCache
+    from qtm.gaps import GapTracker
+except ImportError:
+    np = None
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__)) + "/assets/"
+
+# Hold keeps occluded markers where they were last seen, Hide hides them and
+# Interpolate on bake holds them while streaming. Baking a take holds the
+# gaps, keys the visibility or fills the gaps by interpolation accordingly.
+GAP_POLICIES = ("Hold", "Hide", "Interpolate on bake")
+
 
 class MarkerStreamer:
-    def __init__(self, qtmrt, listWidget, textWidget):
+    def __init__(self, qtmrt, listView, textWidget):
         self._qtm = qtmrt
-        self._listWidget = listWidget
+        self._listView = listView
+        self._model = ComponentListModel(listView)
         self._textWidget = textWidget
         self._markers = None
+        # Group name -> OrderedDict of label index -> label, and the reverse
+        # index from label index to group name.
         self._marker_groups = None
+        self._label_groups = {}
+        self._group_nodes = {}
+        self._locators = []
+        self._transform_fns = []
         self._unit_conversion = 0.1
-
+        self.creation_time = None
+        self.component_info = None
+        self.gap_policy = GAP_POLICIES[0]
+        self._gaps = GapTracker() if np is not None else None
+        self._hidden = set()
+        # Markers that moved less than this, in Maya units, are not written.
+        self._write_cache = WriteCache(epsilon=1e-3) if np is not None else None
+
+        self._listView.setModel(self._model)
         self._qtm.connectedChanged.connect(self._connected_changed)
+        self._qtm.settingsChanged.connect(self._settings_changed)
         self._connected_changed(self._qtm.connected)
 
     def _connected_changed(self, connected):
@@ -29,15 +60,58 @@ class MarkerStreamer:
             self._init()
             self._update_ui()
         else:
-            self._markers = None
-            self._marker_groups = None
-            self._listWidget.clear()
+            self._clear()
+            self._model.clear()
+
+    def _settings_changed(self, settings):
+        labels = list(settings.labels)
+
+        if self._markers is not None and [label.name for label in labels] == [
+            label.name for label in self._markers
+        ]:
+            # The same markers, keep the groups but take the new colors.
+            self._markers = labels
+
+            for marker_group in self._marker_groups.values():
+                for label_index in marker_group:
+                    marker_group[label_index] = labels[label_index]
+        else:
+            self._clear()
+
+        self._init()
+        self._update_ui()
+
+    def _clear(self):
+        # The locators stay in the scene, do not leave them hidden.
+        self._set_visibility(list(self._hidden), None)
+        self._markers = None
+        self._marker_groups = None
+        self._label_groups = {}
+        self._group_nodes = {}
+        self._locators = []
+        self._transform_fns = []
+
+        if self._gaps is not None:
+            self._gaps.reset()
+            self._write_cache.reset()
 
     def _packet_received(self, packet):
-        _, markers = packet.get_3d_markers()
+        if np is not None:
+            self.component_info, positions = get_3d_array(packet)
+            positions, _ = MayaUtil.to_maya_axes(
+                positions, None, self._up_axis, self._unit_conversion
+            )
+            self.set_positions(positions, packet.framenumber)
+            return
+
+        self.component_info, markers = packet.get_3d_markers()
 
         for i, marker in enumerate(markers):
-            transformFn = self._markers[i]["transformFn"]
+            # Occluded markers are NaN, keep them where they were.
+            if marker.x != marker.x:
+                continue
+
+            transformFn = self._transform_fns[i]
 
             if self._up_axis == "y":
                 translation = om.MVector(
@@ -54,109 +128,231 @@ class MarkerStreamer:
 
             transformFn.setTranslation(translation, om.MSpace.kTransform)
 
-    def _init(self):
-        self._qtm_settings = self._qtm.get_settings("3d")
+    def set_positions(self, positions, framenumber=None):
+        """Move the markers to (n, 3) positions given in Maya units and axes,
+        in label order. Occluded markers, NaN rows, are handled by the gap
+        policy and only the locators whose visibility changed are touched."""
+        visible, changed = self._gaps.update(positions, framenumber)
 
-        if self._qtm_settings == None:
+        if self.gap_policy == "Hide" and len(changed):
+            self._set_visibility(changed.tolist(), visible)
+
+        rows = self._write_cache.changed(positions, np.flatnonzero(visible))
+
+        for i, position in zip(rows.tolist(), positions[rows].tolist()):
+            self._transform_fns[i].setTranslation(om.MVector(position), om.MSpace.kTransform)
+
+    def set_gap_policy(self, policy):
+        if policy == self.gap_policy:
             return
 
-        if self._marker_groups is None:
-            self._markers = []
-            self._marker_groups = {"mocapMarkers": []}
+        if self.gap_policy == "Hide":
+            self._set_visibility(list(self._hidden), None)
 
-            for i, label in enumerate(self._qtm_settings["The_3D"]["Label"]):
-                label["Index"] = i
+        self.gap_policy = policy
 
-                self._markers.append(label)
-                self._marker_groups["mocapMarkers"].append(label)
+        if self._gaps is not None:
+            self._gaps.reset()
 
-    def _update_ui(self):
-        self._listWidget.clear()
+    def write_stats(self):
+        """Markers written and skipped because they did not move."""
+        return self._write_cache.stats() if self._write_cache is not None else None
+
+    def invalidate_writes(self):
+        """Write every marker again, they were written outside of
+        set_positions."""
+        if self._write_cache is not None:
+            self._write_cache.invalidate()
+
+    # visible is None shows the locators.
+    def _set_visibility(self, label_indices, visible):
+        for i in label_indices:
+            locator = self._locators[i]
+
+            if locator is None or not om.MObjectHandle(locator).isValid():
+                continue
+
+            show = visible is None or bool(visible[i])
+            om.MFnDependencyNode(locator).findPlug("visibility", False).setBool(show)
 
-        if self._marker_groups == None:
+            if show:
+                self._hidden.discard(i)
+            else:
+                self._hidden.add(i)
+
+    def _init(self):
+        self._qtm_settings = self._qtm.settings
+
+        if self._qtm_settings == None:
             return
 
-        for group_name, marker_group in self._marker_groups.items():
-            group_icon = load_icon(
-                os.path.dirname(os.path.abspath(__file__)) + "/assets/transform.svg",
-                QtGui.QColor(255, 0, 0),
+        if self._marker_groups is None:
+            self._markers = list(self._qtm_settings.labels)
+            self._marker_groups = OrderedDict(
+                [("mocapMarkers", OrderedDict((label.index, label) for label in self._markers))]
             )
-            group_item = QtWidgets.QListWidgetItem(group_icon, group_name)
-
-            self._listWidget.addItem(group_item)
-
-            for label in marker_group:
-                red = long(label["RGBColor"]) >> 16
-                green = (long(label["RGBColor"]) >> 8) & 0x00FF
-                blue = long(label["RGBColor"]) & 0x0000FF
-                marker_color = QtGui.QColor(red, green, blue)
-                icon = load_icon(
-                    os.path.dirname(os.path.abspath(__file__))
-                    + "/assets/marker_64x32.png",
-                    marker_color,
+            self._label_groups = dict((label.index, "mocapMarkers") for label in self._markers)
+            self._locators = [None] * len(self._markers)
+            self._transform_fns = [None] * len(self._markers)
+
+    def _update_ui(self):
+        items = []
+
+        if self._marker_groups is not None:
+            for group_name, marker_group in self._marker_groups.items():
+                items.append(
+                    ComponentItem(
+                        group_name, group_name, ASSET_DIR + "transform.svg", (255, 0, 0)
+                    )
                 )
-                item = QtWidgets.QListWidgetItem(icon, label["Name"])
 
-                self._listWidget.addItem(item)
+                for label in marker_group.values():
+                    items.append(
+                        ComponentItem(
+                            label.index,
+                            label.name,
+                            ASSET_DIR + "marker_64x32.png",
+                            label.rgb,
+                        )
+                    )
+
+        self._model.update(items)
 
     def create(self):
+        if self._marker_groups is None:
+            return
+
+        start = default_timer()
         modifier = om.MDagModifier()
+        existing = MayaUtil.get_nodes_by_name(
+            list(self._marker_groups.keys()) + [label.name for label in self._markers]
+        )
 
-        if self._marker_groups is not None:
-            for group_name, marker_group in self._marker_groups.items():
-                parent = MayaUtil.get_node_by_name(group_name)
+        # Every create, rename and reparent is queued and committed at once.
+        for group_name, marker_group in self._marker_groups.items():
+            parent = existing.get(group_name)
 
-                if parent is None:
-                    parent = modifier.createNode("transform")
+            if parent is None:
+                parent = modifier.createNode("transform")
 
-                    modifier.renameNode(parent, group_name)
-                    modifier.doIt()
+                modifier.renameNode(parent, group_name)
 
-                for i, marker in enumerate(marker_group):
-                    locator = MayaUtil.get_node_by_name(marker["Name"])
+            self._group_nodes[group_name] = parent
 
-                    if locator is None:
-                        locator = modifier.createNode("locator")
+            for marker in marker_group.values():
+                locator = existing.get(marker.name)
+
+                if locator is None:
+                    locator = modifier.createNode("locator")
+
+                    modifier.renameNode(locator, marker.name)
+
+                modifier.reparentNode(locator, parent)
+
+                self._locators[marker.index] = locator
+
+        modifier.doIt()
+
+        for i, locator in enumerate(self._locators):
+            self._transform_fns[i] = om.MFnTransform(locator)
+
+        # Start over with every marker assumed visible.
+        self._set_visibility(list(self._hidden), None)
+
+        if self._gaps is not None:
+            self._gaps.reset()
+            self._write_cache.invalidate()
+
+        self.creation_time = default_timer() - start
+        om.MGlobal.displayInfo(
+            "QTM Connect: created {} markers in {:.1f} ms".format(
+                len(self._locators), self.creation_time * 1000
+            )
+        )
 
-                        modifier.renameNode(locator, marker["Name"])
+    def group_rows(self, group_name):
+        """Label indices, which are also the rows of the 3D data, of a group."""
+        if self._marker_groups is None or group_name not in self._marker_groups:
+            return []
 
-                    modifier.reparentNode(locator, parent)
-                    modifier.doIt()
+        return list(self._marker_groups[group_name].keys())
 
-                    transformFn = om.MFnTransform(locator)
-                    self._markers[marker["Index"]]["locator"] = locator
-                    self._markers[marker["Index"]]["transformFn"] = transformFn
+    def group_of(self, label_index):
+        return self._label_groups.get(label_index)
+
+    def nodes(self):
+        """Locators that exist in the scene by label index."""
+        return dict(
+            (i, locator)
+            for i, locator in enumerate(self._locators)
+            if locator is not None and om.MObjectHandle(locator).isValid()
+        )
 
     def group_markers(self):
-        new_group = []
         new_group_name = self._textWidget.text()
-        selected = self._listWidget.selectedItems()
 
-        for item in selected:
-            for group_name, marker_group in self._marker_groups.items():
-                # Remove marker from existing groups.
-                for i, marker in enumerate(marker_group):
-                    if item.text() == marker["Name"]:
-                        new_group.append(marker_group[i])
+        if self._marker_groups is None or new_group_name == "":
+            return
 
-                        self._markers[marker["Index"]] = marker
+        # Group rows are keyed by name, marker rows by label index.
+        selected = sorted(
+            key
+            for key in (
+                index.data(ComponentListModel.KeyRole)
+                for index in self._listView.selectionModel().selectedRows()
+            )
+            if key in self._label_groups
+        )
+        new_group = self._marker_groups.setdefault(new_group_name, OrderedDict())
+        moved = []
 
-                        del marker_group[i]
+        for label_index in selected:
+            group_name = self._label_groups[label_index]
 
-        for group_name, marker_group in self._marker_groups.items():
-            if len(marker_group) == 0:
-                del self._marker_groups[group_name]
+            if group_name == new_group_name:
+                continue
+
+            old_group = self._marker_groups[group_name]
+            new_group[label_index] = old_group.pop(label_index)
+            self._label_groups[label_index] = new_group_name
+            moved.append(label_index)
 
-        self._marker_groups[new_group_name + " temp"] = new_group
+            if not old_group:
+                del self._marker_groups[group_name]
 
-        if new_group_name in self._marker_groups:
-            random_name = hashlib.md5(str(time.time())).hexdigest()
-            self._marker_groups[random_name] = self._marker_groups[new_group_name]
+        if not new_group:
+            del self._marker_groups[new_group_name]
 
-        self._marker_groups[new_group_name] = self._marker_groups[
-            new_group_name + " temp"
+        if moved:
+            self._update_ui()
+            self._reparent(moved, new_group_name)
+
+    # Moves already created locators under the group's transform in one
+    # modifier call instead of rebuilding the whole hierarchy.
+    def _reparent(self, label_indices, group_name):
+        locators = [
+            self._locators[i]
+            for i in label_indices
+            if self._locators[i] is not None and om.MObjectHandle(self._locators[i]).isValid()
         ]
-        del self._marker_groups[new_group_name + " temp"]
 
-        self._update_ui()
-        self.create()
+        if not locators:
+            return
+
+        modifier = om.MDagModifier()
+        parent = self._group_nodes.get(group_name)
+
+        if parent is None or not om.MObjectHandle(parent).isValid():
+            parent = MayaUtil.get_node_by_name(group_name)
+
+        if parent is None:
+            parent = modifier.createNode("transform")
+
+            modifier.renameNode(parent, group_name)
+
+        self._group_nodes[group_name] = parent
+
+        for locator in locators:
+            modifier.reparentNode(locator, parent)
+
+        modifier.doIt()
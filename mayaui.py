@@ -1,4 +1,5 @@
 import os, sys
+from collections import OrderedDict
 
 from PySide2 import QtCore
 from PySide2 import QtGui
@@ -110,8 +111,27 @@ cmds.evalDeferred(qtm_connect_maya.mayaui.startup())
     f.truncate()
     f.close()
 
+# Recolored icons keyed by (path, rgb). Least recently used icons are evicted
+# once the cache holds more than _ICON_CACHE_SIZE entries.
+_ICON_CACHE_SIZE = 512
+_icon_cache = OrderedDict()
+
 # Returns a QIcon with the image at path recolored with the specified color.
 def load_icon(path, color):
+    key = (path, color.rgb())
+    icon = _icon_cache.pop(key, None)
+
+    if icon is None:
+        icon = _recolor_icon(path, color)
+
+        if len(_icon_cache) >= _ICON_CACHE_SIZE:
+            _icon_cache.popitem(last=False)
+
+    _icon_cache[key] = icon
+
+    return icon
+
+def _recolor_icon(path, color):
     pixmap = QtGui.QPixmap(path)
     icon = QtGui.QIcon()
     mask = pixmap.createMaskFromColor(QtGui.QColor(0x0, 0x0, 0x0), QtCore.Qt.MaskOutColor)
@@ -15,4 +15,42 @@ class MayaUtil:
 
             dagIterator.next()
 
-        return None
\ No newline at end of file
+        return None
+
+    # Looks up several nodes in a single walk over the DAG. Names that are
+    # not found are left out of the returned dictionary.
+    @staticmethod
+    def get_nodes_by_name(names):
+        names = set(names)
+        nodes = {}
+        dagIterator = om.MItDag()
+        dagNodeFn = om.MFnDagNode()
+
+        while (not dagIterator.isDone()) and len(nodes) < len(names):
+            dagObject = dagIterator.currentItem()
+            dagNodeFn.setObject(dagObject)
+            name = dagNodeFn.name()
+
+            if name in names and name not in nodes:
+                nodes[name] = dagObject
+
+            dagIterator.next()
+
+        return nodes
+
+    # Converts QTM millimeters and axes to Maya units and axes for all rows
+    # of numpy arrays of positions and x, y, z, w quaternions.
+    @staticmethod
+    def to_maya_axes(positions, rotations, up_axis, unit_conversion):
+        if positions is not None:
+            positions = positions * unit_conversion
+
+            if up_axis == "y":
+                positions = positions[:, [0, 2, 1]]
+                positions[:, 0] *= -1
+
+        if rotations is not None and up_axis == "y":
+            rotations = rotations[:, [0, 2, 1, 3]]
+            rotations[:, 0] *= -1
+
+        return positions, rotations
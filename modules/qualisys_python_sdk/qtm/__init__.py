@@ -10,6 +10,7 @@ if PYTHON3:
     from .discovery import Discover
     from .reboot import reboot
     from .qrt import connect, QRTConnection
+    from .reconnect import ReconnectingConnection
     from .protocol import QRTCommandException
     from .control import TakeControl
 
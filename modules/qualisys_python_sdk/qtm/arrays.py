@@ -0,0 +1,353 @@
+""" NumPy views of packet components
+
+The getters return the component info and arrays instead of lists of named
+tuples. Where the wire layout allows it the arrays share memory with the
+packet data, so decoding does not depend on the number of markers or bodies.
+Like the getters of :class:`qtm.QRTPacket` they return None when the
+component is not in the packet. Requires numpy.
+
+::
+
+    from qtm.arrays import get_6d_arrays
+    info, positions, rotations = get_6d_arrays(packet)
+
+"""
+
+import struct
+
+import numpy as np
+
+from qtm.packet import (
+    QRTPacket,
+    QRTComponentType,
+    RT2DComponent,
+    RT3DComponent,
+    RT6DComponent,
+    RTAnalogComponent,
+    RTAnalogDevice,
+    RTForceComponent,
+    RTForcePlate,
+    RTGazeVectorComponent,
+    RTGazeVector,
+    RTSampleNumber,
+    RTSkeletonComponent,
+    RTSegmentCount,
+)
+
+# pylint: disable=C0103, W0212
+
+MARKER_2D = np.dtype([("x", "<i4"), ("y", "<i4"), ("d_x", "<i2"), ("d_y", "<i2")])
+
+# The camera header of RT2DCamera with the status flag as a number.
+CAMERA_2D = struct.Struct("<iB")
+
+BODY_6D = np.dtype([("position", "<f4", (3,)), ("rotation", "<f4", (9,))])
+
+FORCE_SAMPLE = np.dtype(
+    [("force", "<f4", (3,)), ("moment", "<f4", (3,)), ("point", "<f4", (3,))]
+)
+
+FORCE_SINGLE = np.dtype([("id", "<i4"), ("sample", FORCE_SAMPLE)])
+
+GAZE_SAMPLE = np.dtype([("vector", "<f4", (3,)), ("position", "<f4", (3,))])
+
+SEGMENT = np.dtype(
+    [("id", "<i4"), ("position", "<f4", (3,)), ("rotation", "<f4", (4,))]
+)
+
+
+def _component(packet, component_type, base_component):
+    position = packet.components.get(component_type, None)
+
+    if position is None:
+        return None, None
+
+    return QRTPacket._get_exact(base_component, packet.data, position)
+
+
+def get_3d_array(packet):
+    """Get 3D markers as a (markers, 3) float32 array.
+
+    Markers that are not visible are NaN.
+    """
+    position, info = _component(packet, QRTComponentType.Component3d, RT3DComponent)
+
+    if info is None:
+        return None
+
+    markers = np.frombuffer(
+        packet.data, dtype="<f4", count=info.marker_count * 3, offset=position
+    )
+    return info, markers.reshape(-1, 3)
+
+
+class Markers2D(object):
+    """2D markers of every camera of a packet.
+
+    The camera headers are read once to find where the markers of every
+    camera start, then the markers of any camera are a structured array
+    view of the packet data with the fields of :class:`qtm.packet.RT2DMarker`.
+
+    :ivar counts: Number of markers of every camera.
+    :ivar offsets: Position of the first marker of every camera in the
+        packet data.
+    :ivar status_flags: Status flag of every camera.
+    """
+
+    def __init__(self, data, position, camera_count):
+        self.data = data
+        self.counts = np.empty(camera_count, dtype=np.int64)
+        self.offsets = np.empty(camera_count, dtype=np.int64)
+        self.status_flags = np.empty(camera_count, dtype=np.uint8)
+        unpack_from = CAMERA_2D.unpack_from
+
+        for camera in range(camera_count):
+            count, flag = unpack_from(data, position)
+            position += CAMERA_2D.size
+            self.counts[camera] = count
+            self.offsets[camera] = position
+            self.status_flags[camera] = flag
+            position += MARKER_2D.itemsize * count
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __getitem__(self, camera):
+        """Markers of a camera as a (markers,) MARKER_2D array."""
+        return np.frombuffer(
+            self.data,
+            dtype=MARKER_2D,
+            count=int(self.counts[camera]),
+            offset=int(self.offsets[camera]),
+        )
+
+    def __iter__(self):
+        for camera in range(len(self)):
+            yield self[camera]
+
+    def all(self):
+        """Markers of all cameras in camera order, a copy, and the camera of
+        every marker."""
+        cameras = np.repeat(np.arange(len(self)), self.counts)
+
+        if not len(self):
+            return np.empty(0, MARKER_2D), cameras
+
+        return np.concatenate(list(self)), cameras
+
+
+def get_2d_arrays(packet, linearized=False):
+    """Get 2D markers as a :class:`Markers2D` of the component.
+
+    :param linearized: Get the linearized markers instead.
+    """
+    component_type = (
+        QRTComponentType.Component2dLin if linearized else QRTComponentType.Component2d
+    )
+    position, info = _component(packet, component_type, RT2DComponent)
+
+    if info is None:
+        return None
+
+    return info, Markers2D(packet.data, position, info.camera_count)
+
+
+def get_6d_arrays(packet):
+    """Get 6D data as (bodies, 3) positions and (bodies, 3, 3) rotation matrices.
+
+    QTM sends the matrices column by column, the returned matrices are
+    transposed views so that ``rotations[i].dot(v)`` rotates v.
+    """
+    position, info = _component(packet, QRTComponentType.Component6d, RT6DComponent)
+
+    if info is None:
+        return None
+
+    bodies = np.frombuffer(
+        packet.data, dtype=BODY_6D, count=info.body_count, offset=position
+    )
+    rotations = bodies["rotation"].reshape(-1, 3, 3).transpose(0, 2, 1)
+    return info, bodies["position"], rotations
+
+
+def get_skeleton_arrays(packet):
+    """Get the segments of all skeletons as ids, (segments, 3) positions and
+    (segments, 4) quaternions in x, y, z, w order.
+
+    Segments of all skeletons are concatenated in the order QTM sends them.
+    """
+    position, info = _component(
+        packet, QRTComponentType.ComponentSkeleton, RTSkeletonComponent
+    )
+
+    if info is None:
+        return None
+
+    skeletons = []
+
+    for _ in range(info.skeleton_count):
+        position, count = QRTPacket._get_exact(RTSegmentCount, packet.data, position)
+        skeletons.append(
+            np.frombuffer(
+                packet.data, dtype=SEGMENT, count=count.segment_count, offset=position
+            )
+        )
+        position += SEGMENT.itemsize * count.segment_count
+
+    if len(skeletons) == 1:
+        segments = skeletons[0]
+    else:
+        segments = np.concatenate(skeletons) if skeletons else np.empty(0, SEGMENT)
+
+    return info, segments["id"], segments["position"], segments["rotation"]
+
+
+def get_analog_arrays(packet):
+    """Get analog data as a list of device, sample number and a
+    (channels, samples) float32 array per device.
+
+    QTM sends the samples channel by channel, so the arrays are views of the
+    packet data. Devices without new samples have an empty array and sample
+    number None.
+    """
+    position, info = _component(
+        packet, QRTComponentType.ComponentAnalog, RTAnalogComponent
+    )
+
+    if info is None:
+        return None
+
+    devices = []
+
+    for _ in range(info.device_count):
+        position, device = QRTPacket._get_exact(RTAnalogDevice, packet.data, position)
+        sample_number = None
+
+        if device.sample_count > 0:
+            position, sample = QRTPacket._get_exact(RTSampleNumber, packet.data, position)
+            sample_number = sample.sample_number
+
+        count = device.channel_count * device.sample_count
+        samples = np.frombuffer(packet.data, dtype="<f4", count=count, offset=position)
+        devices.append(
+            (device, sample_number, samples.reshape(device.channel_count, device.sample_count))
+        )
+        position += 4 * count
+
+    return devices
+
+
+def get_force_arrays(packet):
+    """Get the force samples of all force plates.
+
+    Force plates usually run faster than the cameras and send several
+    samples per frame. The samples of all plates are concatenated in plate
+    order, they are views of the packet data when there is a single plate.
+
+    :returns: Component info, the ids, number of samples and force number of
+        the first sample of every plate, and (samples, 3) forces, moments and
+        application points.
+    """
+    position, info = _component(packet, QRTComponentType.ComponentForce, RTForceComponent)
+
+    if info is None:
+        return None
+
+    ids = np.zeros(info.plate_count, dtype=np.int64)
+    counts = np.zeros(info.plate_count, dtype=np.int64)
+    force_numbers = np.zeros(info.plate_count, dtype=np.int64)
+    plates = []
+
+    for i in range(info.plate_count):
+        position, plate = QRTPacket._get_exact(RTForcePlate, packet.data, position)
+        ids[i], counts[i], force_numbers[i] = plate
+        plates.append(
+            np.frombuffer(packet.data, dtype=FORCE_SAMPLE, count=plate.force_count, offset=position)
+        )
+        position += FORCE_SAMPLE.itemsize * plate.force_count
+
+    if len(plates) == 1:
+        samples = plates[0]
+    else:
+        samples = np.concatenate(plates) if plates else np.empty(0, FORCE_SAMPLE)
+
+    return (
+        info,
+        ids,
+        counts,
+        force_numbers,
+        samples["force"],
+        samples["moment"],
+        samples["point"],
+    )
+
+
+def get_force_single_arrays(packet):
+    """Get the latest force sample of all force plates as ids and (plates, 3)
+    forces, moments and application points, views of the packet data."""
+    position, info = _component(
+        packet, QRTComponentType.ComponentForceSingle, RTForceComponent
+    )
+
+    if info is None:
+        return None
+
+    plates = np.frombuffer(
+        packet.data, dtype=FORCE_SINGLE, count=info.plate_count, offset=position
+    )
+    samples = plates["sample"]
+    return info, plates["id"], samples["force"], samples["moment"], samples["point"]
+
+
+def get_gaze_arrays(packet):
+    """Get the gaze vector samples of all eye trackers.
+
+    Eye trackers usually run faster than the cameras and send several
+    samples per frame. The samples of all trackers are concatenated in
+    tracker order, they are views of the packet data when there is a single
+    tracker.
+
+    :returns: Component info, the number of samples and sample number of the
+        first sample of every tracker, -1 for trackers without samples, and
+        (samples, 3) gaze vectors and eye positions.
+    """
+    position, info = _component(
+        packet, QRTComponentType.ComponentGazeVector, RTGazeVectorComponent
+    )
+
+    if info is None:
+        return None
+
+    counts = np.zeros(info.vector_count, dtype=np.int64)
+    sample_numbers = np.full(info.vector_count, -1, dtype=np.int64)
+    trackers = []
+
+    for i in range(info.vector_count):
+        position, gaze_vector = QRTPacket._get_exact(RTGazeVector, packet.data, position)
+
+        if gaze_vector.sample_count > 0:
+            position, sample = QRTPacket._get_exact(RTSampleNumber, packet.data, position)
+            counts[i] = gaze_vector.sample_count
+            sample_numbers[i] = sample.sample_number
+            trackers.append(
+                np.frombuffer(
+                    packet.data, dtype=GAZE_SAMPLE, count=gaze_vector.sample_count, offset=position
+                )
+            )
+            position += GAZE_SAMPLE.itemsize * gaze_vector.sample_count
+
+    if len(trackers) == 1:
+        samples = trackers[0]
+    else:
+        samples = np.concatenate(trackers) if trackers else np.empty(0, GAZE_SAMPLE)
+
+    return info, counts, sample_numbers, samples["vector"], samples["position"]
+
+
+def last_samples(counts, values):
+    """The last of the samples of every tracker, as concatenated by
+    :func:`get_gaze_arrays`, NaN for trackers without samples."""
+    result = np.full((len(counts),) + values.shape[1:], np.nan)
+    has_samples = counts > 0
+    result[has_samples] = values[np.cumsum(counts)[has_samples] - 1]
+    return result
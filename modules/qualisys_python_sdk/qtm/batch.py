@@ -0,0 +1,231 @@
+""" Decoding many packets of the same layout at once
+
+While the markers, bodies and skeletons of a capture stay the same, every
+packet has the same layout: each component is at the same place in every
+packet. :class:`PacketLayout` finds the places in one packet and
+:func:`decode_packets` copies the components of any number of packets into
+arrays given by the caller, a few NumPy copies per block of frames instead
+of Python objects for every frame. Requires numpy.
+
+::
+
+    layout = PacketLayout(QRTPacket(packets[0]))
+    arrays = layout.empty(len(packets), "positions", "body_positions")
+    count = decode_packets(packets, layout, **arrays)
+
+"""
+
+import numpy as np
+
+from qtm.arrays import BODY_6D, SEGMENT
+from qtm.packet import (
+    QRTPacket,
+    QRTComponentType,
+    RT3DComponent,
+    RT6DComponent,
+    RTSkeletonComponent,
+    RTSegmentCount,
+)
+from qtm.takes import columns
+
+# pylint: disable=C0103, W0212
+
+# Count fields, 4 bytes each, at the start of the component info.
+COUNT_SIZE = 4
+
+# Component size and type in front of every component.
+COMPONENT_HEADER_SIZE = 8
+
+# Arrays of the segments by field.
+SEGMENT_ARRAYS = (
+    ("segment_ids", "id"),
+    ("segment_positions", "position"),
+    ("segment_rotations", "rotation"),
+)
+
+
+class PacketLayout(object):
+    """Places of the 3D, 6D and skeleton components in a packet.
+
+    :param packet: A :class:`qtm.QRTPacket` with the layout.
+    :ivar size: Size of the packets.
+    :ivar marker_count: Markers per frame.
+    :ivar body_count: Bodies per frame.
+    :ivar segment_count: Segments per frame, of all skeletons.
+    """
+
+    def __init__(self, packet):
+        data = packet.data
+        self.size = len(data)
+        self.marker_count = self.body_count = self.segment_count = 0
+        self._markers = None
+        self._bodies = None
+        self._skeletons = []
+
+        # Byte ranges that are the same in every packet of the layout: the
+        # component count, the component headers and the counts of markers,
+        # bodies and segments.
+        self._fixed = [(12, 16)]
+
+        for position in packet.components.values():
+            self._fixed.append((position - COMPONENT_HEADER_SIZE, position))
+
+        position = packet.components.get(QRTComponentType.Component3d)
+
+        if position is not None:
+            self._fixed.append((position, position + COUNT_SIZE))
+            position, info = QRTPacket._get_exact(RT3DComponent, data, position)
+            self._markers = position
+            self.marker_count = info.marker_count
+
+        position = packet.components.get(QRTComponentType.Component6d)
+
+        if position is not None:
+            self._fixed.append((position, position + COUNT_SIZE))
+            position, info = QRTPacket._get_exact(RT6DComponent, data, position)
+            self._bodies = position
+            self.body_count = info.body_count
+
+        position = packet.components.get(QRTComponentType.ComponentSkeleton)
+
+        if position is not None:
+            self._fixed.append((position, position + COUNT_SIZE))
+            position, info = QRTPacket._get_exact(RTSkeletonComponent, data, position)
+
+            for _ in range(info.skeleton_count):
+                self._fixed.append((position, position + COUNT_SIZE))
+                position, count = QRTPacket._get_exact(RTSegmentCount, data, position)
+                self._skeletons.append((position, count.segment_count))
+                self.segment_count += count.segment_count
+                position += SEGMENT.itemsize * count.segment_count
+
+        self._fixed = [
+            (start, stop, np.frombuffer(data, dtype=np.uint8, count=stop - start, offset=start))
+            for start, stop in self._fixed
+        ]
+
+    def shapes(self):
+        """Dtype and frame shape of the arrays that can be decoded, by name,
+        like the columns of a take, see :func:`qtm.takes.columns`."""
+        result = columns(self.marker_count, self.body_count, self.segment_count)
+        result["framenumbers"] = ("<u4", ())
+        result["timestamps"] = ("<i8", ())
+
+        if self.segment_count:
+            result["segment_ids"] = ("<i4", (self.segment_count,))
+
+        return result
+
+    def empty(self, frames, *names):
+        """New arrays for frames, for the names of :meth:`shapes` or all of
+        them, by name."""
+        shapes = self.shapes()
+        return dict(
+            (name, np.empty((frames,) + shapes[name][1], dtype=shapes[name][0]))
+            for name in (names or shapes)
+        )
+
+    def matches(self, frames):
+        """Which rows of a (frames, size) uint8 array of packets have this
+        layout."""
+        matches = np.ones(len(frames), dtype=bool)
+
+        for start, stop, values in self._fixed:
+            matches &= (frames[:, start:stop] == values).all(axis=1)
+
+        return matches
+
+    def _view(self, data, frames, offset, dtype, shape=()):
+        dtype = np.dtype((dtype, shape))
+        return np.ndarray(
+            (frames,), dtype=dtype, buffer=data, offset=offset, strides=(self.size,)
+        )
+
+    def _decode(self, data, frames, start, arrays):
+        """Fill rows start to start + frames of arrays from data with frames
+        packets of this layout."""
+        rows = slice(start, start + frames)
+
+        if "timestamps" in arrays:
+            arrays["timestamps"][rows] = self._view(data, frames, 0, "<i8")
+
+        if "framenumbers" in arrays:
+            arrays["framenumbers"][rows] = self._view(data, frames, 8, "<u4")
+
+        if "positions" in arrays:
+            arrays["positions"][rows] = self._view(
+                data, frames, self._markers, "<f4", (self.marker_count, 3)
+            )
+
+        if "body_positions" in arrays or "body_rotations" in arrays:
+            bodies = self._view(data, frames, self._bodies, BODY_6D, (self.body_count,))
+
+            if "body_positions" in arrays:
+                arrays["body_positions"][rows] = bodies["position"]
+
+            if "body_rotations" in arrays:
+                # Matrices are sent column by column.
+                rotations = bodies["rotation"].reshape(frames, self.body_count, 3, 3)
+                arrays["body_rotations"][rows] = rotations.transpose(0, 1, 3, 2)
+
+        first = 0
+
+        for offset, count in self._skeletons:
+            segments = self._view(data, frames, offset, SEGMENT, (count,))
+            segment_columns = slice(first, first + count)
+            first += count
+
+            for name, field in SEGMENT_ARRAYS:
+                if name in arrays:
+                    arrays[name][rows, segment_columns] = segments[field]
+
+
+def decode_packets(packets, layout=None, block_frames=64, **arrays):
+    """Decode the 3D, 6D and skeleton components of packets into arrays.
+
+    Blocks of packets are joined into one buffer and every array is filled
+    from it with a single copy per block. Decoding stops at the first packet
+    with another layout, which can be decoded with a layout of its own.
+
+    :param packets: Sequence of packet data, as given to
+        :class:`qtm.QRTPacket`.
+    :param layout: A :class:`PacketLayout`, taken from the first packet by
+        default.
+    :param block_frames: Packets joined at a time, small enough for the
+        buffer to stay in the cache.
+    :param arrays: Arrays with a row for every packet, by the names of
+        :meth:`PacketLayout.shapes`. Body rotations are matrices like the
+        ones of :func:`qtm.arrays.get_6d_arrays`.
+    :returns: The number of packets decoded.
+    """
+    if not packets:
+        return 0
+
+    if layout is None:
+        layout = PacketLayout(QRTPacket(packets[0]))
+
+    unknown = set(arrays) - set(layout.shapes())
+
+    if unknown:
+        raise ValueError("Not in the packets: %s" % ", ".join(sorted(unknown)))
+
+    sizes = np.fromiter(map(len, packets), dtype=np.int64, count=len(packets))
+    other = np.flatnonzero(sizes != layout.size)
+    count = other[0] if len(other) else len(packets)
+
+    for start in range(0, count, block_frames):
+        stop = min(start + block_frames, count)
+        data = b"".join(packets[start:stop])
+        frames = np.frombuffer(data, dtype=np.uint8).reshape(stop - start, layout.size)
+        other = np.flatnonzero(~layout.matches(frames))
+
+        if len(other):
+            stop = start + other[0]
+
+        if stop > start:
+            layout._decode(data, stop - start, start, arrays)
+
+        if len(other):
+            return int(stop)
+
+    return int(count)
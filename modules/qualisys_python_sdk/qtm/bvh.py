@@ -0,0 +1,297 @@
+""" Streaming BVH writer for skeletons
+
+The hierarchy of a BVH file is written once from the skeleton settings,
+with the T-pose positions of the segments as offsets. Frames are collected
+in blocks and their quaternions converted to Euler angles for the whole
+block at a time, then appended to the file, so exports stream in constant
+memory. The frame count is filled in when the writer is closed.
+
+Every skeleton goes to a file of its own. Segment positions and rotations
+are relative to the parent segment, as QTM streams them, and only the root
+has position channels. Requires numpy.
+
+::
+
+    with BVHExport("session_%s.bvh", settings, rate=100) as export:
+        export.append_packet(packet)
+
+    export_take(Take("session"), "session_%s.bvh")
+
+"""
+
+import numpy as np
+
+from qtm.arrays import get_skeleton_arrays
+from qtm.rotation import quaternions_to_euler
+
+# pylint: disable=C0103
+
+# Space reserved for the frame count, which is only known at the end.
+FRAMES_WIDTH = 12
+
+
+def _y_up(values):
+    """Z up axes of QTM to Y up, for positions or the vector part of
+    quaternions, the way the plug-in maps them for Maya."""
+    values = np.array(values, dtype=np.float64)
+    values[..., :3] = values[..., [0, 2, 1]] * [-1, 1, 1]
+    return values
+
+
+def _hold(values, last):
+    """Replace NaN with the previous value of the column, or last for the
+    first row."""
+    values = np.vstack((last[np.newaxis], values))
+    index = np.where(np.isnan(values), 0, np.arange(len(values))[:, np.newaxis])
+    np.maximum.accumulate(index, axis=0, out=index)
+    return values[index, np.arange(values.shape[1])][1:]
+
+
+class BVHWriter(object):
+    """Writes the frames of one skeleton to a BVH file.
+
+    :param path: File to write.
+    :param skeleton: A :class:`qtm.settings.Skeleton`.
+    :param rate: Frames per second.
+    :param order: Rotation channels in the order they are listed, the last
+        one is applied first, like ZXY of most motion capture files.
+    :param scale: Factor from millimeters to the units of the file.
+    :param y_up: Rotate the Z up axes of QTM to Y up.
+    :param block_frames: Frames converted and written at a time.
+    """
+
+    def __init__(
+        self, path, skeleton, rate, order="zxy", scale=1.0, y_up=True, block_frames=1024
+    ):
+        segments = skeleton.segments
+        index = dict((segment.id, i) for i, segment in enumerate(segments))
+        children = dict((segment.id, []) for segment in segments)
+        roots = []
+
+        for segment in segments:
+            if segment.parent_id in children:
+                children[segment.parent_id].append(segment)
+            else:
+                roots.append(segment)
+
+        if len(roots) != 1:
+            raise ValueError("Skeleton %s has %d roots" % (skeleton.name, len(roots)))
+
+        self.count = 0
+        self._order = order.lower()
+        self._axes = ["xyz".index(axis) for axis in self._order]
+        self._scale = scale
+        self._y_up = y_up
+
+        # Segments in the depth first order of the hierarchy, which is the
+        # order of their channels.
+        self._segments = []
+        lines = ["HIERARCHY"]
+        self._write_joint(roots[0], children, lines, 0)
+        self._columns = np.array([index[segment.id] for segment in self._segments])
+        self._last = np.zeros(3 + 3 * len(segments))
+
+        self._t_pose = (
+            np.array([segment.position for segment in segments]),
+            np.array([segment.rotation for segment in segments]),
+        )
+        self._positions = np.empty((block_frames, len(segments), 3))
+        self._rotations = np.empty((block_frames, len(segments), 4))
+        self._rows = 0
+
+        lines += ["MOTION", "Frames: "]
+
+        self._file = open(path, "w")
+        self._file.write("\n".join(lines))
+        self._frames_position = self._file.tell()
+        self._file.write(" " * FRAMES_WIDTH + "\nFrame Time: %.8f\n" % (1.0 / rate))
+
+    def _write_joint(self, segment, children, lines, depth):
+        indent = "\t" * depth
+        channels = " ".join(axis.upper() + "rotation" for axis in self._order)
+        position = np.array(segment.position) * self._scale
+
+        if self._y_up:
+            position = _y_up(position)
+
+        if depth == 0:
+            lines.append("ROOT %s" % segment.name)
+            # The root is placed by its position channels.
+            position = np.zeros(3)
+            channels = "6 Xposition Yposition Zposition " + channels
+        else:
+            lines.append("%sJOINT %s" % (indent, segment.name))
+            channels = "3 " + channels
+
+        lines.append("%s{" % indent)
+        lines.append("%s\tOFFSET %.6f %.6f %.6f" % ((indent,) + tuple(position)))
+        lines.append("%s\tCHANNELS %s" % (indent, channels))
+        self._segments.append(segment)
+
+        for child in children[segment.id]:
+            self._write_joint(child, children, lines, depth + 1)
+
+        if not children[segment.id]:
+            lines.append("%s\tEnd Site" % indent)
+            lines.append("%s\t{" % indent)
+            lines.append("%s\t\tOFFSET 0.000000 0.000000 0.000000" % indent)
+            lines.append("%s\t}" % indent)
+
+        lines.append("%s}" % indent)
+
+    @property
+    def segment_count(self):
+        return len(self._segments)
+
+    def append(self, positions, rotations):
+        """Append a frame of (segments, 3) positions and (segments, 4) x, y,
+        z, w quaternions, in the order of the segments of the skeleton.
+        Segments that are NaN keep their previous values."""
+        self._positions[self._rows] = positions
+        self._rotations[self._rows] = rotations
+        self._rows += 1
+        self.count += 1
+
+        if self._rows == len(self._positions):
+            self.flush()
+
+    def append_t_pose(self):
+        """Append a frame with the T-pose of the settings, which some tools
+        expect as the first frame."""
+        self.append(*self._t_pose)
+
+    def flush(self):
+        """Convert and write the frames that have been appended."""
+        rows = self._rows
+
+        if not rows:
+            return
+
+        root = self._positions[:rows, self._columns[0]] * self._scale
+        rotations = self._rotations[:rows, self._columns]
+
+        if self._y_up:
+            root = _y_up(root)
+            rotations = _y_up(rotations)
+
+        # The last rotation channel is applied first.
+        angles = np.degrees(quaternions_to_euler(rotations, self._order[::-1]))
+        values = np.hstack((root, angles[..., self._axes].reshape(rows, -1)))
+        values = _hold(values, self._last)
+        self._last = values[-1]
+
+        np.savetxt(self._file, values, fmt="%.4f")
+        self._rows = 0
+
+    def close(self):
+        """Write the remaining frames and the frame count."""
+        if self._file is None:
+            return
+
+        self.flush()
+        self._file.seek(self._frames_position)
+        self._file.write(str(self.count))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class BVHExport(object):
+    """A :class:`BVHWriter` for every skeleton in settings.
+
+    :param path: Path of the files with a %s for the name of the skeleton.
+    :param settings: A :class:`qtm.settings.Settings` with the skeletons.
+    :param options: Passed on to :class:`BVHWriter`.
+    """
+
+    def __init__(self, path, settings, rate, **options):
+        self.writers = []
+        ranges = []
+        start = 0
+
+        try:
+            for skeleton in settings.skeletons:
+                self.writers.append(BVHWriter(path % skeleton.name, skeleton, rate, **options))
+                ranges.append(slice(start, start + len(skeleton.segments)))
+                start += len(skeleton.segments)
+        except Exception:
+            self.close()
+            raise
+
+        self._ranges = ranges
+        self._ids = np.array(
+            [segment.id for skeleton in settings.skeletons for segment in skeleton.segments]
+        )
+        self._order = None
+
+    @property
+    def count(self):
+        return self.writers[0].count if self.writers else 0
+
+    def append(self, segment_ids, positions, rotations):
+        """Append the segments of all skeletons, as returned by
+        :func:`qtm.arrays.get_skeleton_arrays`.
+
+        Segments are matched to the settings by their ids on the first frame,
+        later frames must have the same ids in the same order.
+        """
+        if self._order is None:
+            index = dict((segment_id, i) for i, segment_id in enumerate(segment_ids))
+
+            try:
+                self._order = np.array([index[segment_id] for segment_id in self._ids], dtype=int)
+            except KeyError as error:
+                raise ValueError("Segment %d is not in the frame" % error.args[0])
+
+        positions = np.asarray(positions)[self._order]
+        rotations = np.asarray(rotations)[self._order]
+
+        for writer, rows in zip(self.writers, self._ranges):
+            writer.append(positions[rows], rotations[rows])
+
+    def append_packet(self, packet):
+        segments = get_skeleton_arrays(packet)
+
+        if segments is not None:
+            self.append(*segments[1:])
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def export_take(take, path, rate=None, block_frames=4096, **options):
+    """Write the skeletons of a take, see :mod:`qtm.takes`, to BVH files a
+    block of frames at a time.
+
+    :param path: Path of the files with a %s for the name of the skeleton.
+    :param rate: Frames per second, :meth:`qtm.takes.Take.rate` when None.
+    :returns: The number of frames written.
+    """
+    if "segment_positions" not in take.columns:
+        raise ValueError("The take has no skeletons")
+
+    if rate is None:
+        rate = take.rate()
+
+    with BVHExport(path, take.settings, rate, block_frames=block_frames, **options) as export:
+        for start in range(0, len(take), block_frames):
+            stop = min(start + block_frames, len(take))
+            positions = take.column("segment_positions", start, stop)
+            rotations = take.column("segment_rotations", start, stop)
+
+            for row in range(stop - start):
+                export.append(take.segment_ids, positions[row], rotations[row])
+
+    return export.count
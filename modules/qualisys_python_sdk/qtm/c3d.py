@@ -0,0 +1,393 @@
+""" Streaming C3D writer
+
+Frames are appended to a :class:`C3DWriter` as they are decoded and written
+in blocks of a fixed number of frames, so the memory used does not depend on
+the length of the recording. The header and parameters are written first
+and the frame counts filled in when the writer is closed.
+
+Positions are written as floats in millimeters, with the residuals and
+missing markers in the fourth word of every point. Analog channels run at a
+whole multiple of the frame rate and are written unscaled. Requires numpy.
+
+::
+
+    with C3DWriter("session.c3d", labels, rate=100, analog_labels=channels,
+                   analog_rate=1000) as writer:
+        writer.append_packet(packet)
+
+    export_take(Take("session"), "session.c3d")
+
+"""
+
+import struct
+
+import numpy as np
+
+from qtm.arrays import get_3d_array, get_analog_arrays
+
+# pylint: disable=C0103
+
+BLOCK_SIZE = 512
+
+# Parameter data types
+CHAR = -1
+INT = 2
+FLOAT = 4
+
+# Labels per LABELS parameter, the size of a dimension is a byte.
+MAX_DIMENSION = 255
+
+# Largest frame count of the header and POINT:FRAMES.
+MAX_WORD = 0xFFFF
+
+# Unit of the residuals, the magnitude of POINT:SCALE in float files.
+RESIDUAL_SCALE = 0.1
+
+# Analog frames kept for devices that are ahead of the others.
+PENDING_FRAMES = 4
+
+INTEL = 84
+
+
+def _pad(name, width):
+    return name.ljust(width)[:width].encode("ascii", "replace")
+
+
+def _parameter(name, data_type, values, description=""):
+    """Name, data type, dimensions and data of a parameter."""
+    if data_type == CHAR:
+        if isinstance(values, str):
+            values = [values] if values else []
+            width = max(len(values[0]) if values else 0, 1)
+            dimensions = (width,) if len(values) == 1 else (width, len(values))
+        else:
+            width = max([len(value) for value in values] + [1])
+            dimensions = (width, len(values))
+
+        data = b"".join(_pad(value, width) for value in values)
+    else:
+        values = np.asarray(values, dtype="<i2" if data_type == INT else "<f4")
+        dimensions = values.shape
+        data = values.tobytes()
+
+    return name, data_type, dimensions, data, description
+
+
+def _labels(name, labels):
+    """LABELS, LABELS2 and so on, with at most MAX_DIMENSION labels each."""
+    width = max([len(label) for label in labels] + [1])
+    parameters = []
+
+    for start in range(0, max(len(labels), 1), MAX_DIMENSION):
+        parameters.append(
+            (
+                name + (str(start // MAX_DIMENSION + 1) if start else ""),
+                CHAR,
+                (width, len(labels[start : start + MAX_DIMENSION])),
+                b"".join(_pad(label, width) for label in labels[start : start + MAX_DIMENSION]),
+                "",
+            )
+        )
+
+    return parameters
+
+
+def _section(groups):
+    """Parameter records of groups, a list of name, description and
+    parameters, and the offset of the data of every parameter."""
+    records = []
+    offsets = {}
+    position = 4
+
+    for group_id, (group, description, parameters) in enumerate(groups, 1):
+        description = description.encode("ascii")
+        name = group.encode("ascii")
+        records.append(
+            struct.pack("<bb", len(name), -group_id)
+            + name
+            + struct.pack("<hB", 3 + len(description), len(description))
+            + description
+        )
+        position += len(records[-1])
+
+        for name, data_type, dimensions, data, description in parameters:
+            description = description.encode("ascii")
+            head = struct.pack("<bb", len(name), group_id) + name.encode("ascii")
+            body = struct.pack("<bB", data_type, len(dimensions))
+            body += struct.pack("<%dB" % len(dimensions), *dimensions) + data
+            body += struct.pack("<B", len(description)) + description
+            offsets[group + ":" + name] = position + len(head) + 4 + len(dimensions)
+            records.append(head + struct.pack("<h", 2 + len(body)) + body)
+            position += len(records[-1])
+
+    # A zero offset ends the section.
+    last = records[-1]
+    name_length = abs(struct.unpack_from("<b", last)[0])
+    records[-1] = last[: 2 + name_length] + struct.pack("<h", 0) + last[4 + name_length :]
+
+    data = b"".join(records)
+    blocks = (4 + len(data) + BLOCK_SIZE - 1) // BLOCK_SIZE
+    section = struct.pack("<BBBB", 1, 0x50, blocks, INTEL) + data
+    return section.ljust(blocks * BLOCK_SIZE, b"\0"), offsets
+
+
+class _AnalogQueue(object):
+    """Samples of every channel waiting to be written, channels of devices
+    that sent fewer samples hold their last value."""
+
+    def __init__(self, channels, samples):
+        self.samples = samples
+        self._values = np.zeros((channels, samples * PENDING_FRAMES), dtype="<f4")
+        self._counts = np.zeros(channels, dtype=np.int64)
+        self._last = np.zeros(channels, dtype="<f4")
+        self._channels = np.arange(channels)
+        self._sample = np.arange(samples)[:, np.newaxis]
+
+    def push(self, first, values):
+        values = np.asarray(values)
+        channels, count = values.shape
+        capacity = self._values.shape[1]
+        rows = slice(first, first + channels)
+
+        if count == 0:
+            return
+
+        # Drop the oldest samples of devices that run ahead.
+        if count >= capacity:
+            self._values[rows] = values[:, count - capacity :]
+            self._counts[rows] = capacity
+            return
+
+        pending = int(self._counts[first])
+        overflow = max(pending + count - capacity, 0)
+
+        if overflow:
+            self._values[rows, : pending - overflow] = self._values[rows, overflow:pending]
+            pending -= overflow
+
+        self._values[rows, pending : pending + count] = values
+        self._counts[rows] = pending + count
+
+    def pop(self, out):
+        """Fill out, a (samples, channels) array, with the next frame."""
+        samples = self.samples
+        counts = np.minimum(self._counts, samples)
+        self._last = np.where(
+            counts > 0, self._values[self._channels, np.maximum(counts - 1, 0)], self._last
+        )
+        out[...] = np.where(self._sample < counts, self._values[:, :samples].T, self._last)
+
+        self._values[:, :-samples] = self._values[:, samples:]
+        self._counts = np.maximum(self._counts - samples, 0)
+
+
+class C3DWriter(object):
+    """Writes frames of 3D markers and analog samples to a C3D file.
+
+    :param path: File to write.
+    :param labels: Names of the markers.
+    :param rate: Frames per second.
+    :param analog_labels: Names of the analog channels, of all devices in
+        the order QTM sends them.
+    :param analog_rate: Analog samples per second, a multiple of rate.
+    :param block_frames: Frames written at a time.
+    """
+
+    def __init__(
+        self,
+        path,
+        labels,
+        rate,
+        analog_labels=(),
+        analog_rate=None,
+        units="mm",
+        block_frames=256,
+    ):
+        labels = list(labels)
+        analog_labels = list(analog_labels)
+        channels = len(analog_labels)
+        samples = 0
+
+        if channels:
+            if analog_rate is None or analog_rate % rate:
+                raise ValueError("The analog rate must be a multiple of the frame rate")
+
+            if channels > MAX_DIMENSION:
+                raise ValueError("At most %d analog channels are supported" % MAX_DIMENSION)
+
+            samples = int(analog_rate // rate)
+
+        self.count = 0
+        self.dtype = np.dtype(
+            [("points", "<f4", (len(labels), 4)), ("analog", "<f4", (samples, channels))]
+        )
+        self._block = np.zeros(block_frames, dtype=self.dtype)
+        self._rows = 0
+        self._analog = _AnalogQueue(channels, samples) if channels else None
+
+        point = [
+            _parameter("USED", INT, len(labels)),
+            _parameter("SCALE", FLOAT, -RESIDUAL_SCALE),
+            _parameter("RATE", FLOAT, rate),
+            _parameter("DATA_START", INT, 0),
+            _parameter("FRAMES", INT, 0),
+            _parameter("LONG_FRAMES", FLOAT, 0),
+            _parameter("UNITS", CHAR, units),
+        ] + _labels("LABELS", labels)
+        analog = [
+            _parameter("USED", INT, channels),
+            _parameter("RATE", FLOAT, analog_rate or 0),
+            _parameter("GEN_SCALE", FLOAT, 1),
+            _parameter("SCALE", FLOAT, np.ones(channels)),
+            _parameter("OFFSET", INT, np.zeros(channels)),
+            _parameter("UNITS", CHAR, ["V"] * channels),
+        ] + _labels("LABELS", analog_labels)
+        trial = [
+            _parameter("ACTUAL_START_FIELD", INT, [1, 0]),
+            _parameter("ACTUAL_END_FIELD", INT, [0, 0]),
+        ]
+        section, self._offsets = _section(
+            [("POINT", "3D markers", point), ("ANALOG", "Analog channels", analog), ("TRIAL", "", trial)]
+        )
+        self._data_start = 2 + len(section) // BLOCK_SIZE
+
+        header = np.zeros(BLOCK_SIZE // 2, dtype="<u2")
+        header_bytes = header.view("u1")
+        header_bytes[0] = 2
+        header_bytes[1] = 0x50
+        header[1] = len(labels)
+        header[2] = samples * channels
+        header[3] = 1
+        header[5] = 10
+        header[6:8] = np.array([-RESIDUAL_SCALE], dtype="<f4").view("<u2")
+        header[8] = self._data_start
+        header[9] = samples
+        header[10:12] = np.array([rate], dtype="<f4").view("<u2")
+
+        self._file = open(path, "wb")
+        self._file.write(header.tobytes())
+        self._file.write(section)
+        self._patch("POINT:DATA_START", struct.pack("<H", self._data_start))
+
+    def _patch(self, parameter, data):
+        position = self._file.tell()
+        self._file.seek(BLOCK_SIZE + self._offsets[parameter])
+        self._file.write(data)
+        self._file.seek(position)
+
+    def append(self, positions, residuals=None, analog=None):
+        """Append a frame.
+
+        :param positions: (markers, 3) positions, NaN for missing markers.
+            None writes a frame without markers.
+        :param residuals: Residuals of the markers.
+        :param analog: A (channels, samples) array or a list with one per
+            device. Devices may send any number of samples, every frame
+            writes the samples of one frame.
+        """
+        points = self._block["points"][self._rows]
+
+        if positions is None:
+            points[:] = 0
+            points[:, 3] = -1
+        else:
+            points[:, :3] = positions
+            missing = np.isnan(points[:, :3]).any(axis=1)
+
+            if residuals is None:
+                points[:, 3] = 0
+            else:
+                points[:, 3] = np.clip(np.round(np.asarray(residuals) / RESIDUAL_SCALE), 0, 255)
+
+            points[missing] = 0
+            points[missing, 3] = -1
+
+        if self._analog is not None:
+            if analog is not None:
+                first = 0
+
+                for values in [analog] if isinstance(analog, np.ndarray) else analog:
+                    self._analog.push(first, values)
+                    first += len(values)
+
+            self._analog.pop(self._block["analog"][self._rows])
+
+        self._rows += 1
+        self.count += 1
+
+        if self._rows == len(self._block):
+            self.flush()
+
+    def append_packet(self, packet):
+        """Append the 3D markers and analog samples of a packet."""
+        markers = get_3d_array(packet)
+        devices = get_analog_arrays(packet) if self._analog is not None else None
+
+        self.append(
+            markers[1] if markers is not None else None,
+            analog=[samples for _, _, samples in devices] if devices else None,
+        )
+
+    def flush(self):
+        if self._rows:
+            self._block[: self._rows].tofile(self._file)
+            self._rows = 0
+
+    def close(self):
+        """Write the remaining frames and the frame counts."""
+        if self._file is None:
+            return
+
+        self.flush()
+
+        size = self._file.tell()
+        self._file.write(b"\0" * (-size % BLOCK_SIZE))
+
+        count = self.count
+        self._file.seek(8)
+        self._file.write(struct.pack("<H", min(count, MAX_WORD)))
+        self._patch("POINT:FRAMES", struct.pack("<H", min(count, MAX_WORD)))
+        self._patch("POINT:LONG_FRAMES", struct.pack("<f", count))
+        self._patch("TRIAL:ACTUAL_END_FIELD", struct.pack("<HH", count & MAX_WORD, count >> 16))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def export_take(take, path, rate=None, block_frames=4096):
+    """Write the markers of a take, see :mod:`qtm.takes`, to a C3D file a
+    block of frames at a time. Frames that were dropped while recording are
+    written without markers.
+
+    :param rate: Frames per second, :meth:`qtm.takes.Take.rate` when None.
+    """
+    framenumbers = take.framenumbers
+
+    if rate is None:
+        rate = take.rate()
+
+    has_markers = "positions" in take.columns
+
+    with C3DWriter(
+        path, take.labels if has_markers else [], rate, block_frames=block_frames
+    ) as writer:
+        previous = None
+
+        for start in range(0, len(take), block_frames):
+            stop = min(start + block_frames, len(take))
+            positions = take.column("positions", start, stop) if has_markers else None
+
+            for row, framenumber in enumerate(framenumbers[start:stop]):
+                if previous is not None:
+                    for _ in range(int(framenumber) - previous - 1):
+                        writer.append(None)
+
+                previous = int(framenumber)
+                writer.append(positions[row] if has_markers else None)
+
+    return writer.count
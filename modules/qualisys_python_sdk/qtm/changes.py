@@ -0,0 +1,72 @@
+""" Skipping writes of values that did not change
+
+Writing a transform in a scene graph is far more expensive than comparing
+a few numbers, so :class:`WriteCache` remembers what was last written per
+row and tells which rows moved by more than epsilon. Requires numpy.
+
+::
+
+    cache = WriteCache(epsilon=1e-3)
+    for row in cache.changed(positions).tolist():
+        write(row, positions[row])
+
+"""
+
+import numpy as np
+
+# pylint: disable=C0103
+
+
+class WriteCache(object):
+    """Last written value of every row of a frame.
+
+    :param epsilon: Largest difference of any column that is not written,
+        either a scalar or one value per column.
+    """
+
+    def __init__(self, epsilon=1e-3):
+        self.epsilon = epsilon
+        self.reset()
+
+    def reset(self):
+        """ Forget the written values and the counts """
+        self._values = None
+        self.written = 0
+        self.skipped = 0
+
+    def invalidate(self, rows=None):
+        """Make rows, or all rows, count as changed on the next frame, for
+        when something else has written to them."""
+        if self._values is None:
+            return
+
+        if rows is None:
+            self._values.fill(np.nan)
+        else:
+            self._values[rows] = np.nan
+
+    def changed(self, values, rows=None):
+        """Indices of the rows that moved by more than epsilon since they
+        were last written. They are remembered as written.
+
+        :param values: (n, k) array.
+        :param rows: Indices of the rows to consider, default all of them.
+        """
+        if self._values is None or self._values.shape != values.shape:
+            self._values = np.full(values.shape, np.nan)
+
+        if rows is None:
+            rows = np.arange(len(values))
+
+        # Rows never written are NaN and compare as changed.
+        close = np.abs(values[rows] - self._values[rows]) <= self.epsilon
+        moved = rows[~close.all(axis=1)]
+
+        self._values[moved] = values[moved]
+        self.written += len(moved)
+        self.skipped += len(rows) - len(moved)
+        return moved
+
+    def stats(self):
+        """ Written and skipped rows since the last reset """
+        return dict(written=self.written, skipped=self.skipped)
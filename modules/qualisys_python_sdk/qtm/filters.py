@@ -0,0 +1,310 @@
+""" Streaming low-pass filters for frames of positions or rotations
+
+Every filter takes one (n, k) array per frame and keeps its state in arrays
+of the same shape, so a frame costs O(n). NaN values, occluded markers or
+bodies that are not tracked, pass through as NaN and the filter starts over
+for them once they are seen again. Requires numpy.
+
+::
+
+    bank = FilterBank()
+    bank.set_filter("hands", [3, 4, 5], "One Euro", min_cutoff=1.0, beta=0.01)
+    positions, _ = bank.filter(packet.timestamp * 1e-6, positions)
+
+"""
+
+import collections
+import math
+
+import numpy as np
+
+# pylint: disable=C0103, R0902
+
+
+class StreamFilter(object):
+    """Base class, keeps the time and state of the previous frame."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """ Forget all frames """
+        self._time = None
+        self._state = None
+
+    def filter(self, time, values):
+        """Filter a frame.
+
+        The first frame, a frame that is not newer than the previous one and
+        a frame with another shape start over.
+
+        :param time: Time of the frame in seconds.
+        :param values: (n, k) array.
+        :returns: The filtered values as a new array.
+        """
+        values = np.asarray(values, dtype=np.float64)
+
+        if (
+            self._time is None
+            or time <= self._time
+            or values.shape != self._state.shape
+        ):
+            self._start(values)
+        else:
+            self._step(time - self._time, values)
+
+            # Restart the elements that have been NaN.
+            restart = np.isnan(self._state) & ~np.isnan(values)
+
+            if restart.any():
+                self._restart(restart, values)
+
+        self._time = time
+        return self._state.copy()
+
+    def _start(self, values):
+        self._state = values.copy()
+
+    def _restart(self, mask, values):
+        self._state[mask] = values[mask]
+
+    def _step(self, dt, values):
+        raise NotImplementedError
+
+
+class ExponentialFilter(StreamFilter):
+    """Exponential moving average.
+
+    :param alpha: Weight of the newest frame, between 0 and 1.
+    """
+
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha
+        super(ExponentialFilter, self).__init__()
+
+    def _step(self, dt, values):
+        self._state += self.alpha * (values - self._state)
+
+
+def _smoothing_factor(dt, cutoff):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter(StreamFilter):
+    """One Euro filter, an exponential filter whose cutoff frequency rises
+    with the speed, so slow motion is smoothed and fast motion lags little.
+
+    :param min_cutoff: Cutoff frequency in Hz at rest.
+    :param beta: Increase of the cutoff frequency per unit per second of speed.
+    :param d_cutoff: Cutoff frequency in Hz of the speed estimate.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        super(OneEuroFilter, self).__init__()
+
+    def _start(self, values):
+        super(OneEuroFilter, self)._start(values)
+        self._speed = np.zeros_like(values)
+
+    def _restart(self, mask, values):
+        super(OneEuroFilter, self)._restart(mask, values)
+        self._speed[mask] = 0.0
+
+    def _step(self, dt, values):
+        speed = (values - self._state) / dt
+        self._speed += _smoothing_factor(dt, self.d_cutoff) * (speed - self._speed)
+
+        cutoff = self.min_cutoff + self.beta * np.abs(self._speed)
+        tau = 1.0 / (2 * math.pi * cutoff)
+        self._state += (values - self._state) / (1.0 + tau / dt)
+
+
+class ButterworthFilter(StreamFilter):
+    """Second order Butterworth low-pass filter.
+
+    The coefficients are computed for rate, or for the interval between the
+    first two frames when rate is None, and assume evenly spaced frames.
+
+    :param cutoff: Cutoff frequency in Hz.
+    :param rate: Frame rate in Hz.
+    """
+
+    def __init__(self, cutoff=6.0, rate=None):
+        self.cutoff = cutoff
+        self.rate = rate
+        super(ButterworthFilter, self).__init__()
+
+    def reset(self):
+        super(ButterworthFilter, self).reset()
+        self._coefficients = None
+
+    def _set_rate(self, rate):
+        # Bilinear transform with prewarping, kept below the Nyquist frequency.
+        K = math.tan(math.pi * min(self.cutoff / rate, 0.49))
+        norm = 1.0 / (1.0 + math.sqrt(2) * K + K * K)
+        b0 = K * K * norm
+        a1 = 2.0 * (K * K - 1.0) * norm
+        a2 = (1.0 - math.sqrt(2) * K + K * K) * norm
+        self._coefficients = (b0, 2.0 * b0, b0, a1, a2)
+
+    def _start(self, values):
+        super(ButterworthFilter, self)._start(values)
+        # Start in the steady state of a constant signal.
+        self._inputs = [values.copy(), values.copy()]
+        self._outputs = [values.copy(), values.copy()]
+
+        if self.rate is not None:
+            self._set_rate(self.rate)
+
+    def _restart(self, mask, values):
+        super(ButterworthFilter, self)._restart(mask, values)
+
+        for history in self._inputs + self._outputs:
+            history[mask] = values[mask]
+
+    def _step(self, dt, values):
+        if self._coefficients is None:
+            self._set_rate(1.0 / dt)
+
+        b0, b1, b2, a1, a2 = self._coefficients
+        x1, x2 = self._inputs
+        y1, y2 = self._outputs
+        y = b0 * values + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
+
+        # Shift the histories, reusing the arrays of the oldest frame.
+        x2[...] = values
+        y2[...] = y
+        self._inputs = [x2, x1]
+        self._outputs = [y2, y1]
+        self._state = y
+
+
+FILTERS = collections.OrderedDict(
+    [
+        ("Exponential", ExponentialFilter),
+        ("One Euro", OneEuroFilter),
+        ("Butterworth", ButterworthFilter),
+    ]
+)
+
+
+class FilterBank(object):
+    """Named filters for subsets of the rows of a frame, such as marker groups
+    or single rigid bodies.
+
+    Positions and rotations get separate filters of the same kind. Rotations
+    are x, y, z, w quaternions, they are flipped to the hemisphere of the
+    previous frame before filtering and normalized afterwards.
+    """
+
+    def __init__(self):
+        self._filters = collections.OrderedDict()
+        self._previous_rotations = None
+
+    def __len__(self):
+        return len(self._filters)
+
+    def __contains__(self, name):
+        return name in self._filters
+
+    def __iter__(self):
+        return iter(list(self._filters))
+
+    def kind(self, name):
+        """ Kind of the filter called name, None if there is none """
+        return self._filters[name][0] if name in self._filters else None
+
+    def set_filter(self, name, rows, kind, rotation_parameters=None, **parameters):
+        """Filter rows with a filter from :data:`FILTERS`.
+
+        :param name: Name of the filter, replaces a filter with the same name.
+        :param rows: Row indices the filter applies to.
+        :param kind: Key in :data:`FILTERS`, None removes the filter.
+        :param rotation_parameters: Parameters of the rotation filter as a
+            dict, the ones of the position filter by default. Speeds of
+            quaternion components are far smaller than speeds of positions.
+        """
+        if kind is None:
+            self.remove(name)
+            return
+
+        if rotation_parameters is None:
+            rotation_parameters = parameters
+
+        self._filters[name] = (
+            kind,
+            np.asarray(rows, dtype=np.intp),
+            FILTERS[kind](**parameters),
+            FILTERS[kind](**rotation_parameters),
+        )
+
+    def set_rows(self, name, rows):
+        """ Change the rows of an existing filter, which starts over """
+        kind, _, position_filter, rotation_filter = self._filters[name]
+        position_filter.reset()
+        rotation_filter.reset()
+        self._filters[name] = (
+            kind,
+            np.asarray(rows, dtype=np.intp),
+            position_filter,
+            rotation_filter,
+        )
+
+    def remove(self, name):
+        self._filters.pop(name, None)
+
+    def clear(self):
+        self._filters.clear()
+
+    def reset(self):
+        """ Restart all filters """
+        for _, _, position_filter, rotation_filter in self._filters.values():
+            position_filter.reset()
+            rotation_filter.reset()
+
+        self._previous_rotations = None
+
+    def filter(self, time, positions=None, rotations=None):
+        """Filter the rows that have a filter, other rows are copied as is.
+
+        :param time: Time of the frame in seconds.
+        :param positions: (n, 3) array or None.
+        :param rotations: (n, 4) array or None.
+        :returns: Filtered positions and rotations.
+        """
+        if positions is not None:
+            positions = np.array(positions, dtype=np.float64)
+
+        if rotations is not None:
+            rotations = self._continuous(np.array(rotations, dtype=np.float64))
+
+        for _, rows, position_filter, rotation_filter in self._filters.values():
+            rows = rows[rows < len(positions if positions is not None else rotations)]
+
+            if positions is not None:
+                positions[rows] = position_filter.filter(time, positions[rows])
+
+            if rotations is not None:
+                filtered = rotation_filter.filter(time, rotations[rows])
+                filtered /= np.linalg.norm(filtered, axis=1)[:, None]
+                rotations[rows] = filtered
+
+        return positions, rotations
+
+    def _continuous(self, rotations):
+        previous = self._previous_rotations
+
+        if previous is None or previous.shape != rotations.shape:
+            self._previous_rotations = rotations.copy()
+            return rotations
+
+        flip = np.einsum("ij,ij->i", previous, rotations) < 0
+        rotations[flip] *= -1
+
+        # Bodies that are not tracked keep their last rotation for the next check.
+        np.copyto(previous, rotations, where=~np.isnan(rotations))
+        return rotations
@@ -0,0 +1,124 @@
+""" Force plate samples reduced to a force vector per plate
+
+Force plates sample at up to a few kHz, far more than a scene shows.
+:func:`plate_loads` reduces the samples of all plates to a mean force and a
+center of pressure per plate in a single pass over the samples, and
+:class:`ForceDecimator` does the same over all samples of a display frame.
+
+The center of pressure is the mean of the application points weighted by
+the vertical force, which is the application point of the summed load.
+Samples with less vertical force than a threshold, where the application
+point is mostly noise, do not count. Requires numpy.
+
+::
+
+    decimator = ForceDecimator(rate=30)
+    info, ids, counts, _, forces, _, points = get_force_arrays(packet)
+    loads = decimator.push(packet.timestamp * 1e-6, counts, forces, points)
+
+    if loads is not None:
+        forces, centers = loads
+
+"""
+
+import numpy as np
+
+# pylint: disable=C0103
+
+# Columns of the sums: force, weighted application point, weight.
+SUM_COLUMNS = 7
+
+
+def _sums(counts, forces, points, threshold):
+    """Sums of the columns per plate, zero for plates without samples."""
+    counts = np.asarray(counts)
+    forces = np.asarray(forces, dtype=np.float64)
+    weights = np.abs(forces[:, 2])
+    weights[weights < threshold] = 0
+
+    columns = np.empty((len(forces), SUM_COLUMNS))
+    columns[:, :3] = forces
+    np.multiply(points, weights[:, np.newaxis], out=columns[:, 3:6])
+    columns[:, 6] = weights
+
+    sums = np.zeros((len(counts), SUM_COLUMNS))
+    has_samples = counts > 0
+
+    if has_samples.any():
+        starts = (np.cumsum(counts) - counts)[has_samples]
+        sums[has_samples] = np.add.reduceat(columns, starts, axis=0)
+
+    return sums
+
+
+def _loads(sums, counts):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        forces = sums[:, :3] / np.asarray(counts)[:, np.newaxis]
+        centers = sums[:, 3:6] / sums[:, 6:]
+
+    centers[sums[:, 6] == 0] = np.nan
+    return forces, centers
+
+
+def plate_loads(counts, forces, points, threshold=10.0):
+    """Mean force and center of pressure of every plate.
+
+    :param counts: Number of samples of every plate.
+    :param forces: (samples, 3) forces of all plates, in plate order.
+    :param points: (samples, 3) application points of all plates.
+    :param threshold: Smallest vertical force of a sample that places the
+        center of pressure, in newton.
+    :returns: (plates, 3) forces and centers of pressure, NaN for plates
+        without samples and centers of plates without load.
+    """
+    return _loads(_sums(counts, forces, points, threshold), counts)
+
+
+class ForceDecimator(object):
+    """Averages force plate samples over frames of a lower rate.
+
+    :param rate: Frames per second of the result.
+    :param threshold: See :func:`plate_loads`.
+    """
+
+    def __init__(self, rate, threshold=10.0):
+        self.rate = rate
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self):
+        self._sums = None
+        self._counts = None
+        self._next = None
+
+    def push(self, time, counts, forces, points):
+        """Add the samples of a packet at time in seconds.
+
+        :returns: (plates, 3) forces and centers of pressure over the
+            samples since the last result, or None until a frame of the rate
+            has passed.
+        """
+        sums = _sums(counts, forces, points, self.threshold)
+
+        if self._sums is None or len(self._sums) != len(sums):
+            self._sums = sums
+            self._counts = np.array(counts, dtype=np.int64)
+        else:
+            self._sums += sums
+            self._counts += counts
+
+        if self._next is not None and time < self._next:
+            return None
+
+        loads = _loads(self._sums, self._counts)
+        period = 1.0 / self.rate
+
+        if self._next is None or time - self._next >= period:
+            # The first frame, or frames without packets, which are not
+            # caught up on.
+            self._next = time + period
+        else:
+            self._next += period
+
+        self._sums = None
+        return loads
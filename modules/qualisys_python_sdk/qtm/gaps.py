@@ -0,0 +1,115 @@
+""" Detection and filling of gaps in marker trajectories
+
+QTM sends NaN for the position of a marker that is not visible. Requires
+numpy.
+"""
+
+import numpy as np
+
+# pylint: disable=C0103
+
+
+def visible_markers(positions):
+    """ Boolean array, True for the rows of (..., 3) positions without NaN """
+    return ~np.isnan(positions).any(axis=-1)
+
+
+class GapTracker(object):
+    """Follows the visibility of markers frame by frame.
+
+    Every marker is assumed visible before the first frame, so only markers
+    that are missing, or whose visibility changed since the previous frame,
+    are reported.
+
+    :param record: Keep the closed gaps in :attr:`gaps`, as tuples of marker
+        index, first and last missing frame number.
+    """
+
+    def __init__(self, record=False):
+        self.record = record
+        self.reset()
+
+    def reset(self):
+        """ Forget all frames and gaps """
+        self._visible = None
+        self._open = {}
+        self.gaps = []
+
+    def update(self, positions, framenumber=None):
+        """Add a frame of (n, 3) positions.
+
+        :returns: Visible markers as a boolean array and the indices of the
+            markers whose visibility changed.
+        """
+        visible = visible_markers(positions)
+
+        if self._visible is None or self._visible.shape != visible.shape:
+            self._visible = np.ones_like(visible)
+            self._open = {}
+
+        changed = np.flatnonzero(visible != self._visible)
+        self._visible = visible
+
+        if self.record and framenumber is not None:
+            for index in changed.tolist():
+                if visible[index]:
+                    first = self._open.pop(index, None)
+
+                    if first is not None:
+                        self.gaps.append((index, first, framenumber - 1))
+                else:
+                    self._open[index] = framenumber
+
+        return visible, changed
+
+
+def fill_gaps(frames, max_gap=None):
+    """Fill gaps in (frames, markers, 3) positions by linear interpolation.
+
+    Gaps at the start or end of the trajectory, and gaps longer than max_gap
+    frames, are left as NaN.
+
+    :returns: A new array.
+    """
+    frames = np.array(frames, dtype=np.float64)
+    count = len(frames)
+    visible = visible_markers(frames)
+    index = np.arange(count)[:, None]
+
+    # Last visible frame at or before and first visible frame at or after
+    # every frame, for all markers at once.
+    previous = np.maximum.accumulate(np.where(visible, index, -1), axis=0)
+    following = np.minimum.accumulate(np.where(visible, index, count)[::-1], axis=0)[::-1]
+
+    gap = ~visible & (previous >= 0) & (following < count)
+
+    if max_gap is not None:
+        gap &= following - previous - 1 <= max_gap
+
+    frame_index, marker_index = np.nonzero(gap)
+    before = previous[frame_index, marker_index]
+    after = following[frame_index, marker_index]
+    t = ((frame_index - before) / (after - before).astype(np.float64))[:, None]
+
+    start = frames[before, marker_index]
+    frames[frame_index, marker_index] = start + t * (frames[after, marker_index] - start)
+    return frames
+
+
+def hold_gaps(frames):
+    """Fill gaps in (frames, ..., k) values, such as positions or rotations,
+    with the last visible value.
+
+    Values before the first visible frame are left as NaN.
+
+    :returns: A new array.
+    """
+    frames = np.asarray(frames)
+    visible = visible_markers(frames)
+    index = np.arange(len(frames)).reshape((-1,) + (1,) * (visible.ndim - 1))
+
+    # Last visible frame at or before every frame, the frame itself while
+    # there is none.
+    previous = np.maximum.accumulate(np.where(visible, index, 0), axis=0)
+    previous = np.where(np.logical_or.accumulate(visible, axis=0), previous, index)
+    return np.take_along_axis(frames, previous[..., None], axis=0)
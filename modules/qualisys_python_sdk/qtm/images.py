@@ -0,0 +1,219 @@
+""" Writing streamed camera images to files on a thread of their own
+
+Viewers such as image planes show files, so every camera image is written to
+a file, JPG and PNG images as they are and raw images as uncompressed TGA,
+which stores grayscale and BGR pixels unchanged behind a small header.
+
+:class:`ImageFiles` writes on a thread of its own and only the latest image
+of every camera is kept, an image that has not been written when a newer one
+arrives is dropped. Every camera has three files: the one last taken by the
+viewer, the latest written one and the one being written, so a file is never
+written while it may be shown.
+
+::
+
+    with ImageFiles(directory) as files:
+        files.put_packet(packet)
+
+        # Later, at display rate
+        for camera, path in files.take().items():
+            show(camera, path)
+
+"""
+
+import os
+import struct
+import threading
+
+from qtm.packet import QRTImageFormat
+
+# pylint: disable=C0103
+
+EXTENSIONS = {
+    QRTImageFormat.FormatRawGrayscale: ".tga",
+    QRTImageFormat.FormatRawBGR: ".tga",
+    QRTImageFormat.FormatJPG: ".jpg",
+    QRTImageFormat.FormatPNG: ".png",
+}
+
+# Uncompressed true color and grayscale image types.
+TGA_TYPES = {QRTImageFormat.FormatRawGrayscale: (3, 8), QRTImageFormat.FormatRawBGR: (2, 24)}
+
+# Pixel rows start at the top.
+TGA_TOP_LEFT = 0x20
+
+TGAHeader = struct.Struct("<BBBHHBHHHHBB")
+
+
+def image_file(image_info, data, buffer=None):
+    """Contents of the file for an image.
+
+    :param image_info: The :class:`qtm.packet.RTImage` of the image.
+    :param data: The image as returned by :meth:`qtm.QRTPacket.get_image`.
+    :param buffer: A bytearray to write raw images to, reused when it has
+        the right size.
+    :returns: The file extension and the contents, data itself for JPG and
+        PNG images.
+    """
+    # The format field is hidden by the struct of RTImage.
+    image_format = QRTImageFormat(image_info[1])
+
+    if image_format not in TGA_TYPES:
+        return EXTENSIONS[image_format], data
+
+    image_type, depth = TGA_TYPES[image_format]
+    size = image_info.width * image_info.height * depth // 8
+
+    if len(data) != size:
+        raise ValueError(
+            "Raw image of %dx%d has %d bytes, expected %d"
+            % (image_info.width, image_info.height, len(data), size)
+        )
+
+    if buffer is None or len(buffer) != TGAHeader.size + size:
+        buffer = bytearray(TGAHeader.size + size)
+
+    # No image id or color map, at the origin.
+    TGAHeader.pack_into(
+        buffer, 0, 0, 0, image_type, 0, 0, 0, 0, 0,
+        image_info.width, image_info.height, depth, TGA_TOP_LEFT,
+    )
+    buffer[TGAHeader.size :] = data
+    return EXTENSIONS[image_format], buffer
+
+
+class _CameraFiles(object):
+    """Files of a camera by slot, with the slots that were taken, written
+    last and are written next."""
+
+    __slots__ = ("paths", "taken", "latest", "next", "new")
+
+    def __init__(self):
+        self.paths = [None, None, None]
+        self.taken, self.latest, self.next = 0, 1, 2
+        self.new = False
+
+
+class ImageFiles(object):
+    """Writes the latest image of every camera to files.
+
+    :param directory: Directory of the files, which must exist.
+    :param prefix: Start of the file names, followed by the camera id.
+    """
+
+    def __init__(self, directory, prefix="camera"):
+        self.directory = directory
+        self.prefix = prefix
+        self.written = 0
+        self.skipped = 0
+        self.error = None
+
+        self._condition = threading.Condition()
+        self._images = {}
+        self._closed = False
+        self._files = {}
+        self._buffers = {}
+
+        self._thread = threading.Thread(target=self._run, name="ImageFiles")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, images):
+        """Add (RTImage, data) images, replacing the ones of the same cameras
+        that have not been written yet."""
+        with self._condition:
+            for image_info, data in images:
+                if image_info.id in self._images:
+                    self.skipped += 1
+
+                self._images[image_info.id] = (image_info, data)
+
+            self._condition.notify()
+
+    def put_packet(self, packet):
+        images = packet.get_image()
+
+        if images is not None:
+            self.put(images[1])
+
+    def take(self):
+        """Files of the cameras with images written since the last take.
+
+        :returns: Paths by camera id. A file is not written again until a
+            later take has returned another file of the camera.
+        """
+        taken = {}
+
+        with self._condition:
+            for camera, files in self._files.items():
+                if files.new:
+                    files.taken, files.latest = files.latest, files.taken
+                    files.new = False
+                    taken[camera] = files.paths[files.taken]
+
+        return taken
+
+    def stats(self):
+        """ Images written and skipped because a newer one came first """
+        return dict(written=self.written, skipped=self.skipped)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._images and not self._closed:
+                    self._condition.wait()
+
+                if self._closed:
+                    return
+
+                images, self._images = self._images, {}
+
+            for camera, (image_info, data) in images.items():
+                try:
+                    self._write(camera, image_info, data)
+                except (IOError, OSError, ValueError) as error:
+                    self.error = error
+
+    def _write(self, camera, image_info, data):
+        extension, contents = image_file(image_info, data, self._buffers.get(camera))
+
+        if isinstance(contents, bytearray):
+            self._buffers[camera] = contents
+
+        if camera not in self._files:
+            with self._condition:
+                self._files[camera] = _CameraFiles()
+
+        # Only this thread changes the next slot, which is never the taken
+        # one, so the file is written without the lock.
+        files = self._files[camera]
+        path = os.path.join(
+            self.directory, "%s_%d_%d%s" % (self.prefix, camera, files.next, extension)
+        )
+
+        with open(path, "wb") as image:
+            image.write(contents)
+
+        with self._condition:
+            if files.new:
+                # The latest file was never taken.
+                self.skipped += 1
+
+            files.paths[files.next] = path
+            files.latest, files.next = files.next, files.latest
+            files.new = True
+            self.written += 1
+
+    def close(self):
+        """Stop writing, images that have not been written are dropped."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,171 @@
+""" Optional timing instrumentation from receiving frames to applying them
+
+Disabled by default. Instrumented code checks ``INSTRUMENTATION.enabled``
+before reading the clock, so the cost when disabled is one attribute lookup.
+
+The receiver records the stages "receive", for splitting the stream into
+packets, and "parse", for indexing the components of a data packet. The
+component getters of :class:`qtm.QRTPacket` record "decode".
+
+::
+
+    from qtm.instrumentation import INSTRUMENTATION
+    INSTRUMENTATION.enabled = True
+    ...
+    print(INSTRUMENTATION.snapshot())
+
+"""
+
+import collections
+
+try:
+    from time import perf_counter as clock
+except ImportError:  # Python 2
+    from timeit import default_timer as clock
+
+# pylint: disable=C0103
+
+
+class Histogram(object):
+    """Latency histogram with power of two buckets in microseconds.
+
+    Bucket 0 holds samples below 1 us, bucket i samples in [2^(i-1), 2^i) us
+    and the last bucket everything from about 8 s and up.
+    """
+
+    __slots__ = ("counts", "count", "total", "maximum")
+
+    BUCKETS = 24
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, seconds):
+        """ Add a sample """
+        bucket = min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    @property
+    def mean(self):
+        """ Mean in seconds, None without samples """
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent):
+        """Upper bound in seconds of the bucket containing the percentile,
+        None without samples."""
+        if not self.count:
+            return None
+
+        target = self.count * percent / 100.0
+        seen = 0
+
+        for bucket, count in enumerate(self.counts):
+            seen += count
+
+            if seen >= target:
+                return min((1 << bucket) * 1e-6, self.maximum)
+
+        return self.maximum
+
+    def summary(self):
+        """ Count, mean, p50, p95 and max in milliseconds """
+        if not self.count:
+            return dict(count=0, mean=None, p50=None, p95=None, max=None)
+
+        return dict(
+            count=self.count,
+            mean=self.mean * 1000,
+            p50=self.percentile(50) * 1000,
+            p95=self.percentile(95) * 1000,
+            max=self.maximum * 1000,
+        )
+
+
+class Instrumentation(object):
+    """Per stage latency histograms, frame rate and QTM timestamp to apply latency.
+
+    The timestamp to apply latency is measured relative to the fastest frame
+    seen so far, since the QTM clock and the local clock share no epoch.
+    """
+
+    def __init__(self, rate_window=120):
+        self.enabled = False
+        self.stages = collections.OrderedDict()
+        self.latency = Histogram()
+        self._frame_times = collections.deque(maxlen=rate_window)
+        self._offset = None
+        self._last_timestamp = None
+
+    def reset(self):
+        """ Drop everything recorded so far """
+        self.stages.clear()
+        self.latency = Histogram()
+        self._frame_times.clear()
+        self._offset = None
+        self._last_timestamp = None
+
+    def record(self, stage, seconds):
+        """ Add a sample to the histogram of stage """
+        histogram = self.stages.get(stage)
+
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+
+        histogram.record(seconds)
+
+    def total(self, stage):
+        """ Seconds recorded for stage so far """
+        histogram = self.stages.get(stage)
+        return histogram.total if histogram is not None else 0.0
+
+    def frame_received(self):
+        """ Mark the arrival of a frame, used for the frame rate """
+        self._frame_times.append(clock())
+
+    def frame_applied(self, timestamp):
+        """Mark that the frame with QTM timestamp (in microseconds) has been
+        applied to the scene."""
+        now = clock()
+
+        if self._last_timestamp is not None and timestamp < self._last_timestamp:
+            # A new measurement restarts the QTM clock.
+            self._offset = None
+
+        self._last_timestamp = timestamp
+        offset = now - timestamp * 1e-6
+
+        if self._offset is None or offset < self._offset:
+            self._offset = offset
+
+        self.latency.record(offset - self._offset)
+
+    @property
+    def fps(self):
+        """ Frames per second over the recent frames, None if unknown """
+        if len(self._frame_times) < 2:
+            return None
+
+        elapsed = self._frame_times[-1] - self._frame_times[0]
+        return (len(self._frame_times) - 1) / elapsed if elapsed > 0 else None
+
+    def snapshot(self):
+        """Current statistics as a dict with the frame rate, the timestamp to
+        apply latency and a summary per stage. Times are in milliseconds."""
+        return dict(
+            fps=self.fps,
+            latency=self.latency.summary(),
+            stages=collections.OrderedDict(
+                (stage, histogram.summary()) for stage, histogram in self.stages.items()
+            ),
+        )
+
+
+INSTRUMENTATION = Instrumentation()
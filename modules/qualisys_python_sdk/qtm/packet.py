@@ -6,6 +6,8 @@ import struct
 
 from enum import Enum
 
+from qtm.instrumentation import INSTRUMENTATION, clock
+
 # pylint: disable=C0103, C0330, E1101, W0212
 
 # Used in protocol
@@ -101,10 +103,20 @@ RTGazeVectorComponent.format = struct.Struct("<i")
 RTGazeVector = namedtuple("RTGazeVector", "sample_count")
 RTGazeVector.format = struct.Struct("<i")
 
+RTGazeVectorSample = namedtuple("RTGazeVectorSample", "x y z pos_x pos_y pos_z")
+RTGazeVectorSample.format = struct.Struct("<6f")
+
 # Image
 RTImageComponent = namedtuple("RTImageComponent", "image_count")
 RTImageComponent.format = struct.Struct("<i")
 
+# Timecode
+RTTimecodeComponent = namedtuple("RTTimecodeComponent", "timecode_count")
+RTTimecodeComponent.format = struct.Struct("<i")
+
+RTTimecode = namedtuple("RTTimecode", "type hi lo")
+RTTimecode.format = struct.Struct("<iII")
+
 # Skeleton
 RTSkeletonComponent = namedtuple("RTSkeletonComponent", "skeleton_count")
 RTSkeletonComponent.format = struct.Struct("<i")
@@ -128,6 +140,14 @@ RTImage = namedtuple(
 RTImage.format = struct.Struct("<iiiiffffi")
 
 
+class QRTTimecodeType(Enum):
+    """ Timecode types """
+
+    SMPTE = 0
+    IRIG = 1
+    CameraTime = 2
+
+
 class QRTPacketType(Enum):
     """ Packet types """
 
@@ -216,11 +236,15 @@ class ComponentGetter(object):
             if component_position is None:
                 return None
 
+            timed = INSTRUMENTATION.enabled
+            if timed:
+                start = clock()
+
             component_position, component_info = QRTPacket._get_exact(
                 self.base_component, calling_object.data, component_position
             )
 
-            return (
+            result = (
                 component_info,
                 function(
                     *args,
@@ -231,6 +255,11 @@ class ComponentGetter(object):
                 ),
             )
 
+            if timed:
+                INSTRUMENTATION.record("decode", clock() - start)
+
+            return result
+
         return wrapper
 
 
@@ -463,14 +492,53 @@ class QRTPacket(object):
 
     @ComponentGetter(QRTComponentType.ComponentImage, RTImageComponent)
     def get_image(self, component_info=None, data=None, component_position=None):
-        """Get image."""
+        """Get images, the image data of every camera in the format of its
+        RTImage."""
         components = []
         append_components = components.append
         for _ in range(component_info.image_count):
             component_position, image_info = QRTPacket._get_exact(
                 RTImage, data, component_position
             )
-            append_components((image_info, data[component_position:-1]))
+            image_end = component_position + image_info.image_size
+            append_components((image_info, data[component_position:image_end]))
+            component_position = image_end
+        return components
+
+    @ComponentGetter(QRTComponentType.ComponentGazeVector, RTGazeVectorComponent)
+    def get_gaze_vectors(self, component_info=None, data=None, component_position=None):
+        """Get gaze vectors, the samples of every eye tracker since the last
+        frame."""
+        components = []
+        append_components = components.append
+        for _ in range(component_info.vector_count):
+            component_position, gaze_vector = QRTPacket._get_exact(
+                RTGazeVector, data, component_position
+            )
+            sample_number = None
+            samples = []
+            if gaze_vector.sample_count > 0:
+                component_position, sample_number = QRTPacket._get_exact(
+                    RTSampleNumber, data, component_position
+                )
+                for _ in range(gaze_vector.sample_count):
+                    component_position, sample = QRTPacket._get_exact(
+                        RTGazeVectorSample, data, component_position
+                    )
+                    samples.append(sample)
+            append_components((gaze_vector, sample_number, samples))
+        return components
+
+    @ComponentGetter(QRTComponentType.ComponentTimecode, RTTimecodeComponent)
+    def get_timecode(self, component_info=None, data=None, component_position=None):
+        """Get timecodes, see :mod:`qtm.timecode` to decode them."""
+        components = []
+        append_components = components.append
+        for _ in range(component_info.timecode_count):
+            component_position, timecode = QRTPacket._get_exact(
+                RTTimecode, data, component_position
+            )
+            append_components(timecode)
         return components
 
     @ComponentGetter(QRTComponentType.Component3d, RT3DComponent)
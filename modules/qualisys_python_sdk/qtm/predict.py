@@ -0,0 +1,180 @@
+""" Latency compensation by extrapolating poses
+
+A predictor is updated with every frame and then asked where the positions
+and rotations will be some time ahead, typically the latency from the
+cameras to the display. All markers, bodies or segments of a frame are
+handled at once. Requires numpy.
+
+::
+
+    predictor = KalmanPredictor()
+    predictor.update(packet.timestamp * 1e-6, positions, quaternions)
+    positions, quaternions = predictor.predict(0.030)
+
+"""
+
+import numpy as np
+
+from qtm.rotation import (
+    conjugate,
+    from_rotation_vectors,
+    multiply,
+    to_rotation_vectors,
+)
+
+# pylint: disable=C0103, R0902
+
+
+def _as_array(values):
+    return None if values is None else np.array(values, dtype=np.float64)
+
+
+class ConstantVelocityPredictor(object):
+    """Extrapolates with the linear and angular velocity between frames.
+
+    Rows that are NaN, occluded markers or bodies that are not tracked, stay
+    NaN and start over with zero velocity once they are seen again.
+
+    :param smoothing: Weight of the newest velocity estimate. 1 uses the last
+        two frames only, lower values average over more frames and amplify
+        less noise at the cost of a slower response.
+    """
+
+    def __init__(self, smoothing=0.5):
+        self.smoothing = smoothing
+        self.reset()
+
+    def reset(self):
+        """ Forget all frames """
+        self._time = None
+        self._positions = None
+        self._rotations = None
+        self._velocity = None
+        self._angular_velocity = None
+
+    def _smooth(self, previous, estimate):
+        if previous is None:
+            return estimate
+
+        smoothed = previous + self.smoothing * (estimate - previous)
+        np.copyto(smoothed, estimate, where=np.isnan(previous))
+        return smoothed
+
+    def update(self, time, positions=None, rotations=None):
+        """Add a frame.
+
+        A frame that is not newer than the previous one, or with another
+        number of rows, starts over.
+
+        :param time: Time of the frame in seconds.
+        :param positions: (n, 3) array or None.
+        :param rotations: (m, 4) array of x, y, z, w unit quaternions or None.
+        """
+        positions = _as_array(positions)
+        rotations = _as_array(rotations)
+
+        if (
+            self._time is None
+            or time <= self._time
+            or np.shape(positions) != np.shape(self._positions)
+            or np.shape(rotations) != np.shape(self._rotations)
+        ):
+            self.reset()
+            self._time = time
+            self._positions = positions
+            self._rotations = rotations
+            return
+
+        dt = time - self._time
+
+        if positions is not None:
+            self._update_positions(dt, positions)
+
+        if rotations is not None:
+            delta = multiply(rotations, conjugate(self._rotations))
+            self._angular_velocity = self._smooth(
+                self._angular_velocity, to_rotation_vectors(delta) / dt
+            )
+            self._rotations = rotations
+
+        self._time = time
+
+    def _update_positions(self, dt, positions):
+        self._velocity = self._smooth(self._velocity, (positions - self._positions) / dt)
+        self._positions = positions
+
+    def predict(self, lookahead):
+        """Positions and rotations lookahead seconds after the latest frame.
+
+        Either is None if the frames have none, both are None before the
+        first frame.
+        """
+        positions = self._positions
+        rotations = self._rotations
+
+        if positions is not None and self._velocity is not None:
+            velocity = np.nan_to_num(self._velocity)
+            positions = positions + velocity * lookahead
+
+        if rotations is not None and self._angular_velocity is not None:
+            angular_velocity = np.nan_to_num(self._angular_velocity)
+            rotations = multiply(
+                from_rotation_vectors(angular_velocity * lookahead), rotations
+            )
+
+        return positions, rotations
+
+
+class KalmanPredictor(ConstantVelocityPredictor):
+    """Constant velocity Kalman filter for the positions.
+
+    Every coordinate has a position and velocity state. All coordinates share
+    the time steps and noise model and therefore also the covariance, so the
+    covariance update costs the same for one marker as for a thousand.
+    Rotations are extrapolated like in :class:`ConstantVelocityPredictor`.
+
+    :param process_noise: Spectral density of the acceleration in mm^2/s^3,
+        higher values follow sudden changes of velocity faster.
+    :param measurement_noise: Variance of the measured positions in mm^2.
+    :param smoothing: Smoothing of the angular velocity.
+    """
+
+    def __init__(self, process_noise=1e6, measurement_noise=0.25, smoothing=0.5):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        super(KalmanPredictor, self).__init__(smoothing)
+
+    def reset(self):
+        super(KalmanPredictor, self).reset()
+        self._covariance = None
+
+    def _update_positions(self, dt, positions):
+        if self._velocity is None:
+            # Start from the difference of the first two frames.
+            r = self.measurement_noise
+            self._velocity = np.nan_to_num((positions - self._positions) / dt)
+            self._positions = positions
+            self._covariance = np.array([[r, r / dt], [r / dt, 2 * r / dt ** 2]])
+            return
+
+        # Predict.
+        predicted = self._positions + self._velocity * dt
+        F = np.array([[1.0, dt], [0.0, 1.0]])
+        Q = self.process_noise * np.array(
+            [[dt ** 3 / 3, dt ** 2 / 2], [dt ** 2 / 2, dt]]
+        )
+        P = F.dot(self._covariance).dot(F.T) + Q
+
+        # Update.
+        S = P[0, 0] + self.measurement_noise
+        K = P[:, 0] / S
+        residual = positions - predicted
+
+        self._positions = predicted + K[0] * residual
+        self._velocity = self._velocity + K[1] * residual
+        self._covariance = P - np.outer(K, P[0])
+
+        # Occluded rows become NaN, rows seen again start over.
+        restarted = np.isnan(predicted) & ~np.isnan(positions)
+        self._positions[restarted] = positions[restarted]
+        self._velocity[restarted] = 0.0
@@ -3,6 +3,7 @@ import logging
 from qtm.packet import QRTPacketType
 from qtm.packet import QRTPacket, QRTEvent
 from qtm.packet import RTheader, RTEvent, RTCommand
+from qtm.instrumentation import INSTRUMENTATION, clock
 
 LOG = logging.getLogger("qtm")
 
@@ -11,9 +12,19 @@ class Receiver(object):
     def __init__(self, handlers):
         self._handlers = handlers
         self._received_data = b""
+        self._nested = 0.0
 
     def data_received(self, data):
         """ Received from QTM and route accordingly """
+        if INSTRUMENTATION.enabled:
+            start = clock()
+            self._nested = 0.0
+            self._data_received(data)
+            INSTRUMENTATION.record("receive", clock() - start - self._nested)
+        else:
+            self._data_received(data)
+
+    def _data_received(self, data):
         self._received_data += data
         h_size = RTheader.size
 
@@ -41,12 +52,29 @@ class Receiver(object):
         ):
             data = data[:-1]
         elif type_ == QRTPacketType.PacketData:
-            data = QRTPacket(data)
+            if INSTRUMENTATION.enabled:
+                start = clock()
+                data = QRTPacket(data)
+                elapsed = clock() - start
+
+                INSTRUMENTATION.record("parse", elapsed)
+                INSTRUMENTATION.frame_received()
+                self._nested += elapsed
+            else:
+                data = QRTPacket(data)
         elif type_ == QRTPacketType.PacketEvent:
             event, = RTEvent.unpack(data)
             data = QRTEvent(ord(event))
 
         try:
-            self._handlers[type_](data)
+            handler = self._handlers[type_]
         except KeyError:
             LOG.error("Non handled packet type! - %s", type_)
+            return
+
+        if INSTRUMENTATION.enabled:
+            start = clock()
+            handler(data)
+            self._nested += clock() - start
+        else:
+            handler(data)
@@ -0,0 +1,265 @@
+""" Automatic reconnect with state restore for QRTConnection """
+
+import asyncio
+import collections
+import logging
+
+from qtm.protocol import QRTCommandException
+from qtm.qrt import connect
+
+# pylint: disable=C0330
+
+LOG = logging.getLogger("qtm")
+
+
+class ReconnectingConnection(object):
+    """Keep a connection to QTM alive across dropped links.
+
+    A warm spare connection is kept open next to the active one. When the active
+    connection is lost the spare is promoted, otherwise new connections are attempted
+    with exponential backoff. Both connections are created by :func:`~qtm.connect`,
+    which sets the protocol version, and the last
+    :func:`~qtm.QRTConnection.stream_frames` call is re-applied after reconnect.
+
+    Other :class:`~qtm.QRTConnection` coroutines can be called directly on this
+    object and are forwarded to the active connection.
+
+    :param host: Address of the computer running QTM.
+    :param port: Port number to connect to.
+    :param version: What version of the protocol to use.
+    :param on_event: Function to be called when there's an event from QTM.
+    :param on_reconnect: Function called with the reconnect latency in seconds
+        every time the connection has been restored.
+    :param timeout: The default timeout time for calls to QTM.
+    :param spare: Keep a warm spare connection open.
+    :param backoff: Delay in seconds before the first reconnect attempt.
+    :param backoff_max: Upper limit of the delay between reconnect attempts.
+    :param backoff_factor: Factor the delay grows with after each failed attempt.
+    :param max_attempts: Give up after this many failed attempts, None to never give up.
+    :param on_give_up: Function called with the number of attempts when
+        reconnecting was given up.
+    :param loop: Alternative event loop, will use asyncio default if None.
+    """
+
+    def __init__(
+        self,
+        host,
+        port=22223,
+        version="1.18",
+        on_event=None,
+        on_reconnect=None,
+        timeout=5,
+        spare=True,
+        backoff=0.05,
+        backoff_max=2.0,
+        backoff_factor=2.0,
+        max_attempts=None,
+        on_give_up=None,
+        loop=None,
+    ):
+        self.host = host
+        self.port = port
+        self.version = version
+        self.on_event = on_event
+        self.on_reconnect = on_reconnect
+        self.timeout = timeout
+        self.spare = spare
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.backoff_factor = backoff_factor
+        self.max_attempts = max_attempts
+        self.on_give_up = on_give_up
+        self.loop = loop or asyncio.get_event_loop()
+
+        self.reconnect_latencies = collections.deque(maxlen=100)
+
+        self._active = None
+        self._spare = None
+        self._stream_args = None
+        self._reconnect_task = None
+        self._spare_task = None
+        self._closed = False
+
+    @property
+    def connection(self):
+        """ The active :class:`~qtm.QRTConnection` or None while reconnecting """
+        return None if self._active is None else self._active[1]
+
+    @property
+    def last_reconnect_latency(self):
+        """ Time in seconds it took to restore the connection the last time """
+        return self.reconnect_latencies[-1] if self.reconnect_latencies else None
+
+    def __getattr__(self, name):
+        connection = self.__dict__.get("_active")
+
+        if connection is None:
+            raise AttributeError(name)
+
+        return getattr(connection[1], name)
+
+    async def start(self):
+        """Connect to QTM.
+
+        :rtype: True if connected.
+        """
+        self._closed = False
+        self._active = await self._connect()
+
+        if self._active is None:
+            return False
+
+        self._warm_spare()
+        return True
+
+    async def stream_frames(self, frames="allframes", components=None, on_packet=None):
+        """Same as :func:`~qtm.QRTConnection.stream_frames`, but remembered so that
+        streaming is resumed after a reconnect.
+        """
+        self._stream_args = dict(
+            frames=frames, components=components, on_packet=on_packet
+        )
+        return await self.connection.stream_frames(**self._stream_args)
+
+    async def stream_frames_stop(self):
+        """Same as :func:`~qtm.QRTConnection.stream_frames_stop`."""
+        self._stream_args = None
+        await self.connection.stream_frames_stop()
+
+    def disconnect(self):
+        """Disconnect from QTM without reconnecting."""
+        self._closed = True
+
+        for task in (self._reconnect_task, self._spare_task):
+            if task is not None:
+                task.cancel()
+
+        for slot in (self._active, self._spare):
+            if slot is not None and slot[1].has_transport():
+                slot[1].disconnect()
+
+        self._active = None
+        self._spare = None
+
+    async def _connect(self):
+        token = object()
+        connection = await connect(
+            self.host,
+            port=self.port,
+            version=self.version,
+            on_event=lambda event: self._event(token, event),
+            on_disconnect=lambda exc: self._connection_lost(token, exc),
+            timeout=self.timeout,
+            loop=self.loop,
+        )
+
+        return None if connection is None else (token, connection)
+
+    def _event(self, token, event):
+        if self.on_event is not None and self._is_active(token):
+            self.on_event(event)
+
+    def _is_active(self, token):
+        return self._active is not None and self._active[0] is token
+
+    def _connection_lost(self, token, exc):
+        if self._spare is not None and self._spare[0] is token:
+            LOG.info("Spare connection lost")
+            self._spare = None
+
+            if self._active is not None and not self._closed:
+                self._warm_spare()
+            return
+
+        if not self._is_active(token) or self._closed:
+            return
+
+        LOG.info("Connection lost, reconnecting (%s)", exc)
+        self._active = None
+
+        if self._reconnect_task is None:
+            self._reconnect_task = self.loop.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        start = self.loop.time()
+        delay = self.backoff
+        attempts = 0
+
+        try:
+            while True:
+                candidate, self._spare = self._spare, None
+
+                # A spare often goes down with the active connection, which
+                # may not show until it is used.
+                if candidate is None or not candidate[1].has_transport():
+                    candidate = await self._connect()
+
+                if candidate is not None and await self._resume(candidate):
+                    break
+
+                attempts += 1
+                if self.max_attempts is not None and attempts >= self.max_attempts:
+                    LOG.error("Giving up reconnecting after %d attempts", attempts)
+
+                    if self.on_give_up is not None:
+                        self.on_give_up(attempts)
+                    return
+
+                await asyncio.sleep(delay)
+                delay = min(delay * self.backoff_factor, self.backoff_max)
+        finally:
+            self._reconnect_task = None
+
+        latency = self.loop.time() - start
+        self.reconnect_latencies.append(latency)
+        LOG.info("Reconnected in %.1f ms", latency * 1000)
+
+        if self.on_reconnect is not None:
+            self.on_reconnect(latency)
+
+        self._warm_spare()
+
+    async def _resume(self, candidate):
+        """Make candidate the active connection and restore streaming on it.
+
+        :rtype: False if the connection failed, it is then discarded.
+        """
+        self._active = candidate
+        failed = False
+
+        try:
+            if self._stream_args is not None:
+                await candidate[1].stream_frames(**self._stream_args)
+        except (QRTCommandException, asyncio.TimeoutError, OSError) as exception:
+            LOG.info("Reconnected connection failed (%s)", exception)
+            failed = True
+
+        if not failed and self._is_active(candidate[0]) and candidate[1].has_transport():
+            return True
+
+        if self._is_active(candidate[0]):
+            self._active = None
+
+        if candidate[1].has_transport():
+            candidate[1].disconnect()
+
+        return False
+
+    def _warm_spare(self):
+        if not self.spare or self._spare is not None or self._spare_task is not None:
+            return
+
+        self._spare_task = self.loop.create_task(self._open_spare())
+
+    async def _open_spare(self):
+        try:
+            spare = await self._connect()
+        finally:
+            self._spare_task = None
+
+        if spare is None or self._closed:
+            if spare is not None:
+                spare[1].disconnect()
+            return
+
+        self._spare = spare
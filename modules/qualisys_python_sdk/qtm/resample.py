@@ -0,0 +1,167 @@
+""" Resampling of timestamped frames to another rate
+
+QTM captures at 100 - 360 Hz while a scene is usually shown at 24 - 60 fps.
+:class:`FrameBuffer` keeps the most recent frames and evaluates them at any
+time in between, positions linearly and rotations by slerp, for all markers,
+bodies or segments at once. Requires numpy.
+
+::
+
+    buffer = FrameBuffer()
+    buffer.push(packet.timestamp * 1e-6, positions, quaternions)
+    ...
+    positions, quaternions = buffer.sample(scene_time)
+
+"""
+
+import numpy as np
+
+from qtm.rotation import slerp
+
+# pylint: disable=C0103, R0902
+
+
+class FrameBuffer(object):
+    """Ring buffer of the last capacity frames in preallocated arrays.
+
+    All frames must have the same number of positions and rotations, a frame
+    with another shape empties the buffer.
+
+    :param capacity: Number of frames kept.
+    """
+
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self._times = np.empty(capacity)
+        self._positions = None
+        self._rotations = None
+        self._shapes = None
+        self._count = 0
+        self._newest = -1
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        """ Drop all frames """
+        self._count = 0
+        self._newest = -1
+
+    @property
+    def newest(self):
+        """ Time of the newest frame, None when empty """
+        return self._times[self._newest] if self._count else None
+
+    @property
+    def oldest(self):
+        """ Time of the oldest frame, None when empty """
+        return self._times[self._index(self._count - 1)] if self._count else None
+
+    @property
+    def interval(self):
+        """ Time between the two newest frames, None with less than two frames """
+        if self._count < 2:
+            return None
+
+        return self._times[self._newest] - self._times[self._index(1)]
+
+    def _index(self, age):
+        return (self._newest - age) % self.capacity
+
+    def _allocate(self, positions, rotations):
+        shapes = tuple(
+            None if array is None else np.shape(array) for array in (positions, rotations)
+        )
+
+        if shapes == self._shapes:
+            return
+
+        self._shapes = shapes
+        self._positions, self._rotations = (
+            None if shape is None else np.empty((self.capacity,) + shape)
+            for shape in shapes
+        )
+        self.clear()
+
+    def push(self, time, positions=None, rotations=None):
+        """Add a frame.
+
+        A frame that is not newer than the newest one restarts the buffer,
+        QTM restarts its clock with every measurement.
+
+        :param time: Time of the frame in seconds.
+        :param positions: (n, 3) array or None.
+        :param rotations: (m, 4) array of unit quaternions or None.
+        """
+        self._allocate(positions, rotations)
+
+        if self._count and time <= self._times[self._newest]:
+            self.clear()
+
+        self._newest = (self._newest + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        self._times[self._newest] = time
+
+        if positions is not None:
+            self._positions[self._newest] = positions
+
+        if rotations is not None:
+            self._rotations[self._newest] = rotations
+
+    def sample(self, time, positions=None, rotations=None):
+        """Evaluate the frames at time.
+
+        Times outside the buffered frames are clamped to the oldest or newest
+        frame. Returns None when the buffer is empty, otherwise positions and
+        rotations, either of which is None if the frames have none.
+
+        :param time: Time in seconds.
+        :param positions: Optional array to write the positions to.
+        :param rotations: Optional array to write the rotations to.
+        """
+        if not self._count:
+            return None
+
+        # Scene time trails the newest frame by a few frames, so search from
+        # the newest end.
+        age = 0
+
+        while age < self._count and self._times[self._index(age)] > time:
+            age += 1
+
+        if age == 0 or age == self._count:
+            return self._copy(self._index(min(age, self._count - 1)), positions, rotations)
+
+        before = self._index(age)
+        after = self._index(age - 1)
+        t = (time - self._times[before]) / (self._times[after] - self._times[before])
+
+        if self._positions is not None:
+            if positions is None:
+                positions = np.empty(self._positions.shape[1:])
+
+            np.subtract(self._positions[after], self._positions[before], out=positions)
+            positions *= t
+            positions += self._positions[before]
+
+        if self._rotations is not None:
+            rotations = slerp(
+                self._rotations[before], self._rotations[after], t, out=rotations
+            )
+
+        return positions, rotations
+
+    def _copy(self, index, positions, rotations):
+        if self._positions is not None:
+            if positions is None:
+                positions = self._positions[index].copy()
+            else:
+                positions[...] = self._positions[index]
+
+        if self._rotations is not None:
+            if rotations is None:
+                rotations = self._rotations[index].copy()
+            else:
+                rotations[...] = self._rotations[index]
+
+        return positions, rotations
@@ -0,0 +1,223 @@
+""" Vectorized rotation conversions and interpolation
+
+Quaternions are stored as x, y, z, w, the order QTM uses for skeleton
+segments. Every function works on arrays of rotations. Requires numpy.
+"""
+
+import numpy as np
+
+# pylint: disable=C0103
+
+
+def matrices_to_quaternions(matrices):
+    """Convert (..., 3, 3) rotation matrices to (..., 4) unit quaternions."""
+    matrices = np.asarray(matrices, dtype=np.float64)
+    shape = matrices.shape[:-2]
+    m = matrices.reshape(-1, 3, 3)
+    rows = np.arange(len(m))
+
+    # Build every quaternion from the largest of the diagonal elements and
+    # the trace to stay away from cancellation.
+    decision = np.empty((len(m), 4))
+    decision[:, 0] = m[:, 0, 0]
+    decision[:, 1] = m[:, 1, 1]
+    decision[:, 2] = m[:, 2, 2]
+    decision[:, 3] = decision[:, :3].sum(axis=1)
+    choice = decision.argmax(axis=1)
+
+    q = np.empty((len(m), 4))
+
+    axis = choice != 3
+    i = choice[axis]
+    j = (i + 1) % 3
+    k = (j + 1) % 3
+    r = rows[axis]
+
+    q[r, i] = 1 - decision[r, 3] + 2 * m[r, i, i]
+    q[r, j] = m[r, j, i] + m[r, i, j]
+    q[r, k] = m[r, k, i] + m[r, i, k]
+    q[r, 3] = m[r, k, j] - m[r, j, k]
+
+    r = rows[~axis]
+
+    q[r, 0] = m[r, 2, 1] - m[r, 1, 2]
+    q[r, 1] = m[r, 0, 2] - m[r, 2, 0]
+    q[r, 2] = m[r, 1, 0] - m[r, 0, 1]
+    q[r, 3] = 1 + decision[r, 3]
+
+    q /= np.linalg.norm(q, axis=1)[:, None]
+    return q.reshape(shape + (4,))
+
+
+def quaternions_to_matrices(quaternions):
+    """Convert (..., 4) quaternions to (..., 3, 3) rotation matrices."""
+    q = np.asarray(quaternions, dtype=np.float64)
+    q = q / np.linalg.norm(q, axis=-1)[..., None]
+    x, y, z, w = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+
+    m = np.empty(q.shape[:-1] + (3, 3))
+    m[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    m[..., 0, 1] = 2 * (x * y - z * w)
+    m[..., 0, 2] = 2 * (x * z + y * w)
+    m[..., 1, 0] = 2 * (x * y + z * w)
+    m[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    m[..., 1, 2] = 2 * (y * z - x * w)
+    m[..., 2, 0] = 2 * (x * z - y * w)
+    m[..., 2, 1] = 2 * (y * z + x * w)
+    m[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return m
+
+
+def slerp(q0, q1, t, out=None):
+    """Spherical linear interpolation between (n, 4) unit quaternions.
+
+    Takes the shortest path, q1 is negated where the quaternions lie in
+    opposite hemispheres.
+
+    :param t: Interpolation parameter, a scalar or one value per rotation.
+    :param out: Optional (n, 4) array to write the result to.
+    """
+    q0 = np.asarray(q0, dtype=np.float64)
+    q1 = np.asarray(q1, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)
+
+    dot = np.einsum("ij,ij->i", q0, q1)
+    sign = np.where(dot < 0, -1.0, 1.0)
+    dot = np.minimum(np.abs(dot), 1.0)
+
+    theta = np.arccos(dot)
+    sin_theta = np.sin(theta)
+    linear = sin_theta < 1e-6
+    sin_theta[linear] = 1.0
+
+    s0 = np.where(linear, 1 - t, np.sin((1 - t) * theta) / sin_theta)
+    s1 = np.where(linear, t, np.sin(t * theta) / sin_theta) * sign
+
+    if out is None:
+        out = np.empty(q0.shape)
+
+    np.multiply(q0, s0[:, None], out=out)
+    out += q1 * s1[:, None]
+
+    # Only the nearly parallel rotations, interpolated linearly, drift off the
+    # unit sphere.
+    if linear.any():
+        out[linear] /= np.linalg.norm(out[linear], axis=1)[:, None]
+
+    return out
+
+
+def multiply(q0, q1, out=None):
+    """Hamilton product of (..., 4) quaternions, the rotation q1 followed by q0."""
+    q0 = np.asarray(q0, dtype=np.float64)
+    q1 = np.asarray(q1, dtype=np.float64)
+    x0, y0, z0, w0 = q0[..., 0], q0[..., 1], q0[..., 2], q0[..., 3]
+    x1, y1, z1, w1 = q1[..., 0], q1[..., 1], q1[..., 2], q1[..., 3]
+
+    if out is None:
+        out = np.empty(np.broadcast(q0, q1).shape)
+
+    # Computed into temporaries first so that out may alias q0 or q1.
+    x = w0 * x1 + x0 * w1 + y0 * z1 - z0 * y1
+    y = w0 * y1 - x0 * z1 + y0 * w1 + z0 * x1
+    z = w0 * z1 + x0 * y1 - y0 * x1 + z0 * w1
+    w = w0 * w1 - x0 * x1 - y0 * y1 - z0 * z1
+
+    out[..., 0] = x
+    out[..., 1] = y
+    out[..., 2] = z
+    out[..., 3] = w
+    return out
+
+
+def conjugate(quaternions):
+    """Inverse of (..., 4) unit quaternions."""
+    q = np.array(quaternions, dtype=np.float64)
+    q[..., :3] *= -1
+    return q
+
+
+def to_rotation_vectors(quaternions):
+    """Convert (..., 4) unit quaternions to (..., 3) axis times angle in radians.
+
+    The shorter of the two equivalent rotations is returned.
+    """
+    q = np.asarray(quaternions, dtype=np.float64)
+    q = np.where(q[..., 3:] < 0, -q, q)
+
+    sin_half = np.linalg.norm(q[..., :3], axis=-1)
+    angle = 2 * np.arctan2(sin_half, q[..., 3])
+
+    # angle / sin(angle / 2) tends to 2 for small angles.
+    small = sin_half < 1e-9
+    scale = np.where(small, 2.0, angle / np.where(small, 1.0, sin_half))
+    return q[..., :3] * scale[..., None]
+
+
+def from_rotation_vectors(vectors):
+    """Convert (..., 3) axis times angle in radians to (..., 4) unit quaternions."""
+    v = np.asarray(vectors, dtype=np.float64)
+    angle = np.linalg.norm(v, axis=-1)
+    half = angle / 2
+
+    # sin(angle / 2) / angle tends to 1 / 2 for small angles.
+    small = angle < 1e-9
+    scale = np.where(small, 0.5 - angle * angle / 48, np.sin(half) / np.where(small, 1.0, angle))
+
+    q = np.empty(v.shape[:-1] + (4,))
+    q[..., :3] = v * scale[..., None]
+    q[..., 3] = np.cos(half)
+    return q
+
+
+def quaternions_to_euler(quaternions, order="xyz"):
+    """Convert (..., 4) quaternions to (..., 3) Euler angles in radians.
+
+    :param order: Axes in the order the rotations are applied, like the
+        rotate order of a Maya transform, so "xyz" rotates about x first.
+    :returns: Angles about x, y and z, whatever the order.
+    """
+    i, j, k = ("xyz".index(axis) for axis in order)
+    m = quaternions_to_matrices(quaternions)
+
+    # The signs flip for the orders that are odd permutations of xyz.
+    sign = 1.0 if (j - i) % 3 == 1 else -1.0
+    sin_middle = np.clip(-sign * m[..., k, i], -1.0, 1.0)
+
+    # In gimbal lock only the sum of the first and last angle is defined,
+    # the last one is set to zero.
+    lock = np.abs(sin_middle) > 1 - 1e-12
+
+    angles = np.empty(m.shape[:-2] + (3,))
+    angles[..., j] = np.arcsin(sin_middle)
+    angles[..., i] = np.where(
+        lock,
+        np.arctan2(-sign * m[..., j, k], m[..., j, j]),
+        np.arctan2(sign * m[..., k, j], m[..., k, k]),
+    )
+    angles[..., k] = np.where(lock, 0.0, np.arctan2(sign * m[..., j, i], m[..., i, i]))
+    return angles
+
+
+def aim_quaternions(directions, axis=(1.0, 0.0, 0.0)):
+    """(..., 4) shortest rotations that turn axis, a unit vector, to point
+    along (..., 3) directions. Directions of zero length give NaN."""
+    b = np.asarray(directions, dtype=np.float64)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        b = b / np.linalg.norm(b, axis=-1, keepdims=True)
+
+    a = np.broadcast_to(np.asarray(axis, dtype=np.float64), b.shape)
+
+    q = np.empty(b.shape[:-1] + (4,))
+    q[..., :3] = np.cross(a, b)
+    q[..., 3] = 1 + np.sum(a * b, axis=-1)
+
+    # Half turns about any axis perpendicular to axis.
+    opposite = q[..., 3] < 1e-9
+    if opposite.any():
+        other = np.where(abs(a[..., :1]) < 0.9, [1.0, 0.0, 0.0], [0.0, 1.0, 0.0])
+        q[..., :3] = np.where(opposite[..., None], np.cross(a, other), q[..., :3])
+        q[..., 3] = np.where(opposite, 0.0, q[..., 3])
+
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
@@ -0,0 +1,201 @@
+""" Parser for the settings XML returned by getparameters """
+
+import xml.etree.ElementTree as ET
+
+# pylint: disable=C0103, R0903
+
+
+class Label3D(object):
+    """ A labelled 3D trajectory """
+
+    __slots__ = ("index", "name", "color")
+
+    def __init__(self, index, name, color):
+        self.index = index
+        self.name = name
+        self.color = color
+
+    @property
+    def rgb(self):
+        """ Color as a (red, green, blue) tuple """
+        return (self.color >> 16) & 0xFF, (self.color >> 8) & 0xFF, self.color & 0xFF
+
+    def __repr__(self):
+        return "Label3D(%d, %r)" % (self.index, self.name)
+
+
+class Point(object):
+    """ A point of a 6DOF body definition """
+
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def __repr__(self):
+        return "Point(%g, %g, %g)" % (self.x, self.y, self.z)
+
+
+class Body6D(object):
+    """ A 6DOF body definition """
+
+    __slots__ = ("index", "name", "color", "points")
+
+    def __init__(self, index, name, color, points):
+        self.index = index
+        self.name = name
+        self.color = color
+        self.points = points
+
+    def __repr__(self):
+        return "Body6D(%d, %r)" % (self.index, self.name)
+
+
+class Segment(object):
+    """A skeleton segment in its T-pose.
+
+    position is a (x, y, z) and rotation a (x, y, z, w) quaternion tuple,
+    parent_id is None for the root segment.
+    """
+
+    __slots__ = ("id", "name", "parent_id", "position", "rotation")
+
+    def __init__(self, id, name, parent_id, position, rotation):
+        self.id = id
+        self.name = name
+        self.parent_id = parent_id
+        self.position = position
+        self.rotation = rotation
+
+    def __repr__(self):
+        return "Segment(%d, %r)" % (self.id, self.name)
+
+
+class Skeleton(object):
+    """ A skeleton definition, segments are ordered parents first """
+
+    __slots__ = ("name", "segments")
+
+    def __init__(self, name, segments):
+        self.name = name
+        self.segments = segments
+
+    def __repr__(self):
+        return "Skeleton(%r, %d segments)" % (self.name, len(self.segments))
+
+
+class Settings(object):
+    """Settings parsed from a QTM parameters XML document.
+
+    Components that were not requested are left empty.
+    """
+
+    __slots__ = ("version", "axis_upwards", "labels", "bodies", "skeletons")
+
+    def __init__(self, version=None, axis_upwards=None, labels=None, bodies=None,
+                 skeletons=None):
+        self.version = version
+        self.axis_upwards = axis_upwards
+        self.labels = labels or []
+        self.bodies = bodies or []
+        self.skeletons = skeletons or []
+
+
+def _float(element, tag):
+    return float(element.findtext(tag, "0"))
+
+
+def _attributes(element, names):
+    if element is None:
+        return tuple(0.0 for _ in names)
+
+    get = element.get
+    return tuple(float(get(name, "0")) for name in names)
+
+
+def _parse_3d(element):
+    return [
+        Label3D(index, label.findtext("Name"), int(label.findtext("RGBColor", "0")))
+        for index, label in enumerate(element.iterfind("Label"))
+    ]
+
+
+def _parse_6d(element):
+    bodies = []
+
+    for index, body in enumerate(element.iterfind("Body")):
+        points = [
+            Point(_float(point, "X"), _float(point, "Y"), _float(point, "Z"))
+            for point in body.iterfind("Point")
+        ]
+        bodies.append(
+            Body6D(
+                index,
+                body.findtext("Name"),
+                int(body.findtext("RGBColor", "0")),
+                points,
+            )
+        )
+
+    return bodies
+
+
+def _parse_segments(element, parent_id, segments):
+    # Segments are listed flat with a Parent_ID attribute, but nesting is
+    # followed as well so that the parent is known either way.
+    for segment in element.iterfind("Segment"):
+        segment_id = int(segment.get("ID"))
+        segment_parent_id = segment.get("Parent_ID")
+
+        segments.append(
+            Segment(
+                segment_id,
+                segment.get("Name"),
+                parent_id if segment_parent_id is None else int(segment_parent_id),
+                _attributes(segment.find("Position"), ("X", "Y", "Z")),
+                _attributes(segment.find("Rotation"), ("X", "Y", "Z", "W")),
+            )
+        )
+        _parse_segments(segment, segment_id, segments)
+
+    return segments
+
+
+def _parse_skeletons(element):
+    return [
+        Skeleton(skeleton.get("Name"), _parse_segments(skeleton, None, []))
+        for skeleton in element.iterfind("Skeleton")
+    ]
+
+
+def parse_settings(xml):
+    """Parse the XML returned by getparameters.
+
+    :param xml: XML document as str or bytes.
+    :rtype: A :class:`Settings` instance.
+    """
+    if not isinstance(xml, bytes):
+        xml = xml.encode("utf-8")
+
+    root = ET.fromstring(xml)
+    settings = Settings(version=root.tag.replace("QTM_Parameters_Ver_", ""))
+
+    the_3d = root.find("The_3D")
+    if the_3d is not None:
+        settings.axis_upwards = the_3d.findtext("AxisUpwards")
+        settings.labels = _parse_3d(the_3d)
+
+    the_6d = root.find("The_6D")
+    if the_6d is not None:
+        settings.bodies = _parse_6d(the_6d)
+
+    skeletons = root.find("Skeletons")
+    if skeletons is not None:
+        settings.skeletons = _parse_skeletons(skeletons)
+
+    return settings
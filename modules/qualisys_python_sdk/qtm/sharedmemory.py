@@ -0,0 +1,245 @@
+""" Latest decoded frame shared between processes
+
+A process that receives and decodes frames writes them to a
+:class:`SharedFrameBuffer` and other processes copy the newest one out of
+shared memory, a single copy of a fixed-size record per frame.
+
+The buffer has two slots. The writer fills the slot that is not the latest
+one and then publishes it. Every slot has a counter that is odd while the
+slot is being written, so a reader whose copy overlapped a write can tell
+and retry. Requires numpy and Python 3.8 or later.
+
+::
+
+    buffer = SharedFrameBuffer.create(markers=40, bodies=2, segments=22)
+
+    # In the decoding process
+    writer = SharedFrameBuffer.open(buffer.name)
+    writer.write(packet.framenumber, packet.timestamp, positions=positions)
+
+    # In the reading process
+    frame = buffer.frame()
+    if buffer.read(frame) is not None:
+        positions = frame["positions"]
+
+"""
+
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# pylint: disable=C0103, W0212
+
+MAGIC = 0x46525451  # "QTRF"
+
+# Header of int64 values, followed by the two slots.
+_MAGIC, _MARKERS, _BODIES, _SEGMENTS, _LATEST, _SEQUENCE, _COUNTERS = range(7)
+HEADER_SIZE = 8 * 8
+
+
+def frame_dtype(markers=0, bodies=0, segments=0):
+    """Record of one frame. Rotations of bodies are 3x3 matrices that rotate
+    column vectors and rotations of segments x, y, z, w quaternions."""
+    return np.dtype(
+        [
+            ("sequence", "<i8"),
+            ("framenumber", "<i8"),
+            ("timestamp", "<i8"),
+            ("drop_rate", "<i8"),
+            ("out_of_sync_rate", "<i8"),
+            ("positions", "<f8", (markers, 3)),
+            ("body_positions", "<f8", (bodies, 3)),
+            ("body_rotations", "<f8", (bodies, 3, 3)),
+            ("segment_ids", "<i8", (segments,)),
+            ("segment_positions", "<f8", (segments, 3)),
+            ("segment_rotations", "<f8", (segments, 4)),
+        ]
+    )
+
+
+ARRAYS = (
+    "positions",
+    "body_positions",
+    "body_rotations",
+    "segment_ids",
+    "segment_positions",
+    "segment_rotations",
+)
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    if os.name != "posix":
+        return shared_memory.SharedMemory(name=name)
+
+    # Before Python 3.13 a process that attached would also remove the memory
+    # when it exits, keep it from being tracked.
+    from multiprocessing import resource_tracker
+
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: (
+        None if rtype == "shared_memory" else register(name, rtype)
+    )
+
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedFrameBuffer(object):
+    """Double buffered frame in shared memory.
+
+    Use :meth:`create` in the process that owns the memory and :meth:`open`
+    with its :attr:`name` in the others. The number of markers, bodies and
+    segments is fixed when the buffer is created.
+    """
+
+    def __init__(self, memory, owner=False):
+        self._memory = memory
+        self._owner = owner
+        self._header = np.ndarray(8, dtype="<i8", buffer=memory.buf)
+
+        if self._header[_MAGIC] != MAGIC:
+            self._header = None
+            memory.close()
+            raise ValueError("%s is not a shared frame buffer" % memory.name)
+
+        self.dtype = frame_dtype(*self.shape)
+        self._slots = np.ndarray(
+            2, dtype=self.dtype, buffer=memory.buf, offset=HEADER_SIZE
+        )
+
+    @classmethod
+    def create(cls, markers=0, bodies=0, segments=0, name=None):
+        """Create a buffer, which is removed when it is closed."""
+        size = HEADER_SIZE + 2 * frame_dtype(markers, bodies, segments).itemsize
+        memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray(8, dtype="<i8", buffer=memory.buf)
+        header[:] = 0
+        header[_MAGIC] = MAGIC
+        header[_MARKERS] = markers
+        header[_BODIES] = bodies
+        header[_SEGMENTS] = segments
+        # The first frame goes to slot 0.
+        header[_LATEST] = 1
+        del header
+
+        return cls(memory, owner=True)
+
+    @classmethod
+    def open(cls, name):
+        """Attach to a buffer created by another process."""
+        return cls(_attach(name))
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    @property
+    def shape(self):
+        """ Number of markers, bodies and segments """
+        return tuple(int(count) for count in self._header[_MARKERS:_SEGMENTS + 1])
+
+    @property
+    def sequence(self):
+        """Number of frames written, cheap to poll before :meth:`read`."""
+        return int(self._header[_SEQUENCE])
+
+    def frame(self):
+        """ A record to :meth:`read` into """
+        return np.zeros((), dtype=self.dtype)
+
+    def write(self, framenumber, timestamp, drop_rate=0, out_of_sync_rate=0, **arrays):
+        """Write and publish a frame.
+
+        :param arrays: Any of positions, body_positions, body_rotations,
+            segment_ids, segment_positions and segment_rotations, with the
+            shapes of :func:`frame_dtype`. Arrays that are left out are NaN,
+            or -1 for the segment ids.
+        """
+        unknown = set(arrays) - set(ARRAYS)
+
+        if unknown:
+            raise TypeError("Unknown arrays: %s" % ", ".join(sorted(unknown)))
+
+        header = self._header
+        slot = 1 - int(header[_LATEST])
+        sequence = int(header[_SEQUENCE]) + 1
+        frame = self._slots[slot : slot + 1]
+
+        header[_COUNTERS + slot] += 1
+
+        # The counter is even again after a failed write, which is not
+        # published.
+        try:
+            frame["sequence"] = sequence
+            frame["framenumber"] = framenumber
+            frame["timestamp"] = timestamp
+            frame["drop_rate"] = drop_rate
+            frame["out_of_sync_rate"] = out_of_sync_rate
+
+            for name in ARRAYS:
+                values = arrays.get(name)
+
+                if values is not None:
+                    frame[name][0] = values
+                else:
+                    frame[name] = -1 if name == "segment_ids" else np.nan
+        finally:
+            header[_COUNTERS + slot] += 1
+
+        header[_LATEST] = slot
+        header[_SEQUENCE] = sequence
+
+    def read(self, out, retries=100):
+        """Copy the latest frame into out, a record from :meth:`frame`.
+
+        :returns: The sequence number of the frame, None if nothing has been
+            written yet or every attempt overlapped a write.
+        """
+        header = self._header
+
+        for _ in range(retries):
+            if header[_SEQUENCE] == 0:
+                return None
+
+            slot = int(header[_LATEST])
+            before = header[_COUNTERS + slot]
+
+            if before % 2:
+                continue
+
+            out[...] = self._slots[slot]
+
+            if header[_COUNTERS + slot] == before:
+                return int(out["sequence"])
+
+        return None
+
+    def close(self):
+        """Detach, the creating process also removes the memory."""
+        if self._memory is None:
+            return
+
+        # Views of the memory must be gone before it can be closed.
+        self._header = None
+        self._slots = None
+        self._memory.close()
+
+        if self._owner:
+            self._memory.unlink()
+
+        self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
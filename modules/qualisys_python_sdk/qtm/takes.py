@@ -0,0 +1,376 @@
+""" Recorded takes stored as memory-mapped columns
+
+A take is a directory with the settings XML it was recorded with, a
+frame number and timestamp index and one column per kind of data, split
+into chunks of a fixed number of frames::
+
+    settings.xml
+    take.json
+    index.bin                       framenumber, timestamp per frame
+    positions_000000.npy            (chunk_frames, markers, 3)
+    body_positions_000000.npy       (chunk_frames, bodies, 3)
+    body_rotations_000000.npy       (chunk_frames, bodies, 3, 3)
+    segment_positions_000000.npy    (chunk_frames, segments, 3)
+    segment_rotations_000000.npy    (chunk_frames, segments, 4)
+    timecode_000000.npy             (chunk_frames,) seconds
+
+Chunks are opened with ``np.memmap``, so reading any frame costs the same
+however long the take is and only the pages that are touched are loaded.
+Requires numpy.
+
+::
+
+    with TakeWriter("session", settings_xml) as writer:
+        writer.append_packet(packet)
+
+    take = Take("session")
+    frame = take.frame(take.index_of(framenumber))
+
+"""
+
+import collections
+import json
+import os
+
+import numpy as np
+
+from qtm.arrays import get_3d_array, get_6d_arrays, get_skeleton_arrays
+from qtm.settings import parse_settings
+from qtm.timecode import TimecodeLock
+
+# pylint: disable=C0103
+
+FORMAT_VERSION = 1
+
+INDEX = np.dtype([("framenumber", "<i8"), ("timestamp", "<i8")])
+
+# Chunks kept open by a reader.
+OPEN_CHUNKS = 16
+
+
+def columns(markers=0, bodies=0, segments=0, timecode=False):
+    """Dtype and frame shape of every column, columns without elements are
+    left out. The timecode column holds the time of every frame on the
+    timecode clock, see :class:`qtm.timecode.TimecodeLock`."""
+    shapes = collections.OrderedDict(
+        [
+            ("positions", (markers, 3)),
+            ("body_positions", (bodies, 3)),
+            ("body_rotations", (bodies, 3, 3)),
+            ("segment_positions", (segments, 3)),
+            ("segment_rotations", (segments, 4)),
+        ]
+    )
+    result = collections.OrderedDict(
+        (name, ("<f4", shape)) for name, shape in shapes.items() if shape[0] > 0
+    )
+
+    if timecode:
+        result["timecode"] = ("<f8", ())
+
+    return result
+
+
+def _chunk_path(path, name, chunk):
+    return os.path.join(path, "%s_%06d.npy" % (name, chunk))
+
+
+class TakeWriter(object):
+    """Appends frames to a new take.
+
+    :param path: Directory of the take, created if needed.
+    :param settings_xml: Settings XML of the 3D, 6D and skeleton components.
+    :param components: Components that are recorded, out of 3d, 6d,
+        skeleton and timecode.
+    :param chunk_frames: Frames per chunk file.
+    :param smpte_rate: Frames per second of SMPTE timecodes.
+    """
+
+    def __init__(
+        self,
+        path,
+        settings_xml,
+        components=("3d", "6d", "skeleton"),
+        chunk_frames=4096,
+        smpte_rate=30,
+    ):
+        if not isinstance(settings_xml, bytes):
+            settings_xml = settings_xml.encode("utf-8")
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        settings = parse_settings(settings_xml)
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.count = 0
+        self._columns = columns(
+            len(settings.labels) if "3d" in components else 0,
+            len(settings.bodies) if "6d" in components else 0,
+            sum(len(skeleton.segments) for skeleton in settings.skeletons)
+            if "skeleton" in components
+            else 0,
+            "timecode" in components,
+        )
+        self._segment_ids = [
+            segment.id for skeleton in settings.skeletons for segment in skeleton.segments
+        ]
+        self._segment_ids_checked = False
+        self._timecode = TimecodeLock(smpte_rate) if "timecode" in components else None
+        self._chunks = {}
+
+        with open(os.path.join(path, "settings.xml"), "wb") as settings_file:
+            settings_file.write(settings_xml)
+
+        self._write_meta()
+        self._index = open(os.path.join(path, "index.bin"), "wb")
+
+    def _write_meta(self):
+        meta = dict(
+            version=FORMAT_VERSION,
+            chunk_frames=self.chunk_frames,
+            columns=collections.OrderedDict(
+                (name, [dtype, list(shape)]) for name, (dtype, shape) in self._columns.items()
+            ),
+            segment_ids=self._segment_ids,
+        )
+
+        with open(os.path.join(self.path, "take.json"), "w") as meta_file:
+            json.dump(meta, meta_file, indent=2)
+
+    def _open_chunk(self, chunk):
+        # Dropping the previous maps flushes them.
+        self._chunks = dict(
+            (
+                name,
+                np.lib.format.open_memmap(
+                    _chunk_path(self.path, name, chunk),
+                    mode="w+",
+                    dtype=dtype,
+                    shape=(self.chunk_frames,) + shape,
+                ),
+            )
+            for name, (dtype, shape) in self._columns.items()
+        )
+        self._index.flush()
+
+    def append(self, framenumber, timestamp, segment_ids=None, **arrays):
+        """Append a frame of arrays with the names and shapes of
+        :func:`columns`. Arrays that are left out are NaN.
+
+        :param segment_ids: Ids of the segments in the order of the segment
+            arrays, kept from the first frame that has them.
+        """
+        row = self.count % self.chunk_frames
+
+        if row == 0:
+            self._open_chunk(self.count // self.chunk_frames)
+
+        for name, chunk in self._chunks.items():
+            values = arrays.get(name)
+            chunk[row] = np.nan if values is None else values
+
+        # The settings give the order of the segments unless the first frame
+        # with segments says otherwise.
+        if segment_ids is not None and not self._segment_ids_checked:
+            self._segment_ids_checked = True
+            segment_ids = [int(segment_id) for segment_id in segment_ids]
+
+            if segment_ids != self._segment_ids:
+                self._segment_ids = segment_ids
+                self._write_meta()
+
+        np.array((framenumber, timestamp), dtype=INDEX).tofile(self._index)
+        self.count += 1
+
+    def append_packet(self, packet):
+        """ Append the components of a packet that are recorded """
+        arrays = {}
+
+        if "positions" in self._columns:
+            markers = get_3d_array(packet)
+
+            if markers is not None:
+                arrays["positions"] = markers[1]
+
+        if "body_positions" in self._columns:
+            bodies = get_6d_arrays(packet)
+
+            if bodies is not None:
+                arrays["body_positions"], arrays["body_rotations"] = bodies[1:]
+
+        if "segment_positions" in self._columns:
+            segments = get_skeleton_arrays(packet)
+
+            if segments is not None:
+                (
+                    arrays["segment_ids"],
+                    arrays["segment_positions"],
+                    arrays["segment_rotations"],
+                ) = segments[1:]
+
+        if self._timecode is not None:
+            arrays["timecode"] = self._timecode.update_packet(packet)
+
+        self.append(packet.framenumber, packet.timestamp, **arrays)
+
+    def close(self):
+        if self._index is None:
+            return
+
+        self._chunks = {}
+        self._index.close()
+        self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Take(object):
+    """Random access to a take written by :class:`TakeWriter`.
+
+    The frames of a take that is still being written, or whose writer did not
+    close it, can be read up to the last flushed chunk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, "take.json")) as meta_file:
+            meta = json.load(meta_file)
+
+        if meta["version"] > FORMAT_VERSION:
+            raise ValueError("Take format %d is not supported" % meta["version"])
+
+        with open(os.path.join(path, "settings.xml"), "rb") as settings_file:
+            self.settings = parse_settings(settings_file.read())
+
+        self.chunk_frames = meta["chunk_frames"]
+        self.segment_ids = np.array(meta["segment_ids"], dtype=np.int64)
+        self.columns = collections.OrderedDict(
+            (name, (dtype, tuple(shape))) for name, (dtype, shape) in meta["columns"].items()
+        )
+        self._chunks = collections.OrderedDict()
+        self._timecodes = None
+
+        index_path = os.path.join(path, "index.bin")
+
+        if os.path.getsize(index_path) >= INDEX.itemsize:
+            self.index = np.memmap(index_path, dtype=INDEX, mode="r")
+        else:
+            self.index = np.zeros(0, dtype=INDEX)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def labels(self):
+        """ Names of the markers """
+        return [label.name for label in self.settings.labels]
+
+    @property
+    def framenumbers(self):
+        return self.index["framenumber"]
+
+    @property
+    def timestamps(self):
+        """ Timestamps in microseconds """
+        return self.index["timestamp"]
+
+    def rate(self, frames=4096):
+        """Frames per second, from the timestamps of the first frames."""
+        if len(self) < 2:
+            raise ValueError("The rate of a take with less than two frames is unknown")
+
+        steps = np.diff(self.timestamps[: frames + 1]) / np.diff(self.framenumbers[: frames + 1])
+        return int(round(1e6 / np.median(steps)))
+
+    def index_of(self, framenumber):
+        """Index of the frame with a frame number.
+
+        :raises KeyError: When the take has no such frame.
+        """
+        index = int(np.searchsorted(self.framenumbers, framenumber))
+
+        if index == len(self) or self.framenumbers[index] != framenumber:
+            raise KeyError(framenumber)
+
+        return index
+
+    def index_at(self, seconds):
+        """Index of the last frame at or before seconds from the first frame,
+        clamped to the take."""
+        if not len(self):
+            raise IndexError("The take has no frames")
+
+        timestamp = self.timestamps[0] + int(round(seconds * 1e6))
+        index = int(np.searchsorted(self.timestamps, timestamp, side="right")) - 1
+        return min(max(index, 0), len(self) - 1)
+
+    def index_at_timecode(self, seconds):
+        """Index of the last frame at or before seconds of the timecode clock,
+        clamped to the frames that have a timecode.
+
+        :raises ValueError: When the take has no timecodes.
+        """
+        if self._timecodes is None:
+            if "timecode" not in self.columns:
+                raise ValueError("The take has no timecode")
+
+            timecodes = self.column("timecode")
+            indices = np.flatnonzero(np.isfinite(timecodes))
+            self._timecodes = indices, timecodes[indices]
+
+        indices, timecodes = self._timecodes
+
+        if not len(indices):
+            raise ValueError("The take has no timecode")
+
+        index = int(np.searchsorted(timecodes, seconds, side="right")) - 1
+        return int(indices[min(max(index, 0), len(indices) - 1)])
+
+    def _chunk(self, name, chunk):
+        key = (name, chunk)
+
+        if key in self._chunks:
+            self._chunks[key] = self._chunks.pop(key)
+        else:
+            self._chunks[key] = np.load(_chunk_path(self.path, name, chunk), mmap_mode="r")
+
+            if len(self._chunks) > OPEN_CHUNKS:
+                self._chunks.popitem(last=False)
+
+        return self._chunks[key]
+
+    def frame(self, index):
+        """Arrays of one frame, read-only views of the take."""
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+
+        chunk, row = divmod(index % len(self), self.chunk_frames)
+        return dict((name, self._chunk(name, chunk)[row]) for name in self.columns)
+
+    def column(self, name, start=0, stop=None):
+        """Frames start to stop of a column copied to a single array."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        dtype, shape = self.columns[name]
+        result = np.empty((max(stop - start, 0),) + shape, dtype=dtype)
+        position = start
+
+        while position < stop:
+            chunk, row = divmod(position, self.chunk_frames)
+            count = min(self.chunk_frames - row, stop - position)
+            result[position - start : position - start + count] = self._chunk(name, chunk)[
+                row : row + count
+            ]
+            position += count
+
+        return result
+
+    def close(self):
+        self._chunks.clear()
+        self._timecodes = None
+        self.index = np.zeros(0, dtype=INDEX)
@@ -0,0 +1,196 @@
+""" Rolling stream health telemetry
+
+Combines what QTM reports about the camera system (drop_rate and
+out_of_sync_rate of the 3D and 6D components) with what the client sees
+(frame number gaps and arrival times). Frames missing on the client while QTM
+reports no drops point at the network or the client as the bottleneck.
+"""
+
+import collections
+import math
+
+from qtm.instrumentation import clock
+
+# pylint: disable=C0103, R0902
+
+
+class StreamTelemetry(object):
+    """Loss, jitter and effective rate over the last window frames.
+
+    Memory and the cost of :func:`update` are bounded by window.
+
+    :param window: Number of frames the statistics are computed over.
+    :param loss_threshold: Warn when more than this fraction of frames is missing.
+    :param jitter_threshold: Warn when the arrival jitter exceeds this fraction
+        of the mean arrival interval, which is the frame period.
+    :param drop_rate_threshold: Warn when QTM reports a drop or out of sync rate
+        above this value, in frames per thousand like QTM reports them.
+    :param on_warning: Function called with a message when a threshold is exceeded.
+    :param warning_interval: Minimum number of seconds between two warnings.
+    """
+
+    def __init__(
+        self,
+        window=256,
+        loss_threshold=0.01,
+        jitter_threshold=0.5,
+        drop_rate_threshold=10,
+        on_warning=None,
+        warning_interval=5.0,
+    ):
+        self.window = window
+        self.loss_threshold = loss_threshold
+        self.jitter_threshold = jitter_threshold
+        self.drop_rate_threshold = drop_rate_threshold
+        self.on_warning = on_warning
+        self.warning_interval = warning_interval
+        self.reset()
+
+    def reset(self):
+        """ Forget all frames """
+        self._frames = collections.deque()
+        self._missed = 0
+        self._interval_count = 0
+        self._interval_sum = 0.0
+        self._interval_square_sum = 0.0
+        self._last = None
+        self._last_warning = None
+        self.drop_rate = 0
+        self.out_of_sync_rate = 0
+        self.total_frames = 0
+        self.total_missed = 0
+
+    def update(self, framenumber, drop_rate=0, out_of_sync_rate=0, arrival=None):
+        """Add a received frame.
+
+        :param framenumber: Frame number of the packet.
+        :param drop_rate: drop_rate of the component info, if any.
+        :param out_of_sync_rate: out_of_sync_rate of the component info, if any.
+        :param arrival: Arrival time in seconds, defaults to now.
+        """
+        arrival = clock() if arrival is None else arrival
+        missed = 0
+        interval = None
+
+        if self._last is not None:
+            last_framenumber, last_arrival = self._last
+
+            if framenumber <= last_framenumber:
+                # Restarted measurement or RT from file, start over.
+                self.reset()
+            else:
+                missed = framenumber - last_framenumber - 1
+                interval = arrival - last_arrival
+
+        self._frames.append((missed, interval))
+        self._missed += missed
+        self.total_missed += missed
+        self.total_frames += 1
+
+        if interval is not None:
+            self._interval_count += 1
+            self._interval_sum += interval
+            self._interval_square_sum += interval * interval
+
+        if len(self._frames) > self.window:
+            old_missed, old_interval = self._frames.popleft()
+            self._missed -= old_missed
+
+            if old_interval is not None:
+                self._interval_count -= 1
+                self._interval_sum -= old_interval
+                self._interval_square_sum -= old_interval * old_interval
+
+        self._last = (framenumber, arrival)
+        self.drop_rate = drop_rate
+        self.out_of_sync_rate = out_of_sync_rate
+
+        if self.on_warning is not None:
+            self._check(arrival)
+
+    @property
+    def loss(self):
+        """ Fraction of frames in the window that never arrived """
+        received = len(self._frames)
+        expected = received + self._missed
+        return self._missed / float(expected) if expected else 0.0
+
+    @property
+    def jitter(self):
+        """ Standard deviation of the frame arrival interval in seconds """
+        count = self._interval_count
+
+        if count < 2:
+            return 0.0
+
+        mean = self._interval_sum / count
+        variance = self._interval_square_sum / count - mean * mean
+        return math.sqrt(max(variance, 0.0))
+
+    @property
+    def effective_rate(self):
+        """ Frames per second actually received """
+        count = self._interval_count
+        return count / self._interval_sum if count and self._interval_sum > 0 else 0.0
+
+    @property
+    def capture_rate(self):
+        """ Frames per second produced by QTM, including frames that never arrived """
+        count = self._interval_count
+
+        if not count or self._interval_sum <= 0:
+            return 0.0
+
+        return (count + self._missed) / self._interval_sum
+
+    def warnings(self):
+        """ Messages for every threshold that is currently exceeded """
+        messages = []
+
+        if self.drop_rate > self.drop_rate_threshold:
+            messages.append("QTM reports a drop rate of %d" % self.drop_rate)
+
+        if self.out_of_sync_rate > self.drop_rate_threshold:
+            messages.append("QTM reports an out of sync rate of %d" % self.out_of_sync_rate)
+
+        if self.loss > self.loss_threshold:
+            messages.append(
+                "%.1f%% of frames were lost between QTM and the client" % (self.loss * 100)
+            )
+
+        if self._interval_count and self._interval_sum > 0:
+            period = self._interval_sum / self._interval_count
+
+            if self.jitter > self.jitter_threshold * period:
+                messages.append(
+                    "Frame arrival jitter is %.1f ms at a frame period of %.1f ms"
+                    % (self.jitter * 1000, period * 1000)
+                )
+
+        return messages
+
+    def _check(self, now):
+        if (
+            self._last_warning is not None
+            and now - self._last_warning < self.warning_interval
+        ):
+            return
+
+        messages = self.warnings()
+
+        if messages:
+            self._last_warning = now
+            self.on_warning("; ".join(messages))
+
+    def snapshot(self):
+        """ Current statistics as a dict """
+        return dict(
+            loss=self.loss,
+            jitter=self.jitter,
+            effective_rate=self.effective_rate,
+            capture_rate=self.capture_rate,
+            drop_rate=self.drop_rate,
+            out_of_sync_rate=self.out_of_sync_rate,
+            total_frames=self.total_frames,
+            total_missed=self.total_missed,
+        )
@@ -0,0 +1,158 @@
+""" Decoding of timecodes and locking frames to them
+
+QTM sends the timecode of a frame as a type and two 32 bit words, see
+:meth:`qtm.QRTPacket.get_timecode`. :func:`decode_timecode` unpacks them.
+
+SMPTE and IRIG timecodes only change a few times per second, so many frames
+share a timecode. :class:`TimecodeLock` places every frame on the timecode
+clock by anchoring the frame timestamps at the frames where the timecode
+changes.
+
+::
+
+    lock = TimecodeLock(smpte_rate=25)
+    seconds = lock.update_packet(packet)
+
+"""
+
+from collections import namedtuple
+
+from qtm.packet import QRTTimecodeType, RTTimecode
+
+# pylint: disable=C0103
+
+SECONDS_PER_DAY = 86400
+
+
+class SMPTETimecode(namedtuple("SMPTETimecode", "hours minutes seconds frame")):
+    """ SMPTE timecode, frame counts frames of the timecode rate """
+
+    __slots__ = ()
+
+    def to_seconds(self, rate):
+        """Seconds since midnight for a timecode running at rate frames per
+        second, drop frame timecodes are not supported."""
+        return self.hours * 3600 + self.minutes * 60 + self.seconds + float(self.frame) / rate
+
+    def __str__(self):
+        return "%02d:%02d:%02d:%02d" % self
+
+
+class IRIGTimecode(namedtuple("IRIGTimecode", "year day hours minutes seconds tenths")):
+    """ IRIG timecode, day is the day of the year starting at 1 """
+
+    __slots__ = ()
+
+    def to_seconds(self, rate=None):
+        """Seconds since the start of the year."""
+        return (
+            (self.day - 1) * SECONDS_PER_DAY
+            + self.hours * 3600
+            + self.minutes * 60
+            + self.seconds
+            + self.tenths / 10.0
+        )
+
+    def __str__(self):
+        return "%d %03d %02d:%02d:%02d.%d" % self
+
+
+class CameraTime(namedtuple("CameraTime", "ticks")):
+    """ 64 bit time of the camera clock """
+
+    __slots__ = ()
+
+
+def _clock(word):
+    return word & 0x1F, (word >> 5) & 0x3F, (word >> 11) & 0x3F
+
+
+def decode_timecode(timecode):
+    """Decode an :class:`qtm.packet.RTTimecode`.
+
+    :returns: An :class:`SMPTETimecode`, :class:`IRIGTimecode` or
+        :class:`CameraTime`.
+    """
+    timecode_type = QRTTimecodeType(timecode.type)
+
+    if timecode_type == QRTTimecodeType.SMPTE:
+        return SMPTETimecode(*_clock(timecode.lo) + ((timecode.lo >> 17) & 0x1F,))
+
+    if timecode_type == QRTTimecodeType.IRIG:
+        return IRIGTimecode(
+            timecode.hi & 0x7F,
+            (timecode.hi >> 7) & 0x1FF,
+            *_clock(timecode.lo) + ((timecode.lo >> 17) & 0xF,)
+        )
+
+    return CameraTime((timecode.hi << 32) | timecode.lo)
+
+
+class TimecodeLock(object):
+    """Maps frames to seconds of an SMPTE or IRIG timecode clock.
+
+    A frame where the timecode has changed since the frame before it is at
+    the start of the timecode, later frames are placed from there by their
+    timestamps. Until the first change is seen the mapping can be off by up
+    to one timecode frame and :attr:`locked` is False.
+
+    :param smpte_rate: Frames per second of SMPTE timecodes.
+    """
+
+    def __init__(self, smpte_rate=30):
+        self.smpte_rate = smpte_rate
+        self.reset()
+
+    def reset(self):
+        self.locked = False
+        self._anchor = None
+        self._previous = None
+
+    def update(self, framenumber, timestamp, timecode):
+        """Add a frame with its timecode, decoded or as sent by QTM.
+
+        :param timestamp: Timestamp of the frame in microseconds.
+        :returns: The frame time in seconds of the timecode clock.
+        """
+        if isinstance(timecode, RTTimecode):
+            timecode = decode_timecode(timecode)
+
+        if isinstance(timecode, CameraTime):
+            raise ValueError("Camera time cannot be locked to")
+
+        resolution = 0.1 if isinstance(timecode, IRIGTimecode) else 1.0 / self.smpte_rate
+        seconds = timecode.to_seconds(self.smpte_rate)
+        previous = self._previous
+        self._previous = (framenumber, seconds)
+
+        if self._anchor is None or abs(self.seconds(timestamp) - seconds) > 1.5 * resolution:
+            # The first frame, or the timecode jumped.
+            self._anchor = (timestamp, seconds)
+            self.locked = False
+        elif previous is not None and framenumber == previous[0] + 1 and seconds != previous[1]:
+            self._anchor = (timestamp, seconds)
+            self.locked = True
+
+        return self.seconds(timestamp)
+
+    def update_packet(self, packet):
+        """Add the first timecode of a packet.
+
+        :returns: The frame time in seconds, None if the packet has no
+            timecode.
+        """
+        timecodes = packet.get_timecode()
+
+        if timecodes is None or not timecodes[1]:
+            return None
+
+        return self.update(packet.framenumber, packet.timestamp, timecodes[1][0])
+
+    def seconds(self, timestamp):
+        """Time of a frame with a timestamp in microseconds on the timecode
+        clock, in seconds."""
+        if self._anchor is None:
+            raise ValueError("No timecode has been seen")
+
+        anchor_timestamp, anchor_seconds = self._anchor
+        return anchor_seconds + (timestamp - anchor_timestamp) * 1e-6
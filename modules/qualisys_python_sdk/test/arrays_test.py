@@ -0,0 +1,201 @@
+"""
+    Tests for the NumPy component getters
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from qtm.packet import QRTPacket, QRTComponentType
+from qtm.arrays import (
+    get_2d_arrays,
+    get_3d_array,
+    get_6d_arrays,
+    get_skeleton_arrays,
+    get_analog_arrays,
+    get_force_arrays,
+    get_force_single_arrays,
+    get_gaze_arrays,
+    last_samples,
+)
+
+# pylint: disable=W0621, C0111
+
+
+def component(component_type, body):
+    return struct.pack("<II", len(body) + 8, component_type.value) + body
+
+
+def make_packet(*components):
+    return QRTPacket(struct.pack("<qII", 1000, 7, len(components)) + b"".join(components))
+
+
+@pytest.fixture
+def packet():
+    markers = struct.pack("<Ihh", 2, 0, 0)
+    markers += struct.pack("<3f", 1, 2, 3) + struct.pack("<3f", *([float("nan")] * 3))
+
+    bodies = struct.pack("<ihh", 2, 0, 0)
+    for i in range(2):
+        bodies += struct.pack("<3f", i, i + 1, i + 2)
+        bodies += struct.pack("<9f", *range(i * 9, i * 9 + 9))
+
+    skeletons = struct.pack("<i", 2)
+    for segment_count in (2, 1):
+        skeletons += struct.pack("<i", segment_count)
+        for i in range(segment_count):
+            skeletons += struct.pack("<i3f4f", i + 1, i, 0, 0, 0, 0, 0, 1)
+
+    return make_packet(
+        component(QRTComponentType.Component3d, markers),
+        component(QRTComponentType.Component6d, bodies),
+        component(QRTComponentType.ComponentSkeleton, skeletons),
+    )
+
+
+def test_3d(packet):
+    info, markers = get_3d_array(packet)
+
+    assert info.marker_count == 2
+    assert markers.shape == (2, 3)
+    assert markers[0].tolist() == [1, 2, 3]
+    assert np.isnan(markers[1]).all()
+
+
+def test_6d_matches_packet(packet):
+    info, positions, rotations = get_6d_arrays(packet)
+    _, bodies = packet.get_6d()
+
+    assert info.body_count == 2
+
+    for i, (position, rotation) in enumerate(bodies):
+        assert positions[i].tolist() == list(position)
+        # Column major on the wire.
+        assert rotations[i].T.ravel().tolist() == list(rotation.matrix)
+
+
+def test_skeletons_concatenated(packet):
+    info, ids, positions, rotations = get_skeleton_arrays(packet)
+
+    assert info.skeleton_count == 2
+    assert ids.tolist() == [1, 2, 1]
+    assert positions[:, 0].tolist() == [0, 1, 0]
+    assert rotations.shape == (3, 4)
+    assert (rotations[:, 3] == 1).all()
+
+
+def test_missing_component():
+    packet = make_packet()
+
+    assert get_3d_array(packet) is None
+    assert get_6d_arrays(packet) is None
+    assert get_skeleton_arrays(packet) is None
+    assert get_analog_arrays(packet) is None
+
+
+def test_analog_matches_packet():
+    analog = struct.pack("<i", 2)
+    analog += struct.pack("<iii", 1, 2, 0)
+    analog += struct.pack("<iiii", 2, 2, 3, 100) + struct.pack("<6f", *range(6))
+    packet = make_packet(component(QRTComponentType.ComponentAnalog, analog))
+
+    (device, number, empty), (_, sample_number, samples) = get_analog_arrays(packet)
+
+    assert device.channel_count == 2
+    assert number is None and empty.shape == (2, 0)
+    assert sample_number == 100
+    assert samples.tolist() == [[0, 1, 2], [3, 4, 5]]
+    assert [list(channel.samples) for _, _, channel in packet.get_analog()[1]] == samples.tolist()
+
+
+def test_gaze_matches_packet():
+    gaze = struct.pack("<i", 3)
+    gaze += struct.pack("<ii", 2, 50) + struct.pack("<12f", *range(12))
+    gaze += struct.pack("<i", 0)
+    gaze += struct.pack("<ii", 1, 70) + struct.pack("<6f", *range(100, 106))
+    packet = make_packet(component(QRTComponentType.ComponentGazeVector, gaze))
+
+    info, counts, sample_numbers, vectors, positions = get_gaze_arrays(packet)
+    _, trackers = packet.get_gaze_vectors()
+
+    assert info.vector_count == 3
+    assert counts.tolist() == [2, 0, 1]
+    assert sample_numbers.tolist() == [50, -1, 70]
+    assert vectors.tolist() == [[0, 1, 2], [6, 7, 8], [100, 101, 102]]
+    assert positions[1].tolist() == [9, 10, 11]
+    assert [number and number.sample_number for _, number, _ in trackers] == [50, None, 70]
+    assert [list(sample) for sample in trackers[0][2]] == [list(range(6)), list(range(6, 12))]
+
+    last = last_samples(counts, vectors)
+    assert last[0].tolist() == [6, 7, 8]
+    assert np.isnan(last[1]).all()
+    assert last[2].tolist() == [100, 101, 102]
+
+
+def test_force_matches_packet():
+    force = struct.pack("<i", 2)
+    force += struct.pack("<iii", 1, 2, 40) + struct.pack("<18f", *range(18))
+    force += struct.pack("<iii", 2, 0, 0)
+    single = struct.pack("<i", 1) + struct.pack("<i", 3) + struct.pack("<9f", *range(9))
+    packet = make_packet(
+        component(QRTComponentType.ComponentForce, force),
+        component(QRTComponentType.ComponentForceSingle, single),
+    )
+
+    info, ids, counts, force_numbers, forces, moments, points = get_force_arrays(packet)
+    _, plates = packet.get_force()
+
+    assert info.plate_count == 2
+    assert ids.tolist() == [1, 2]
+    assert counts.tolist() == [2, 0]
+    assert force_numbers.tolist() == [40, 0]
+    assert forces.tolist() == [list(sample[:3]) for sample in plates[0][1]]
+    assert moments[1].tolist() == [12, 13, 14]
+    assert points[0].tolist() == [6, 7, 8]
+
+    _, ids, forces, moments, points = get_force_single_arrays(packet)
+
+    assert ids.tolist() == [3]
+    assert forces.tolist() == [[0, 1, 2]]
+    assert points.tolist() == [[6, 7, 8]]
+
+
+def markers_2d_packet(component_type, counts):
+    markers = struct.pack("<Ihh", len(counts), 0, 0)
+
+    for camera, count in enumerate(counts):
+        markers += struct.pack("<ib", count, camera)
+
+        for i in range(count):
+            markers += struct.pack("<iihh", camera * 100 + i, -i, i, 2 * i)
+
+    return make_packet(component(component_type, markers))
+
+
+def test_2d_matches_packet():
+    packet = markers_2d_packet(QRTComponentType.Component2d, [2, 0, 3])
+    info, cameras = get_2d_arrays(packet)
+    _, expected = packet.get_2d_markers()
+
+    assert info.camera_count == 3
+    assert len(cameras) == 3
+    assert cameras.counts.tolist() == [2, 0, 3]
+    assert cameras.status_flags.tolist() == [0, 1, 2]
+    assert [camera.tolist() for camera in cameras] == [
+        [tuple(marker) for marker in markers] for markers in expected
+    ]
+    assert cameras[2]["x"].tolist() == [200, 201, 202]
+    assert cameras[2]["d_y"].tolist() == [0, 2, 4]
+
+    markers, camera_index = cameras.all()
+
+    assert markers["x"].tolist() == [0, 1, 200, 201, 202]
+    assert camera_index.tolist() == [0, 0, 2, 2, 2]
+
+
+def test_2d_linearized():
+    packet = markers_2d_packet(QRTComponentType.Component2dLin, [1])
+
+    assert get_2d_arrays(packet) is None
+    assert get_2d_arrays(packet, linearized=True)[1][0]["x"].tolist() == [0]
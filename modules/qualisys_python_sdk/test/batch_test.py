@@ -0,0 +1,100 @@
+"""
+    Tests for decoding packets in batches
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from qtm.arrays import get_3d_array, get_6d_arrays, get_skeleton_arrays
+from qtm.batch import PacketLayout, decode_packets
+from qtm.packet import QRTPacket, QRTComponentType
+
+# pylint: disable=W0621, C0111
+
+
+def component(component_type, body):
+    return struct.pack("<II", len(body) + 8, component_type.value) + body
+
+
+def make_data(frame, markers=2, skeletons=(2, 1)):
+    marker_data = struct.pack("<Ihh", markers, frame % 3, 0)
+    marker_data += struct.pack("<%df" % (markers * 3), *range(frame, frame + markers * 3))
+
+    bodies = struct.pack("<ihh", 2, 0, 0)
+    for i in range(2):
+        bodies += struct.pack("<3f", frame, i, 0)
+        bodies += struct.pack("<9f", *range(frame + i, frame + i + 9))
+
+    skeleton_data = struct.pack("<i", len(skeletons))
+    for count in skeletons:
+        skeleton_data += struct.pack("<i", count)
+        for i in range(count):
+            skeleton_data += struct.pack("<i3f4f", i + 1, frame, i, 0, 0, 0, 0, 1)
+
+    return struct.pack("<qII", 1000 * frame, 10 + frame, 3) + b"".join(
+        (
+            component(QRTComponentType.Component3d, marker_data),
+            component(QRTComponentType.Component6d, bodies),
+            component(QRTComponentType.ComponentSkeleton, skeleton_data),
+        )
+    )
+
+
+def test_matches_per_packet():
+    packets = [make_data(frame) for frame in range(5)]
+    layout = PacketLayout(QRTPacket(packets[0]))
+    arrays = layout.empty(len(packets))
+
+    assert (layout.marker_count, layout.body_count, layout.segment_count) == (2, 2, 3)
+    assert decode_packets(packets, layout, **arrays) == 5
+
+    for frame, data in enumerate(packets):
+        packet = QRTPacket(data)
+        _, ids, segment_positions, segment_rotations = get_skeleton_arrays(packet)
+
+        assert arrays["framenumbers"][frame] == packet.framenumber
+        assert arrays["timestamps"][frame] == packet.timestamp
+        assert np.array_equal(arrays["positions"][frame], get_3d_array(packet)[1])
+        assert np.array_equal(arrays["body_positions"][frame], get_6d_arrays(packet)[1])
+        assert np.array_equal(arrays["body_rotations"][frame], get_6d_arrays(packet)[2])
+        assert np.array_equal(arrays["segment_ids"][frame], ids)
+        assert np.array_equal(arrays["segment_positions"][frame], segment_positions)
+        assert np.array_equal(arrays["segment_rotations"][frame], segment_rotations)
+
+
+def test_requested_arrays_only():
+    packets = [make_data(frame) for frame in range(3)]
+    positions = np.zeros((4, 2, 3), dtype=np.float32)
+
+    assert decode_packets(packets, positions=positions) == 3
+    assert positions[2, 0].tolist() == [2, 3, 4]
+    assert positions[3].tolist() == [[0] * 3] * 2
+
+
+def test_stops_at_other_layout():
+    packets = [make_data(0), make_data(1), make_data(2, markers=3), make_data(3)]
+    # Same size, but the segments are split between the skeletons otherwise.
+    packets.insert(1, make_data(9, skeletons=(1, 2)))
+    layout = PacketLayout(QRTPacket(packets[0]))
+
+    assert len(packets[1]) == layout.size
+    assert decode_packets(packets, layout, **layout.empty(5)) == 1
+    assert decode_packets(packets[2:], layout, **layout.empty(3)) == 1
+
+
+def test_unknown_array():
+    packets = [make_data(0)]
+
+    with pytest.raises(ValueError):
+        decode_packets(packets, markers=np.empty((1, 2, 3)))
+
+
+def test_blocks():
+    packets = [make_data(frame) for frame in range(10)]
+    packets[7] = make_data(7, skeletons=(1, 2))
+    positions = np.zeros((10, 2, 3), dtype=np.float32)
+
+    assert decode_packets(packets, block_frames=3, positions=positions) == 7
+    assert positions[:, 0, 0].tolist() == list(range(7)) + [0] * 3
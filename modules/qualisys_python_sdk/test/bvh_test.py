@@ -0,0 +1,158 @@
+"""
+    Tests for the streaming BVH writer
+"""
+
+import numpy as np
+import pytest
+
+from qtm.bvh import BVHExport, BVHWriter, export_take
+from qtm.rotation import quaternions_to_matrices
+from qtm.settings import Segment, Skeleton, parse_settings
+
+from test.settings_test import XML
+from test.takes_test import write_take
+
+# pylint: disable=W0621, C0111
+
+AXES = {"X": 0, "Y": 1, "Z": 2}
+
+
+@pytest.fixture
+def skeleton():
+    return Skeleton(
+        "actor",
+        [
+            Segment(1, "Hips", None, (0, 0, 1000), (0, 0, 0, 1)),
+            Segment(2, "LeftLeg", 1, (100, 0, 0), (0, 0, 0, 1)),
+            Segment(3, "Spine", 1, (0, 0, 100), (0, 0, 0, 1)),
+            Segment(4, "LeftFoot", 2, (0, 0, -400), (0, 0, 0, 1)),
+        ],
+    )
+
+
+def read_bvh(path):
+    with open(str(path)) as bvh:
+        text = bvh.read()
+
+    hierarchy, motion = text.split("MOTION\n")
+    lines = motion.splitlines()
+    joints = [line.split()[1] for line in hierarchy.splitlines() if line.split()[0] in ("ROOT", "JOINT")]
+    channels = [line.split()[2:] for line in hierarchy.splitlines() if "CHANNELS" in line]
+
+    values = np.loadtxt(lines[2:], ndmin=2) if lines[2:] else np.empty((0, 0))
+    return joints, channels, lines[0], lines[1], values
+
+
+def rotation(angles, channels):
+    matrix = np.eye(3)
+
+    for angle, channel in zip(angles, channels):
+        axis = AXES[channel[0]]
+        c, s = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+        turn = np.eye(3)
+        j, k = [other for other in range(3) if other != axis]
+        turn[j, j] = turn[k, k] = c
+        turn[j, k] = -s if axis != 1 else s
+        turn[k, j] = s if axis != 1 else -s
+        matrix = matrix.dot(turn)
+
+    return matrix
+
+
+def test_hierarchy_depth_first(tmpdir, skeleton):
+    path = tmpdir.join("actor.bvh")
+
+    with BVHWriter(str(path), skeleton, 100, y_up=False):
+        pass
+
+    joints, channels, frames, frame_time, _ = read_bvh(path)
+
+    assert joints == ["Hips", "LeftLeg", "LeftFoot", "Spine"]
+    assert channels[0] == ["Xposition", "Yposition", "Zposition", "Zrotation", "Xrotation", "Yrotation"]
+    assert frames.split() == ["Frames:", "0"]
+    assert frame_time == "Frame Time: 0.01000000"
+    assert "OFFSET 0.000000 0.000000 -400.000000" in path.read()
+
+
+@pytest.mark.parametrize("order", ["zxy", "xyz", "yzx"])
+def test_rotations(tmpdir, skeleton, order):
+    path = tmpdir.join("actor.bvh")
+    quaternions = np.random.RandomState(1).normal(size=(10, 4, 4))
+    quaternions /= np.linalg.norm(quaternions, axis=-1, keepdims=True)
+    positions = np.tile([[1, 2, 3]], (10, 4, 1)).astype(float)
+
+    with BVHWriter(str(path), skeleton, 100, order=order, y_up=False, block_frames=3) as writer:
+        for frame in range(10):
+            writer.append(positions[frame], quaternions[frame])
+
+    _, channels, frames, _, values = read_bvh(path)
+
+    assert frames.split() == ["Frames:", "10"]
+    assert values.shape == (10, 3 + 4 * 3)
+    assert (values[:, :3] == [1, 2, 3]).all()
+
+    # Depth first, so the third joint is segment 4.
+    for column, segment in enumerate([0, 1, 3, 2]):
+        for frame in range(10):
+            angles = values[frame, 3 + 3 * column : 6 + 3 * column]
+            expected = quaternions_to_matrices(quaternions[frame, segment])
+            assert np.allclose(rotation(angles, channels[column][-3:]), expected, atol=1e-3)
+
+
+def test_missing_segments_hold(tmpdir, skeleton):
+    path = tmpdir.join("actor.bvh")
+    rotations = np.tile([0, 0, np.sin(0.25), np.cos(0.25)], (4, 1))
+
+    with BVHWriter(str(path), skeleton, 100, y_up=False, block_frames=2) as writer:
+        writer.append(np.zeros((4, 3)), rotations)
+        writer.append(np.full((4, 3), np.nan), np.full((4, 4), np.nan))
+        writer.append(np.full((4, 3), np.nan), np.full((4, 4), np.nan))
+
+    values = read_bvh(path)[-1]
+
+    assert np.isfinite(values).all()
+    assert (values[1:] == values[0]).all()
+
+
+def test_y_up(tmpdir, skeleton):
+    path = tmpdir.join("actor.bvh")
+
+    with BVHWriter(str(path), skeleton, 100) as writer:
+        writer.append_t_pose()
+
+    values = read_bvh(path)[-1]
+
+    assert values[0, :3].tolist() == [0, 1000, 0]
+    assert "OFFSET -100.000000 0.000000 0.000000" in path.read()
+
+
+def test_export_matches_ids(tmpdir):
+    settings = parse_settings(XML)
+
+    with BVHExport(str(tmpdir.join("%s.bvh")), settings, 100, y_up=False) as export:
+        # Segments in another order than the settings.
+        export.append([2, 1], [[0, 0, 5], [1, 2, 3]], [[0, 0, 0, 1]] * 2)
+
+    values = read_bvh(tmpdir.join("actor.bvh"))[-1]
+
+    assert values[0, :3].tolist() == [1, 2, 3]
+    assert export.count == 1
+
+
+def test_export_missing_segment(tmpdir):
+    settings = parse_settings(XML)
+
+    with BVHExport(str(tmpdir.join("%s.bvh")), settings, 100) as export:
+        with pytest.raises(ValueError):
+            export.append([1], [[0, 0, 0]], [[0, 0, 0, 1]])
+
+
+def test_export_take(tmpdir):
+    take = write_take(tmpdir.join("take"), 10, components=("skeleton",))
+    path = tmpdir.join("%s.bvh")
+
+    assert export_take(take, str(path), block_frames=4, y_up=False) == 10
+
+    values = read_bvh(tmpdir.join("actor.bvh"))[-1]
+
+    assert values[:, 0].tolist() == list(range(10))
@@ -0,0 +1,181 @@
+"""
+    Tests for the streaming C3D writer
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from qtm.c3d import BLOCK_SIZE, C3DWriter, export_take
+from qtm.packet import QRTPacket, QRTComponentType
+
+from test.takes_test import write_take
+
+# pylint: disable=W0621, C0111
+
+
+def read_c3d(path):
+    """Header words, parameters by GROUP:NAME and the data section."""
+    with open(str(path), "rb") as c3d:
+        data = c3d.read()
+
+    assert len(data) % BLOCK_SIZE == 0
+
+    header = np.frombuffer(data, dtype="<u2", count=BLOCK_SIZE // 2)
+    start = (data[0] - 1) * BLOCK_SIZE
+    assert data[start + 3] == 84
+
+    groups = {}
+    parameters = {}
+    position = start + 4
+
+    while True:
+        length, group_id = struct.unpack_from("<bb", data, position)
+        name = data[position + 2 : position + 2 + abs(length)].decode()
+        position += 2 + abs(length)
+        (offset,) = struct.unpack_from("<h", data, position)
+
+        if group_id < 0:
+            groups[-group_id] = name
+        else:
+            data_type, count = struct.unpack_from("<bB", data, position + 2)
+            dimensions = struct.unpack_from("<%dB" % count, data, position + 4)
+            size = int(np.prod(dimensions)) * abs(data_type)
+            values = data[position + 4 + count : position + 4 + count + size]
+
+            if data_type == -1:
+                width = dimensions[0] if dimensions else 1
+                values = [
+                    values[i : i + width].decode().rstrip()
+                    for i in range(0, len(values), width)
+                ]
+            else:
+                values = np.frombuffer(values, dtype="<i2" if data_type == 2 else "<f4")
+
+            parameters[groups[group_id] + ":" + name] = values
+
+        if offset == 0:
+            break
+
+        position += offset
+
+    return header, parameters, data[(header[8] - 1) * BLOCK_SIZE :]
+
+
+def frames(data, markers, samples=0, channels=0):
+    dtype = np.dtype([("points", "<f4", (markers, 4)), ("analog", "<f4", (samples, channels))])
+    return np.frombuffer(data, dtype=dtype, count=len(data) // dtype.itemsize)
+
+
+def test_markers(tmpdir):
+    path = tmpdir.join("markers.c3d")
+
+    with C3DWriter(str(path), ["head", "hand"], 100, block_frames=3) as writer:
+        for i in range(7):
+            writer.append([[i, 2 * i, 3 * i], [np.nan] * 3], residuals=[0.5, 0])
+
+    header, parameters, data = read_c3d(path)
+    points = frames(data, 2)[:7]["points"]
+
+    assert header[1] == 2
+    assert header[3:5].tolist() == [1, 7]
+    assert np.frombuffer(header[10:12].tobytes(), "<f4")[0] == 100
+    assert parameters["POINT:LABELS"] == ["head", "hand"]
+    assert parameters["POINT:FRAMES"].tolist() == [7]
+    assert parameters["POINT:DATA_START"].tolist() == [header[8]]
+    assert points[:, 0, 0].tolist() == list(range(7))
+    assert points[:, 0, 3].tolist() == [5] * 7
+    assert (points[:, 1, 3] == -1).all()
+
+
+def test_long_frame_count(tmpdir):
+    path = tmpdir.join("long.c3d")
+
+    with C3DWriter(str(path), [], 100, block_frames=4096) as writer:
+        for _ in range(70000):
+            writer.append(None)
+
+    header, parameters, _ = read_c3d(path)
+
+    assert header[4] == 0xFFFF
+    assert parameters["POINT:LONG_FRAMES"].tolist() == [70000]
+    low, high = parameters["TRIAL:ACTUAL_END_FIELD"].view("<u2").tolist()
+    assert low + (high << 16) == 70000
+
+
+def test_many_labels(tmpdir):
+    path = tmpdir.join("labels.c3d")
+    labels = ["m%d" % i for i in range(300)]
+
+    with C3DWriter(str(path), labels, 100):
+        pass
+
+    _, parameters, _ = read_c3d(path)
+
+    assert parameters["POINT:LABELS"] + parameters["POINT:LABELS2"] == labels
+
+
+def test_analog_held_and_split(tmpdir):
+    path = tmpdir.join("analog.c3d")
+
+    with C3DWriter(str(path), ["a"], 100, ["x", "y", "z"], analog_rate=300) as writer:
+        # The second device runs behind and then catches up.
+        writer.append([[0, 0, 0]], analog=[np.arange(6.0).reshape(2, 3), [[10]]])
+        writer.append([[0, 0, 0]], analog=[np.arange(6.0, 12).reshape(2, 3), [[11, 12, 13, 14, 15]]])
+
+    header, parameters, data = read_c3d(path)
+    analog = frames(data, 1, 3, 3)[:2]["analog"]
+
+    assert header[2] == 9
+    assert header[9] == 3
+    assert parameters["ANALOG:LABELS"] == ["x", "y", "z"]
+    assert parameters["ANALOG:RATE"].tolist() == [300]
+    assert analog[0, :, 0].tolist() == [0, 1, 2]
+    assert analog[1, :, 1].tolist() == [9, 10, 11]
+    assert analog[:, :, 2].tolist() == [[10, 10, 10], [11, 12, 13]]
+
+
+def test_analog_rate_must_be_multiple(tmpdir):
+    with pytest.raises(ValueError):
+        C3DWriter(str(tmpdir.join("bad.c3d")), [], 100, ["x"], analog_rate=150)
+
+
+def test_append_packet(tmpdir):
+    path = tmpdir.join("packet.c3d")
+    markers = struct.pack("<Ihh", 1, 0, 0) + struct.pack("<3f", 1, 2, 3)
+    analog = struct.pack("<i", 1) + struct.pack("<iiii", 1, 2, 2, 40)
+    analog += struct.pack("<4f", 1, 2, 3, 4)
+    body = b"".join(
+        struct.pack("<II", len(component) + 8, component_type.value) + component
+        for component_type, component in (
+            (QRTComponentType.Component3d, markers),
+            (QRTComponentType.ComponentAnalog, analog),
+        )
+    )
+    packet = QRTPacket(struct.pack("<qII", 1000, 7, 2) + body)
+
+    with C3DWriter(str(path), ["a"], 100, ["x", "y"], analog_rate=200) as writer:
+        writer.append_packet(packet)
+
+    _, _, data = read_c3d(path)
+    frame = frames(data, 1, 2, 2)[0]
+
+    assert frame["points"].tolist() == [[1, 2, 3, 0]]
+    assert frame["analog"].tolist() == [[1, 3], [2, 4]]
+
+
+def test_export_take(tmpdir):
+    take = write_take(tmpdir.join("take"), 10, components=("3d",))
+    path = tmpdir.join("take.c3d")
+
+    # Frame numbers step by two, every other frame was dropped.
+    assert export_take(take, str(path), block_frames=4) == 19
+
+    header, parameters, data = read_c3d(path)
+    points = frames(data, 2)[:19]["points"]
+
+    assert header[4] == 19
+    assert parameters["POINT:RATE"].tolist() == [2000]
+    assert points[::2, 0, 0].tolist() == list(range(10))
+    assert (points[1::2, :, 3] == -1).all()
@@ -0,0 +1,68 @@
+"""
+    Tests for WriteCache
+"""
+
+import numpy as np
+
+from qtm.changes import WriteCache
+
+# pylint: disable=W0621, C0111
+
+
+def test_first_frame_is_written():
+    cache = WriteCache()
+
+    assert cache.changed(np.zeros((3, 3))).tolist() == [0, 1, 2]
+    assert cache.stats() == dict(written=3, skipped=0)
+
+
+def test_only_moved_rows():
+    cache = WriteCache(epsilon=0.1)
+    cache.changed(np.zeros((3, 3)))
+    frame = np.zeros((3, 3))
+    frame[1, 2] = 0.5
+    frame[2, 0] = 0.05
+
+    assert cache.changed(frame).tolist() == [1]
+    assert cache.stats() == dict(written=4, skipped=2)
+
+
+def test_slow_drift_is_written_eventually():
+    cache = WriteCache(epsilon=0.1)
+    written = [cache.changed(np.full((1, 3), i * 0.04)).tolist() for i in range(8)]
+
+    # Compared with the last written value, not the previous frame.
+    assert written == [[0], [], [], [0], [], [], [0], []]
+
+
+def test_rows_subset():
+    cache = WriteCache()
+
+    assert cache.changed(np.zeros((4, 3)), np.array([1, 3])).tolist() == [1, 3]
+    assert cache.changed(np.zeros((4, 3))).tolist() == [0, 2]
+
+
+def test_per_column_epsilon():
+    cache = WriteCache(epsilon=np.array([1.0, 0.01]))
+    cache.changed(np.zeros((2, 2)))
+
+    assert cache.changed(np.array([[0.5, 0.0], [0.0, 0.5]])).tolist() == [1]
+
+
+def test_invalidate():
+    cache = WriteCache()
+    cache.changed(np.zeros((3, 3)))
+    cache.invalidate([2])
+
+    assert cache.changed(np.zeros((3, 3))).tolist() == [2]
+
+    cache.invalidate()
+
+    assert cache.changed(np.zeros((3, 3))).tolist() == [0, 1, 2]
+
+
+def test_new_shape_writes_all():
+    cache = WriteCache()
+    cache.changed(np.zeros((2, 3)))
+
+    assert cache.changed(np.zeros((3, 3))).tolist() == [0, 1, 2]
@@ -0,0 +1,145 @@
+"""
+    Tests for the streaming filters
+"""
+
+import numpy as np
+import pytest
+
+from qtm.filters import (
+    ButterworthFilter,
+    ExponentialFilter,
+    FilterBank,
+    OneEuroFilter,
+)
+
+# pylint: disable=W0621, C0111
+
+RATE = 100.0
+
+
+@pytest.fixture(params=[ExponentialFilter, OneEuroFilter, ButterworthFilter])
+def stream_filter(request):
+    return request.param()
+
+
+def run(stream_filter, signal):
+    return np.array(
+        [stream_filter.filter(i / RATE, frame) for i, frame in enumerate(signal)]
+    )
+
+
+def test_first_frame_passes(stream_filter):
+    assert stream_filter.filter(0.0, [[1.0, 2.0, 3.0]]).tolist() == [[1.0, 2.0, 3.0]]
+
+
+def test_constant_signal_is_kept(stream_filter):
+    output = run(stream_filter, np.full((50, 2, 3), 7.0))
+
+    assert np.allclose(output, 7.0)
+
+
+def test_noise_is_reduced(stream_filter):
+    noise = np.random.RandomState(0).normal(0, 1, (500, 4, 3))
+    output = run(stream_filter, noise)
+
+    assert output[100:].std() < 0.8 * noise[100:].std()
+
+
+def test_step_is_followed(stream_filter):
+    signal = np.zeros((200, 1, 3))
+    signal[50:] = 10.0
+
+    assert np.allclose(run(stream_filter, signal)[-1], 10.0, atol=0.01)
+
+
+def test_occluded_values_restart(stream_filter):
+    run(stream_filter, np.zeros((10, 2, 3)))
+    gap = stream_filter.filter(0.10, [[1.0, 1.0, 1.0], [np.nan] * 3])
+    seen = stream_filter.filter(0.11, [[1.0, 1.0, 1.0], [5.0, 5.0, 5.0]])
+
+    assert np.isnan(gap[1]).all()
+    assert seen[1].tolist() == [5.0, 5.0, 5.0]
+    assert not np.isnan(seen[0]).any()
+
+
+def test_butterworth_attenuates_above_cutoff():
+    times = np.arange(1000) / RATE
+
+    def amplitude(frequency):
+        signal = np.sin(2 * np.pi * frequency * times)[:, None, None]
+        return np.abs(run(ButterworthFilter(cutoff=6.0, rate=RATE), signal)[200:]).max()
+
+    # -3 dB at the cutoff, about -28 dB at 30 Hz.
+    assert amplitude(1.0) > 0.95
+    assert 0.65 < amplitude(6.0) < 0.75
+    assert amplitude(30.0) < 0.05
+
+
+def test_one_euro_lags_less_when_fast():
+    ramp = (np.arange(100) * 10.0)[:, None, None]
+    slow = run(OneEuroFilter(min_cutoff=1.0, beta=0.0), ramp)
+    fast = run(OneEuroFilter(min_cutoff=1.0, beta=0.1), ramp)
+
+    assert abs(fast[-1, 0, 0] - ramp[-1, 0, 0]) < abs(slow[-1, 0, 0] - ramp[-1, 0, 0])
+
+
+def test_bank_filters_only_its_rows():
+    bank = FilterBank()
+    bank.set_filter("group", [1], "Exponential", alpha=0.5)
+
+    bank.filter(0.0, np.zeros((3, 3)))
+    positions, rotations = bank.filter(0.01, np.ones((3, 3)))
+
+    assert positions[:, 0].tolist() == [1.0, 0.5, 1.0]
+    assert rotations is None
+    assert bank.kind("group") == "Exponential"
+    assert bank.kind("other") is None
+
+
+def test_bank_rotations_stay_normalized():
+    bank = FilterBank()
+    bank.set_filter("body", [0], "Exponential", alpha=0.5)
+    identity = np.array([[0, 0, 0, 1.0]])
+    half_turn = np.array([[0, 0, 1.0, 0]])
+
+    bank.filter(0.0, None, identity)
+    # The same rotation with the opposite sign must not be averaged to zero.
+    _, same = bank.filter(0.01, None, -identity)
+    _, turned = bank.filter(0.02, None, half_turn)
+
+    assert np.allclose(np.abs(same), identity)
+    assert np.allclose(np.linalg.norm(turned, axis=1), 1.0)
+
+
+def test_bank_rotation_parameters():
+    bank = FilterBank()
+    bank.set_filter("body", [0], "One Euro", rotation_parameters=dict(beta=5.0), beta=0.007)
+    _, _, position_filter, rotation_filter = bank._filters["body"]
+
+    assert position_filter.beta == 0.007
+    assert rotation_filter.beta == 5.0
+
+    bank.set_filter("body", [0], "One Euro", beta=0.007)
+    _, _, _, rotation_filter = bank._filters["body"]
+
+    assert rotation_filter.beta == 0.007
+
+
+def test_bank_remove():
+    bank = FilterBank()
+    bank.set_filter("group", [0], "One Euro")
+    bank.set_filter("group", [0], None)
+
+    assert len(bank) == 0
+
+
+def test_bank_set_rows_restarts():
+    bank = FilterBank()
+    bank.set_filter("group", [0], "Exponential", alpha=0.5)
+    bank.filter(0.0, np.zeros((2, 3)))
+    bank.set_rows("group", [0, 1])
+
+    positions, _ = bank.filter(0.01, np.ones((2, 3)))
+
+    assert list(bank) == ["group"]
+    assert positions.tolist() == np.ones((2, 3)).tolist()
@@ -0,0 +1,55 @@
+"""
+    Tests for force plate loads
+"""
+
+import numpy as np
+
+from qtm.forceplates import ForceDecimator, plate_loads
+
+# pylint: disable=W0621, C0111
+
+
+def test_plate_loads():
+    counts = [2, 0, 3]
+    forces = [[1, 0, 100], [3, 0, 300], [0, 0, 5], [0, 0, -50], [0, 2, -150]]
+    points = [[0, 0, 0], [4, 8, 0], [100, 100, 0], [1, 1, 0], [5, 1, 0]]
+
+    forces_mean, centers = plate_loads(counts, forces, points)
+
+    assert forces_mean[0].tolist() == [2, 0, 200]
+    assert np.isnan(forces_mean[1]).all()
+    assert np.allclose(forces_mean[2], [0, 2.0 / 3, -65])
+    assert centers[0].tolist() == [3, 6, 0]
+    assert np.isnan(centers[1]).all()
+    # The first sample of the last plate is under the threshold.
+    assert centers[2].tolist() == [4, 1, 0]
+
+
+def test_unloaded_plate():
+    _, centers = plate_loads([1], [[0, 0, 2]], [[10, 10, 0]], threshold=5)
+
+    assert np.isnan(centers).all()
+
+
+def test_decimate_to_rate():
+    decimator = ForceDecimator(rate=10)
+    results = []
+
+    # Two samples a packet at 100 packets per second.
+    for frame in range(25):
+        forces = [[frame, 0, 100], [frame, 0, 100]]
+        results.append(decimator.push(frame * 0.01, [2], forces, [[0, 0, 0]] * 2))
+
+    loads = [(i, result) for i, result in enumerate(results) if result is not None]
+
+    assert [i for i, _ in loads] == [0, 10, 20]
+    assert loads[1][1][0][0].tolist() == [5.5, 0, 100]
+    assert loads[2][1][0][0, 0] == 15.5
+
+
+def test_decimator_plate_count_change():
+    decimator = ForceDecimator(rate=1000)
+    decimator.push(0, [1], [[0, 0, 100]], [[0, 0, 0]])
+    forces, _ = decimator.push(1, [1, 1], [[0, 0, 10], [0, 0, 20]], [[0, 0, 0]] * 2)
+
+    assert forces[:, 2].tolist() == [10, 20]
@@ -0,0 +1,93 @@
+"""
+    Tests for gap detection and filling
+"""
+
+import numpy as np
+
+from qtm.gaps import GapTracker, fill_gaps, hold_gaps, visible_markers
+
+# pylint: disable=W0621, C0111
+
+NAN = [np.nan] * 3
+
+
+def test_visible_markers():
+    positions = np.array([[1.0, 2.0, 3.0], NAN, [1.0, np.nan, 3.0]])
+
+    assert visible_markers(positions).tolist() == [True, False, False]
+
+
+def test_tracker_reports_changes_only():
+    tracker = GapTracker()
+
+    visible, changed = tracker.update(np.zeros((3, 3)))
+    assert visible.all() and changed.tolist() == []
+
+    _, changed = tracker.update(np.array([[0.0] * 3, NAN, [0.0] * 3]))
+    assert changed.tolist() == [1]
+
+    _, changed = tracker.update(np.array([[0.0] * 3, NAN, [0.0] * 3]))
+    assert changed.tolist() == []
+
+    visible, changed = tracker.update(np.zeros((3, 3)))
+    assert changed.tolist() == [1]
+    assert visible.all()
+
+
+def test_tracker_missing_in_first_frame():
+    _, changed = GapTracker().update(np.array([NAN, [0.0] * 3]))
+
+    assert changed.tolist() == [0]
+
+
+def test_tracker_records_gaps():
+    tracker = GapTracker(record=True)
+    frames = [np.zeros((2, 3)) for _ in range(6)]
+    frames[2][0] = np.nan
+    frames[3][0] = np.nan
+
+    for framenumber, frame in enumerate(frames, 10):
+        tracker.update(frame, framenumber)
+
+    assert tracker.gaps == [(0, 12, 13)]
+
+
+def test_fill_gaps():
+    frames = np.arange(6, dtype=np.float64)[:, None, None] * np.ones((6, 2, 3))
+    frames[1:4, 0] = np.nan
+    frames[0, 1] = np.nan
+    frames[5, 1] = np.nan
+
+    filled = fill_gaps(frames)
+
+    assert filled[:, 0, 0].tolist() == [0, 1, 2, 3, 4, 5]
+    # No frame to interpolate from at the ends.
+    assert np.isnan(filled[[0, 5], 1]).all()
+    assert filled[1:5, 1, 2].tolist() == [1, 2, 3, 4]
+    # The input is left alone.
+    assert np.isnan(frames[1, 0]).all()
+
+
+def test_fill_gaps_max_gap():
+    frames = np.zeros((10, 1, 3))
+    frames[1:4] = np.nan
+    frames[6:7] = np.nan
+
+    filled = fill_gaps(frames, max_gap=2)
+
+    assert np.isnan(filled[1:4]).all()
+    assert not np.isnan(filled[6]).any()
+
+
+def test_hold_gaps():
+    frames = np.arange(5, dtype=np.float64)[:, None, None] * np.ones((5, 2, 4))
+    frames[2:4, 0] = np.nan
+    frames[0:2, 1] = np.nan
+
+    held = hold_gaps(frames)
+
+    assert held[:, 0, 0].tolist() == [0, 1, 1, 1, 4]
+    # Nothing to hold before the first visible frame.
+    assert np.isnan(held[0:2, 1]).all()
+    assert held[2:, 1, 3].tolist() == [2, 3, 4]
+    assert np.isnan(frames[2, 0]).all()
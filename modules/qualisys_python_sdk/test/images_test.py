@@ -0,0 +1,110 @@
+"""
+    Tests for camera images
+"""
+
+import os
+import struct
+
+import pytest
+
+from qtm.images import ImageFiles, TGAHeader, image_file
+from qtm.packet import QRTPacket, QRTComponentType, QRTImageFormat, RTImage
+
+# pylint: disable=W0621, C0111
+
+
+def image(camera, image_format, width, height, data):
+    return RTImage(camera, image_format.value, width, height, 0, 0, 1, 1, len(data))
+
+
+def image_packet(*images):
+    body = struct.pack("<i", len(images))
+
+    for image_info, data in images:
+        body += RTImage.format.pack(*image_info) + data
+
+    body = struct.pack("<II", len(body) + 8, QRTComponentType.ComponentImage.value) + body
+    return QRTPacket(struct.pack("<qII", 1000, 7, 1) + body)
+
+
+def test_get_image_uses_image_size():
+    first = image(1, QRTImageFormat.FormatJPG, 2, 2, b"\xff\xd8jpg")
+    second = image(2, QRTImageFormat.FormatPNG, 2, 2, b"png")
+    info, images = image_packet((first, b"\xff\xd8jpg"), (second, b"png")).get_image()
+
+    assert info.image_count == 2
+    assert images == [(first, b"\xff\xd8jpg"), (second, b"png")]
+
+
+def test_raw_images_as_tga():
+    pixels = bytes(range(12))
+    image_info = image(1, QRTImageFormat.FormatRawBGR, 2, 2, pixels)
+    buffer = bytearray(TGAHeader.size + 12)
+
+    extension, contents = image_file(image_info, pixels, buffer)
+    header = TGAHeader.unpack_from(contents)
+
+    assert extension == ".tga"
+    assert contents is buffer
+    assert header[2] == 2
+    assert header[8:] == (2, 2, 24, 0x20)
+    assert bytes(contents[TGAHeader.size :]) == pixels
+
+    gray = image(1, QRTImageFormat.FormatRawGrayscale, 2, 2, pixels[:4])
+    assert TGAHeader.unpack_from(image_file(gray, pixels[:4])[1])[2] == 3
+
+    with pytest.raises(ValueError):
+        image_file(gray, pixels)
+
+
+def test_compressed_images_unchanged():
+    image_info = image(1, QRTImageFormat.FormatJPG, 2, 2, b"jpg")
+
+    assert image_file(image_info, b"jpg") == (".jpg", b"jpg")
+
+
+def test_latest_image_only(tmpdir):
+    files = ImageFiles(str(tmpdir))
+
+    try:
+        # Hold the lock so that the thread cannot write in between.
+        with files._condition:
+            for data in (b"a", b"b", b"c"):
+                files.put([(image(3, QRTImageFormat.FormatJPG, 1, 1, data), data)])
+
+        path = wait_for(files, 3)
+
+        assert open(path, "rb").read() == b"c"
+        assert files.stats() == dict(written=1, skipped=2)
+        assert files.take() == {}
+    finally:
+        files.close()
+
+
+def test_taken_file_not_written(tmpdir):
+    with ImageFiles(str(tmpdir)) as files:
+        taken = set()
+
+        for i in range(6):
+            data = str(i).encode()
+            files.put([(image(1, QRTImageFormat.FormatPNG, 1, 1, data), data)])
+            path = wait_for(files, 1)
+
+            assert open(path, "rb").read() == data
+            assert path not in taken or len(taken) == 3
+            taken.add(path)
+
+        assert len(taken) == 3
+        assert all(os.path.basename(path).startswith("camera_1_") for path in taken)
+
+
+def wait_for(files, camera):
+    for _ in range(1000):
+        taken = files.take()
+
+        if camera in taken:
+            return taken[camera]
+
+        files._thread.join(0.005)
+
+    raise AssertionError("No image was written")
@@ -0,0 +1,117 @@
+"""
+    Tests for the timing instrumentation
+"""
+
+import struct
+
+import pytest
+
+from qtm.instrumentation import Histogram, Instrumentation, INSTRUMENTATION
+from qtm.packet import QRTPacketType, RTheader
+from qtm.receiver import Receiver
+
+# pylint: disable=W0621, C0111, W0212
+
+
+@pytest.fixture
+def instrumentation():
+    INSTRUMENTATION.reset()
+    INSTRUMENTATION.enabled = True
+    yield INSTRUMENTATION
+    INSTRUMENTATION.enabled = False
+    INSTRUMENTATION.reset()
+
+
+def data_packet():
+    # Timestamp, frame number and a single empty 3D component.
+    body = struct.pack("<qII", 1000, 1, 1) + struct.pack("<II", 16, 1)
+    body += struct.pack("<Ihh", 0, 0, 0)
+    return RTheader.pack(RTheader.size + len(body), QRTPacketType.PacketData.value) + body
+
+
+def test_histogram_empty():
+    histogram = Histogram()
+
+    assert histogram.mean is None
+    assert histogram.percentile(50) is None
+    assert histogram.summary()["count"] == 0
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+
+    for _ in range(90):
+        histogram.record(10e-6)
+    for _ in range(10):
+        histogram.record(3e-3)
+
+    assert histogram.count == 100
+    assert histogram.percentile(50) == pytest.approx(16e-6)
+    assert histogram.percentile(95) == pytest.approx(3e-3)
+    assert histogram.summary()["max"] == pytest.approx(3.0)
+
+
+def test_histogram_huge_sample():
+    histogram = Histogram()
+    histogram.record(1e6)
+
+    assert histogram.counts[-1] == 1
+
+
+def test_latency_relative_to_fastest_frame(mocker):
+    instrumentation = Instrumentation()
+    times = iter([10.0, 10.015, 10.025])
+    mocker.patch("qtm.instrumentation.clock", lambda: next(times))
+
+    instrumentation.frame_applied(0)
+    instrumentation.frame_applied(10000)
+    instrumentation.frame_applied(20000)
+
+    assert instrumentation.latency.count == 3
+    assert instrumentation.latency.maximum == pytest.approx(0.005)
+
+
+def test_fps(mocker):
+    instrumentation = Instrumentation()
+    times = iter([1.0, 1.01, 1.02, 1.03])
+    mocker.patch("qtm.instrumentation.clock", lambda: next(times))
+
+    assert instrumentation.fps is None
+
+    for _ in range(4):
+        instrumentation.frame_received()
+
+    assert instrumentation.fps == pytest.approx(100)
+
+
+def test_receiver_records_stages(instrumentation):
+    packets = []
+    receiver = Receiver({QRTPacketType.PacketData: packets.append})
+
+    receiver.data_received(data_packet())
+    _, markers = packets[0].get_3d_markers()
+
+    assert markers == []
+    assert instrumentation.stages["receive"].count == 1
+    assert instrumentation.stages["parse"].count == 1
+    assert instrumentation.stages["decode"].count == 1
+    assert len(instrumentation._frame_times) == 1
+
+
+def test_total(instrumentation):
+    instrumentation.record("decode", 0.25)
+    instrumentation.record("decode", 0.5)
+
+    assert instrumentation.total("decode") == 0.75
+    assert instrumentation.total("parse") == 0.0
+
+
+def test_disabled_records_nothing():
+    INSTRUMENTATION.reset()
+    packets = []
+    receiver = Receiver({QRTPacketType.PacketData: packets.append})
+
+    receiver.data_received(data_packet())
+    packets[0].get_3d_markers()
+
+    assert not INSTRUMENTATION.stages
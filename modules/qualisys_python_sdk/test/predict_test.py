@@ -0,0 +1,102 @@
+"""
+    Tests for the pose predictors
+"""
+
+import numpy as np
+import pytest
+
+from qtm.predict import ConstantVelocityPredictor, KalmanPredictor
+from qtm.rotation import from_rotation_vectors, to_rotation_vectors
+
+# pylint: disable=W0621, C0111
+
+RATE = 100.0
+
+
+def feed(predictor, frames, velocity, angular_velocity=None):
+    for i in range(frames):
+        time = i / RATE
+        positions = np.array([[1.0, 2.0, 3.0]]) + velocity * time
+        rotations = None
+
+        if angular_velocity is not None:
+            rotations = from_rotation_vectors(np.array([angular_velocity]) * time)
+
+        predictor.update(time, positions, rotations)
+
+    return (frames - 1) / RATE
+
+
+@pytest.fixture(params=[ConstantVelocityPredictor, KalmanPredictor])
+def predictor(request):
+    return request.param()
+
+
+def test_nothing_before_first_frame(predictor):
+    assert predictor.predict(0.1) == (None, None)
+
+
+def test_first_frame_is_held(predictor):
+    predictor.update(0.0, [[1.0, 2.0, 3.0]])
+
+    positions, rotations = predictor.predict(0.1)
+
+    assert positions.tolist() == [[1.0, 2.0, 3.0]]
+    assert rotations is None
+
+
+def test_linear_motion(predictor):
+    velocity = np.array([100.0, -50.0, 10.0])
+    time = feed(predictor, 200, velocity)
+
+    positions, _ = predictor.predict(0.05)
+
+    assert np.allclose(positions, [1.0, 2.0, 3.0] + velocity * (time + 0.05), atol=0.01)
+
+
+def test_constant_rotation(predictor):
+    angular_velocity = [0.0, 0.0, 2.0]
+    time = feed(predictor, 50, np.zeros(3), angular_velocity)
+
+    _, rotations = predictor.predict(0.1)
+
+    assert np.allclose(
+        to_rotation_vectors(rotations), [[0.0, 0.0, 2.0 * (time + 0.1)]], atol=1e-6
+    )
+
+
+def test_occluded_rows(predictor):
+    predictor.update(0.00, [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0]])
+    predictor.update(0.01, [[1.0, 0.0, 0.0], [np.nan] * 3])
+    predictor.update(0.02, [[2.0, 0.0, 0.0], [5.0, 5.0, 5.0]])
+
+    positions, _ = predictor.predict(0.01)
+
+    assert np.allclose(positions[0], [3.0, 0.0, 0.0], atol=0.2)
+    # Seen again without a velocity yet.
+    assert positions[1].tolist() == [5.0, 5.0, 5.0]
+
+
+def test_restarts_on_older_frame(predictor):
+    feed(predictor, 10, np.array([100.0, 0.0, 0.0]))
+    predictor.update(0.0, [[7.0, 7.0, 7.0]])
+
+    assert predictor.predict(1.0)[0].tolist() == [[7.0, 7.0, 7.0]]
+
+
+def test_kalman_reduces_noise():
+    random = np.random.RandomState(0)
+    errors = {}
+
+    for predictor in (ConstantVelocityPredictor(smoothing=1.0), KalmanPredictor()):
+        squared = []
+
+        for i in range(500):
+            time = i / RATE
+            truth = np.array([[100.0 * time, 0.0, 0.0]])
+            predictor.update(time, truth + random.normal(0, 0.5, (1, 3)))
+            squared.append(((predictor.predict(0.05)[0] - truth - [5.0, 0, 0]) ** 2).sum())
+
+        errors[type(predictor)] = np.mean(squared[100:])
+
+    assert errors[KalmanPredictor] < errors[ConstantVelocityPredictor]
@@ -0,0 +1,206 @@
+"""
+    Tests for ReconnectingConnection
+"""
+
+import asyncio
+
+import pytest
+
+from qtm.reconnect import ReconnectingConnection
+
+# pylint: disable=W0621, C0111, C0330, W0212
+
+
+class FakeConnection(object):
+    def __init__(self, on_disconnect):
+        self.on_disconnect = on_disconnect
+        self.streamed = []
+        self.transport = True
+        self.dead = False
+
+    def has_transport(self):
+        return self.transport
+
+    def disconnect(self):
+        self.transport = False
+
+    def drop(self):
+        self.transport = False
+        self.on_disconnect(None)
+
+    async def stream_frames(self, **kwargs):
+        if self.dead:
+            raise asyncio.TimeoutError()
+
+        self.streamed.append(kwargs)
+        return b"Ok"
+
+    async def stream_frames_stop(self):
+        pass
+
+    async def qtm_version(self):
+        return b"QTM Version is 2019.1"
+
+
+@pytest.fixture
+def fake_connect(mocker):
+    connections = []
+    results = []
+
+    async def connect(*_, on_disconnect=None, **__):
+        if results and results.pop(0) is None:
+            return None
+
+        connection = FakeConnection(on_disconnect)
+        connections.append(connection)
+        return connection
+
+    mocker.patch("qtm.reconnect.connect", connect)
+    return connections, results
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_start_opens_spare(event_loop, fake_connect):
+    connections, _ = fake_connect
+    wrapper = ReconnectingConnection("192.0.2.0", loop=event_loop)
+
+    assert await wrapper.start()
+    await settle()
+
+    assert len(connections) == 2
+    assert wrapper.connection is connections[0]
+
+
+@pytest.mark.asyncio
+async def test_start_fail(event_loop, fake_connect):
+    _, results = fake_connect
+    results.append(None)
+    wrapper = ReconnectingConnection("192.0.2.0", loop=event_loop)
+
+    assert not await wrapper.start()
+
+
+@pytest.mark.asyncio
+async def test_forwards_calls(event_loop, fake_connect):
+    wrapper = ReconnectingConnection("192.0.2.0", spare=False, loop=event_loop)
+    await wrapper.start()
+
+    assert await wrapper.qtm_version() == b"QTM Version is 2019.1"
+
+
+@pytest.mark.asyncio
+async def test_promotes_spare_and_restores_stream(event_loop, fake_connect):
+    connections, _ = fake_connect
+    latencies = []
+    wrapper = ReconnectingConnection(
+        "192.0.2.0", on_reconnect=latencies.append, loop=event_loop
+    )
+    await wrapper.start()
+    await settle()
+    await wrapper.stream_frames(components=["6d"])
+
+    connections[0].drop()
+    await settle()
+
+    assert wrapper.connection is connections[1]
+    assert connections[1].streamed == [
+        dict(frames="allframes", components=["6d"], on_packet=None)
+    ]
+    assert len(latencies) == 1
+    assert wrapper.last_reconnect_latency == latencies[0]
+    # A new spare is warmed after the old one was promoted.
+    assert len(connections) == 3
+
+
+@pytest.mark.asyncio
+async def test_reconnect_backoff(event_loop, fake_connect):
+    connections, results = fake_connect
+    wrapper = ReconnectingConnection(
+        "192.0.2.0", spare=False, backoff=0.01, loop=event_loop
+    )
+    await wrapper.start()
+
+    results.extend([None, None])
+    connections[0].drop()
+    await asyncio.sleep(0.1)
+
+    assert wrapper.connection is connections[1]
+    assert connections[1].streamed == []
+
+
+@pytest.mark.asyncio
+async def test_reconnect_gives_up(event_loop, fake_connect):
+    connections, results = fake_connect
+    given_up = []
+    wrapper = ReconnectingConnection(
+        "192.0.2.0",
+        spare=False,
+        backoff=0.01,
+        max_attempts=2,
+        on_give_up=given_up.append,
+        loop=event_loop,
+    )
+    await wrapper.start()
+
+    results.extend([None, None, None])
+    connections[0].drop()
+    await asyncio.sleep(0.1)
+
+    assert wrapper.connection is None
+    assert given_up == [2]
+    assert wrapper.last_reconnect_latency is None
+
+
+@pytest.mark.asyncio
+async def test_dead_spare_discarded(event_loop, fake_connect):
+    connections, _ = fake_connect
+    wrapper = ReconnectingConnection("192.0.2.0", backoff=0.01, loop=event_loop)
+    await wrapper.start()
+    await settle()
+    await wrapper.stream_frames(components=["6d"])
+
+    # The spare went down with the network but still has its transport.
+    connections[1].dead = True
+    connections[0].drop()
+    await asyncio.sleep(0.05)
+
+    assert not connections[1].has_transport()
+    assert wrapper.connection is connections[2]
+    assert connections[2].streamed == [
+        dict(frames="allframes", components=["6d"], on_packet=None)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_lost_spare_rewarmed(event_loop, fake_connect):
+    connections, _ = fake_connect
+    wrapper = ReconnectingConnection("192.0.2.0", loop=event_loop)
+    await wrapper.start()
+    await settle()
+
+    connections[1].drop()
+    await settle()
+
+    assert len(connections) == 3
+    assert wrapper._spare[1] is connections[2]
+
+
+@pytest.mark.asyncio
+async def test_disconnect_does_not_reconnect(event_loop, fake_connect):
+    connections, _ = fake_connect
+    wrapper = ReconnectingConnection("192.0.2.0", loop=event_loop)
+    await wrapper.start()
+    await settle()
+
+    wrapper.disconnect()
+    connections[0].on_disconnect(None)
+    await settle()
+
+    assert wrapper.connection is None
+    assert len(connections) == 2
+    assert not connections[1].has_transport()
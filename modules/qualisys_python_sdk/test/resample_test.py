@@ -0,0 +1,78 @@
+"""
+    Tests for FrameBuffer
+"""
+
+import numpy as np
+
+from qtm.resample import FrameBuffer
+
+# pylint: disable=W0621, C0111
+
+HALF_TURN = np.array([[0, 0, 1.0, 0]])
+IDENTITY = np.array([[0, 0, 0, 1.0]])
+
+
+def test_empty():
+    assert FrameBuffer().sample(0.0) is None
+
+
+def test_interpolates_positions_and_rotations():
+    buffer = FrameBuffer()
+    buffer.push(1.0, np.zeros((2, 3)), IDENTITY)
+    buffer.push(2.0, np.ones((2, 3)), HALF_TURN)
+
+    positions, rotations = buffer.sample(1.25)
+
+    assert np.allclose(positions, 0.25)
+    assert np.allclose(rotations, [[0, 0, np.sin(np.pi / 8), np.cos(np.pi / 8)]])
+
+
+def test_clamps_outside_frames():
+    buffer = FrameBuffer()
+    buffer.push(1.0, np.zeros((1, 3)))
+    buffer.push(2.0, np.ones((1, 3)))
+
+    assert buffer.sample(0.0)[0].tolist() == [[0, 0, 0]]
+    assert buffer.sample(5.0)[0].tolist() == [[1, 1, 1]]
+    assert buffer.sample(5.0)[1] is None
+
+
+def test_ring_keeps_capacity_frames():
+    buffer = FrameBuffer(capacity=4)
+
+    for i in range(10):
+        buffer.push(float(i), np.full((1, 3), i))
+
+    assert len(buffer) == 4
+    assert (buffer.oldest, buffer.newest, buffer.interval) == (6.0, 9.0, 1.0)
+    assert buffer.sample(7.5)[0].tolist() == [[7.5, 7.5, 7.5]]
+
+
+def test_writes_to_out_arrays():
+    buffer = FrameBuffer()
+    buffer.push(0.0, np.zeros((3, 3)), np.repeat(IDENTITY, 3, axis=0))
+    buffer.push(1.0, np.ones((3, 3)), np.repeat(HALF_TURN, 3, axis=0))
+    positions = np.empty((3, 3))
+    rotations = np.empty((3, 4))
+
+    result = buffer.sample(0.5, positions, rotations)
+
+    assert result[0] is positions and result[1] is rotations
+    assert np.allclose(positions, 0.5)
+
+
+def test_restarts_on_older_frame():
+    buffer = FrameBuffer()
+    buffer.push(5.0, np.zeros((1, 3)))
+    buffer.push(6.0, np.zeros((1, 3)))
+    buffer.push(0.0, np.ones((1, 3)))
+
+    assert len(buffer) == 1
+
+
+def test_restarts_on_new_shape():
+    buffer = FrameBuffer()
+    buffer.push(0.0, np.zeros((1, 3)))
+    buffer.push(1.0, np.zeros((2, 3)))
+
+    assert len(buffer) == 1
@@ -0,0 +1,117 @@
+"""
+    Tests for the vectorized rotation helpers
+"""
+
+import numpy as np
+import pytest
+
+from qtm.rotation import (
+    aim_quaternions,
+    matrices_to_quaternions,
+    quaternions_to_euler,
+    quaternions_to_matrices,
+    slerp,
+)
+
+# pylint: disable=W0621, C0111
+
+
+def random_quaternions(count, seed=0):
+    q = np.random.RandomState(seed).normal(size=(count, 4))
+    return q / np.linalg.norm(q, axis=1)[:, None]
+
+
+def same_rotation(q0, q1):
+    return np.allclose(np.abs(np.einsum("ij,ij->i", q0, q1)), 1)
+
+
+def test_round_trip():
+    q = random_quaternions(1000)
+
+    assert same_rotation(matrices_to_quaternions(quaternions_to_matrices(q)), q)
+
+
+def test_half_turns():
+    # Trace -1, the branch that breaks the naive conversion.
+    q = np.array([[1.0, 0, 0, 0], [0, 1.0, 0, 0], [0, 0, 1.0, 0]])
+
+    assert same_rotation(matrices_to_quaternions(quaternions_to_matrices(q)), q)
+
+
+def test_matrix_convention():
+    # 90 degrees around z takes x to y.
+    q = np.array([0, 0, np.sqrt(0.5), np.sqrt(0.5)])
+
+    assert np.allclose(quaternions_to_matrices(q).dot([1, 0, 0]), [0, 1, 0])
+
+
+def test_slerp_halfway():
+    q0 = np.array([[0, 0, 0, 1.0]])
+    q1 = np.array([[0, 0, np.sin(np.pi / 4), np.cos(np.pi / 4)]])
+    expected = np.array([[0, 0, np.sin(np.pi / 8), np.cos(np.pi / 8)]])
+
+    assert np.allclose(slerp(q0, q1, 0.5), expected)
+
+
+def test_slerp_shortest_path():
+    q0 = random_quaternions(50, seed=1)
+    q1 = random_quaternions(50, seed=2)
+
+    assert same_rotation(slerp(q0, q1, 0.3), slerp(q0, -q1, 0.3))
+    assert same_rotation(slerp(q0, q1, 0.0), q0)
+    assert same_rotation(slerp(q0, q1, 1.0), q1)
+
+
+def test_slerp_nearly_equal():
+    q = random_quaternions(10)
+    result = slerp(q, q, np.linspace(0, 1, 10))
+
+    assert np.allclose(np.linalg.norm(result, axis=1), 1)
+    assert same_rotation(result, q)
+
+
+def axis_rotation(axis, angle):
+    c, s = np.cos(angle), np.sin(angle)
+    a, b = [other for other in range(3) if other != axis]
+    m = np.eye(3)
+    m[a, a] = m[b, b] = c
+    m[a, b], m[b, a] = (s, -s) if axis == 1 else (-s, s)
+    return m
+
+
+def euler_matrix(angles, order):
+    m = np.eye(3)
+
+    for axis in order:
+        index = "xyz".index(axis)
+        m = axis_rotation(index, angles[index]).dot(m)
+
+    return m
+
+
+@pytest.mark.parametrize("order", ["xyz", "yzx", "zxy", "xzy", "yxz", "zyx"])
+def test_euler(order):
+    q = random_quaternions(100)
+    # Quarter turns about every axis, gimbal lock for one of them.
+    q[:3] = np.sqrt(0.5) * np.hstack((np.eye(3), np.ones((3, 1))))
+
+    angles = quaternions_to_euler(q, order)
+
+    for a, m in zip(angles, quaternions_to_matrices(q)):
+        assert np.allclose(euler_matrix(a, order), m)
+
+
+def test_euler_angles():
+    q = np.array([0, 0, np.sin(np.pi / 8), np.cos(np.pi / 8)])
+
+    assert np.allclose(quaternions_to_euler(q), [0, 0, np.pi / 4])
+
+
+def test_aim():
+    directions = np.array([[1, 0, 0], [0, 2, 0], [-1, 0, 0], [1, 1, 1], [0, 0, 0]], dtype=float)
+    q = aim_quaternions(directions)
+    aimed = quaternions_to_matrices(q[:4])[..., 0]
+
+    assert np.allclose(aimed, directions[:4] / np.linalg.norm(directions[:4], axis=1)[:, None])
+    assert np.isnan(q[4]).all()
+    assert np.allclose(quaternions_to_matrices(aim_quaternions([0, 0, -1], axis=[0, 0, 1]))[:, 2], [0, 0, -1])
@@ -0,0 +1,99 @@
+"""
+    Tests for the settings parser
+"""
+
+import pytest
+
+from qtm.settings import parse_settings
+
+# pylint: disable=W0621, C0111
+
+XML = """<QTM_Parameters_Ver_1.19>
+<The_3D>
+    <AxisUpwards>+Z</AxisUpwards>
+    <Labels>2</Labels>
+    <Label><Name>head</Name><RGBColor>16744448</RGBColor></Label>
+    <Label><Name>hand</Name><RGBColor>255</RGBColor></Label>
+</The_3D>
+<The_6D>
+    <Bodies>1</Bodies>
+    <Body>
+        <Name>camera</Name>
+        <RGBColor>65280</RGBColor>
+        <Point><X>1.5</X><Y>-2</Y><Z>0</Z></Point>
+        <Point><X>0</X><Y>3.25</Y><Z>4</Z></Point>
+    </Body>
+</The_6D>
+<Skeletons>
+    <Skeleton Name="actor">
+        <Segment Name="Hips" ID="1">
+            <Position X="0" Y="1" Z="950.5"/>
+            <Rotation X="0" Y="0" Z="0" W="1"/>
+        </Segment>
+        <Segment Name="Spine" ID="2" Parent_ID="1">
+            <Position X="0" Y="0" Z="100"/>
+            <Rotation X="0.5" Y="0.5" Z="0.5" W="0.5"/>
+        </Segment>
+    </Skeleton>
+</Skeletons>
+</QTM_Parameters_Ver_1.19>"""
+
+
+@pytest.fixture
+def settings():
+    return parse_settings(XML)
+
+
+def test_version(settings):
+    assert settings.version == "1.19"
+    assert settings.axis_upwards == "+Z"
+
+
+def test_labels(settings):
+    assert [(l.index, l.name) for l in settings.labels] == [(0, "head"), (1, "hand")]
+    assert settings.labels[0].rgb == (255, 128, 0)
+    assert settings.labels[1].rgb == (0, 0, 255)
+
+
+def test_bodies(settings):
+    body, = settings.bodies
+
+    assert (body.index, body.name, body.color) == (0, "camera", 65280)
+    assert [tuple(point) for point in body.points] == [(1.5, -2.0, 0.0), (0.0, 3.25, 4.0)]
+
+
+def test_skeletons(settings):
+    skeleton, = settings.skeletons
+    hips, spine = skeleton.segments
+
+    assert skeleton.name == "actor"
+    assert (hips.id, hips.name, hips.parent_id) == (1, "Hips", None)
+    assert hips.position == (0.0, 1.0, 950.5)
+    assert (spine.id, spine.parent_id) == (2, 1)
+    assert spine.rotation == (0.5, 0.5, 0.5, 0.5)
+
+
+def test_nested_segments():
+    settings = parse_settings(
+        b"""<QTM_Parameters_Ver_1.21><Skeletons><Skeleton Name="a">
+        <Segment Name="Hips" ID="1"><Segment Name="Spine" ID="2"/></Segment>
+        </Skeleton></Skeletons></QTM_Parameters_Ver_1.21>"""
+    )
+    hips, spine = settings.skeletons[0].segments
+
+    assert hips.parent_id is None
+    assert spine.parent_id == 1
+    assert spine.rotation == (0.0, 0.0, 0.0, 0.0)
+
+
+def test_missing_components():
+    settings = parse_settings("<QTM_Parameters_Ver_1.19/>")
+
+    assert settings.labels == []
+    assert settings.bodies == []
+    assert settings.skeletons == []
+
+
+def test_slots(settings):
+    with pytest.raises(AttributeError):
+        settings.labels[0].transform = None
@@ -0,0 +1,111 @@
+"""
+    Tests for SharedFrameBuffer
+"""
+
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from qtm.sharedmemory import SharedFrameBuffer
+
+# pylint: disable=W0621, C0111, W0212
+
+
+@pytest.fixture
+def buffer():
+    buffer = SharedFrameBuffer.create(markers=4, bodies=2, segments=3)
+    yield buffer
+    buffer.close()
+
+
+def test_open_by_name(buffer):
+    with SharedFrameBuffer.open(buffer.name) as other:
+        assert other.shape == (4, 2, 3)
+        assert other.sequence == 0
+
+
+def test_nothing_written(buffer):
+    assert buffer.read(buffer.frame()) is None
+
+
+def test_write_and_read(buffer):
+    positions = np.arange(12, dtype=np.float32).reshape(4, 3)
+    rotations = np.tile(np.eye(3), (2, 1, 1))
+
+    with SharedFrameBuffer.open(buffer.name) as writer:
+        writer.write(10, 1000, drop_rate=2, positions=positions, body_rotations=rotations)
+
+    frame = buffer.frame()
+
+    assert buffer.read(frame) == 1
+    assert frame["framenumber"] == 10
+    assert frame["timestamp"] == 1000
+    assert frame["drop_rate"] == 2
+    assert np.array_equal(frame["positions"], positions)
+    assert np.array_equal(frame["body_rotations"], rotations)
+    assert np.isnan(frame["body_positions"]).all()
+    assert (frame["segment_ids"] == -1).all()
+
+
+def test_latest_frame(buffer):
+    for framenumber in range(5):
+        buffer.write(framenumber, 0, positions=np.full((4, 3), framenumber))
+
+    frame = buffer.frame()
+
+    assert buffer.sequence == 5
+    assert buffer.read(frame) == 5
+    assert frame["framenumber"] == 4
+    assert (frame["positions"] == 4).all()
+
+
+def test_frame_being_written_is_not_read(buffer):
+    buffer.write(1, 0)
+    # The latest slot is marked as being written.
+    buffer._header[6] += 1
+
+    assert buffer.read(buffer.frame(), retries=3) is None
+
+
+def test_wrong_shape(buffer):
+    buffer.write(1, 0)
+
+    with pytest.raises(ValueError):
+        buffer.write(2, 0, positions=np.zeros((5, 3)))
+
+    frame = buffer.frame()
+
+    assert buffer.read(frame) == 1
+    assert frame["framenumber"] == 1
+
+    buffer.write(3, 0)
+
+    assert buffer.read(frame) == 2
+
+
+def test_unknown_array(buffer):
+    with pytest.raises(TypeError):
+        buffer.write(1, 0, velocities=np.zeros((4, 3)))
+
+
+def _write_frames(name, count):
+    with SharedFrameBuffer.open(name) as writer:
+        for framenumber in range(1, count + 1):
+            writer.write(framenumber, 0, positions=np.full((4, 3), framenumber))
+
+
+def test_other_process(buffer):
+    process = multiprocessing.Process(target=_write_frames, args=(buffer.name, 1000))
+    process.start()
+    frame = buffer.frame()
+
+    # Every frame read while the other process writes is whole.
+    while process.is_alive():
+        if buffer.read(frame) is not None:
+            assert (frame["positions"] == frame["framenumber"]).all()
+
+    process.join()
+
+    assert buffer.read(frame) == 1000
+    assert frame["framenumber"] == 1000
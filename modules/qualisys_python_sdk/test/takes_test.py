@@ -0,0 +1,103 @@
+"""
+    Tests for the take store
+"""
+
+import numpy as np
+import pytest
+
+from qtm.takes import Take, TakeWriter
+
+from test.settings_test import XML
+
+# pylint: disable=W0621, C0111
+
+
+def write_take(path, frames, chunk_frames=4, components=("3d", "6d", "skeleton")):
+    with TakeWriter(str(path), XML, components=components, chunk_frames=chunk_frames) as writer:
+        for i in range(frames):
+            writer.append(
+                100 + 2 * i,
+                1000 * i,
+                positions=np.full((2, 3), i),
+                body_positions=np.full((1, 3), -i),
+                body_rotations=np.tile(np.eye(3), (1, 1, 1)),
+                segment_ids=[1, 2],
+                segment_positions=np.full((2, 3), i),
+                segment_rotations=np.tile([0, 0, 0, 1.0], (2, 1)),
+            )
+
+    return Take(str(path))
+
+
+def test_frames_across_chunks(tmpdir):
+    take = write_take(tmpdir, 10)
+
+    assert len(take) == 10
+    assert take.frame(5)["positions"].tolist() == [[5] * 3] * 2
+    assert take.frame(-1)["body_positions"].tolist() == [[-9] * 3]
+    assert (take.frame(9)["body_rotations"] == np.eye(3)).all()
+
+    with pytest.raises(IndexError):
+        take.frame(10)
+
+
+def test_labels_and_ids(tmpdir):
+    take = write_take(tmpdir, 1)
+
+    assert take.labels == ["head", "hand"]
+    assert take.segment_ids.tolist() == [1, 2]
+
+
+def test_index(tmpdir):
+    take = write_take(tmpdir, 10)
+
+    assert take.index_of(106) == 3
+    assert take.index_at(0.0035) == 3
+    assert take.index_at(-1) == 0
+    assert take.index_at(100) == 9
+
+    with pytest.raises(KeyError):
+        take.index_of(107)
+
+
+def test_column(tmpdir):
+    take = write_take(tmpdir, 10)
+    column = take.column("segment_positions", 2, 9)
+
+    assert column.shape == (7, 2, 3)
+    assert column[:, 0, 0].tolist() == list(range(2, 9))
+    assert len(take.column("positions")) == 10
+
+
+def test_missing_arrays_are_nan(tmpdir):
+    with TakeWriter(str(tmpdir), XML) as writer:
+        writer.append(1, 0, positions=np.zeros((2, 3)))
+
+    frame = Take(str(tmpdir)).frame(0)
+
+    assert (frame["positions"] == 0).all()
+    assert np.isnan(frame["segment_rotations"]).all()
+
+
+def test_components(tmpdir):
+    take = write_take(tmpdir, 2, components=("3d",))
+
+    assert list(take.columns) == ["positions"]
+    assert list(take.frame(1)) == ["positions"]
+
+
+def test_segment_order_from_frames(tmpdir):
+    with TakeWriter(str(tmpdir), XML) as writer:
+        writer.append(1, 0, segment_ids=[2, 1])
+
+    assert Take(str(tmpdir)).segment_ids.tolist() == [2, 1]
+
+
+def test_empty(tmpdir):
+    TakeWriter(str(tmpdir), XML).close()
+    take = Take(str(tmpdir))
+
+    assert len(take) == 0
+
+    with pytest.raises(IndexError):
+        take.index_at(0)
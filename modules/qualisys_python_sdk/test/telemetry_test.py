@@ -0,0 +1,120 @@
+"""
+    Tests for StreamTelemetry
+"""
+
+import pytest
+
+from qtm.telemetry import StreamTelemetry
+
+# pylint: disable=W0621, C0111
+
+
+def feed(telemetry, framenumbers, interval=0.01, start=0.0, **kwargs):
+    for i, framenumber in enumerate(framenumbers):
+        telemetry.update(framenumber, arrival=start + i * interval, **kwargs)
+
+
+def test_no_frames():
+    telemetry = StreamTelemetry()
+
+    assert telemetry.loss == 0.0
+    assert telemetry.jitter == 0.0
+    assert telemetry.effective_rate == 0.0
+    assert telemetry.warnings() == []
+
+
+def test_steady_stream():
+    telemetry = StreamTelemetry()
+    feed(telemetry, range(1, 101))
+
+    assert telemetry.loss == 0.0
+    assert telemetry.jitter == pytest.approx(0.0, abs=1e-9)
+    assert telemetry.effective_rate == pytest.approx(100)
+    assert telemetry.capture_rate == pytest.approx(100)
+
+
+def test_gaps():
+    telemetry = StreamTelemetry()
+    # Every other frame is lost on the way.
+    feed(telemetry, range(1, 201, 2), interval=0.02)
+
+    assert telemetry.loss == pytest.approx(99 / 199.0)
+    assert telemetry.effective_rate == pytest.approx(50)
+    assert telemetry.capture_rate == pytest.approx(100)
+    assert telemetry.total_missed == 99
+
+
+def test_window_is_bounded():
+    telemetry = StreamTelemetry(window=10)
+    feed(telemetry, [1, 5] + list(range(6, 30)))
+
+    assert len(telemetry._frames) == 10
+    assert telemetry.loss == 0.0
+    assert telemetry.total_missed == 3
+
+
+def test_restart_resets():
+    telemetry = StreamTelemetry()
+    feed(telemetry, [100, 105, 1, 2])
+
+    assert telemetry.total_frames == 2
+    assert telemetry.loss == 0.0
+
+
+def test_jitter():
+    telemetry = StreamTelemetry()
+
+    for i, arrival in enumerate([0.0, 0.01, 0.03, 0.04, 0.06]):
+        telemetry.update(i, arrival=arrival)
+
+    assert telemetry.jitter == pytest.approx(0.005)
+
+
+def test_no_warnings_for_small_drop_rates():
+    telemetry = StreamTelemetry()
+    feed(telemetry, range(1, 101), drop_rate=10, out_of_sync_rate=5)
+
+    assert telemetry.warnings() == []
+
+
+def test_jitter_warning_relative_to_frame_period():
+    telemetry = StreamTelemetry()
+
+    # 5 ms of jitter at a frame period of 15 ms.
+    for i, arrival in enumerate([0.0, 0.01, 0.03, 0.04, 0.06]):
+        telemetry.update(i, arrival=arrival)
+
+    assert telemetry.warnings() == []
+
+    telemetry.reset()
+
+    # 4 ms of jitter at a frame period of 5 ms.
+    for i, arrival in enumerate([0.0, 0.001, 0.01, 0.011, 0.02]):
+        telemetry.update(i, arrival=arrival)
+
+    warnings = telemetry.warnings()
+
+    assert len(warnings) == 1
+    assert "jitter is 4.0 ms at a frame period of 5.0 ms" in warnings[0]
+
+
+def test_warnings_are_rate_limited():
+    messages = []
+    telemetry = StreamTelemetry(on_warning=messages.append, warning_interval=1.0)
+
+    feed(telemetry, range(1, 51), drop_rate=30)
+    assert len(messages) == 1
+    assert "drop rate of 30" in messages[0]
+
+    feed(telemetry, range(51, 151), start=0.5, drop_rate=30)
+    assert len(messages) == 2
+
+
+def test_loss_warning_without_qtm_drops():
+    telemetry = StreamTelemetry()
+    feed(telemetry, [1, 2, 10, 11])
+
+    warnings = telemetry.warnings()
+
+    assert len(warnings) == 1
+    assert "lost between QTM and the client" in warnings[0]
@@ -0,0 +1,130 @@
+"""
+    Tests for timecode decoding and locking
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from qtm.packet import QRTPacket, QRTComponentType, RTTimecode
+from qtm.takes import Take, TakeWriter
+from qtm.timecode import (
+    CameraTime,
+    IRIGTimecode,
+    SMPTETimecode,
+    TimecodeLock,
+    decode_timecode,
+)
+
+from test.settings_test import XML
+
+# pylint: disable=W0621, C0111
+
+
+def smpte(hours, minutes, seconds, frame):
+    return RTTimecode(0, 0, hours | minutes << 5 | seconds << 11 | frame << 17)
+
+
+def make_packet(framenumber, timestamp, *timecodes):
+    body = struct.pack("<i", len(timecodes))
+    body += b"".join(struct.pack("<iII", *timecode) for timecode in timecodes)
+    component = struct.pack("<II", len(body) + 8, QRTComponentType.ComponentTimecode.value) + body
+    return QRTPacket(struct.pack("<qII", timestamp, framenumber, 1) + component)
+
+
+def test_get_timecode():
+    packet = make_packet(7, 1000, smpte(1, 2, 3, 4), RTTimecode(2, 1, 5))
+    info, timecodes = packet.get_timecode()
+
+    assert info.timecode_count == 2
+    assert decode_timecode(timecodes[0]) == SMPTETimecode(1, 2, 3, 4)
+    assert decode_timecode(timecodes[1]) == CameraTime((1 << 32) + 5)
+
+
+def test_smpte():
+    timecode = decode_timecode(smpte(23, 59, 58, 24))
+
+    assert str(timecode) == "23:59:58:24"
+    assert timecode.to_seconds(25) == 86398 + 24 / 25.0
+
+
+def test_irig():
+    hi = 24 | 100 << 7
+    lo = 12 | 30 << 5 | 15 << 11 | 7 << 17
+    timecode = decode_timecode(RTTimecode(1, hi, lo))
+
+    assert timecode == IRIGTimecode(24, 100, 12, 30, 15, 7)
+    assert timecode.to_seconds() == 99 * 86400 + 12 * 3600 + 30 * 60 + 15.7
+
+
+def frames(rate=100, smpte_rate=25, start=10.0, count=20):
+    """Frame numbers, timestamps and timecodes of frames captured at rate
+    while the timecode runs from start seconds."""
+    for i in range(count):
+        seconds = start + i / float(rate)
+        whole = int(seconds)
+        frame = int(round((seconds - whole) * smpte_rate * 1000)) // 1000
+        yield i + 1, i * 1000000 // rate, SMPTETimecode(0, 0, whole, frame)
+
+
+def test_lock_places_frames_between_timecodes():
+    lock = TimecodeLock(smpte_rate=25)
+    # Starts in the middle of a timecode frame.
+    results = [lock.update(*frame) for frame in frames(start=10.02)]
+
+    assert lock.locked
+    assert np.allclose(results[2:], 10.02 + np.arange(2, 20) / 100.0)
+
+
+def test_lock_before_first_change():
+    lock = TimecodeLock(smpte_rate=25)
+    framenumber, timestamp, timecode = next(frames(start=10.02))
+
+    assert lock.update(framenumber, timestamp, timecode) == 10.0
+    assert not lock.locked
+
+
+def test_lock_follows_jumps():
+    lock = TimecodeLock(smpte_rate=25)
+
+    for frame in frames():
+        lock.update(*frame)
+
+    assert lock.update(21, 200000, SMPTETimecode(1, 0, 0, 0)) == 3600
+    assert not lock.locked
+
+
+def test_camera_time_is_a_tuple():
+    # The class docstring, not an assignment to __doc__, which Python 2
+    # does not allow on a namedtuple.
+    camera_time = CameraTime(5)
+
+    assert camera_time == (5,)
+    assert camera_time.ticks == 5
+    assert "camera clock" in CameraTime.__doc__
+    assert not hasattr(camera_time, "__dict__")
+
+
+def test_lock_camera_time():
+    with pytest.raises(ValueError):
+        TimecodeLock().update(1, 0, CameraTime(5))
+
+
+def test_take_timecode(tmpdir):
+    path = str(tmpdir)
+
+    with TakeWriter(path, XML, components=("3d", "timecode"), smpte_rate=25) as writer:
+        for framenumber, timestamp, timecode in frames():
+            seconds, frame = timecode.seconds, timecode.frame
+            writer.append_packet(
+                make_packet(framenumber, timestamp, smpte(0, 0, seconds, frame))
+            )
+
+    take = Take(path)
+
+    assert take.columns["timecode"] == ("<f8", ())
+    assert np.allclose(take.column("timecode"), 10 + np.arange(20) / 100.0)
+    assert take.index_at_timecode(10.055) == 5
+    assert take.index_at_timecode(0) == 0
+    assert take.index_at_timecode(100) == 19
@@ -0,0 +1,219 @@
+import numpy as np
+
+from PySide2 import QtCore
+
+import maya.cmds as cmds
+
+from qtm.arrays import get_3d_array, get_6d_arrays, get_skeleton_arrays
+from qtm.instrumentation import INSTRUMENTATION, clock
+from qtm.resample import FrameBuffer
+from qtm.rotation import matrices_to_quaternions
+
+from mayautil import MayaUtil
+
+# Frames per second of the named Maya time units.
+TIME_UNITS = {
+    "game": 15.0,
+    "film": 24.0,
+    "pal": 25.0,
+    "ntsc": 30.0,
+    "show": 48.0,
+    "palf": 50.0,
+    "ntscf": 60.0,
+}
+
+# How far the clock offset may drift upwards per frame, in seconds.
+OFFSET_RELAX = 1e-5
+
+
+class ClockOffset(object):
+    """Difference between the local clock and the QTM clock.
+
+    Tracks the frames that arrived fastest, allowing for slow drift between
+    the clocks, so the offset of a frame minus this value is how much later
+    than the fastest frames it arrived.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self._time = None
+
+    def update(self, time):
+        """Add a frame with QTM time in seconds, returns its extra delay."""
+        offset = clock() - time
+
+        # QTM restarts its clock with every measurement.
+        if self._time is not None and time < self._time:
+            self.value = None
+
+        self._time = time
+
+        if self.value is None or offset < self.value + OFFSET_RELAX:
+            self.value = offset
+        else:
+            self.value += OFFSET_RELAX
+
+        return offset - self.value
+
+
+def scene_rate():
+    unit = cmds.currentUnit(q=True, time=True)
+
+    if unit in TIME_UNITS:
+        return TIME_UNITS[unit]
+
+    if unit.endswith("fps"):
+        try:
+            return float(unit[:-3])
+        except ValueError:
+            pass
+
+    return 24.0
+
+
+def _production_start():
+    """Scene frame and timecode in seconds set with the timeCode command."""
+    frame = cmds.timeCode(q=True, mayaStartFrame=True) or 0.0
+    seconds = (
+        (cmds.timeCode(q=True, productionStartHour=True) or 0.0) * 3600
+        + (cmds.timeCode(q=True, productionStartMinute=True) or 0.0) * 60
+        + (cmds.timeCode(q=True, productionStartSecond=True) or 0.0)
+        + (cmds.timeCode(q=True, productionStartFrame=True) or 0.0) / scene_rate()
+    )
+    return frame, seconds
+
+
+def timecode_frame(seconds):
+    """Scene frame of a timecode in seconds, through the production start
+    time code of the scene."""
+    frame, start = _production_start()
+    return frame + (seconds - start) * scene_rate()
+
+
+def timecode_seconds(frame):
+    """Timecode in seconds of a scene frame, the inverse of timecode_frame."""
+    start_frame, start = _production_start()
+    return start + (frame - start_frame) / scene_rate()
+
+
+class ScenePlayback(QtCore.QObject):
+    """Applies streamed frames at the scene frame rate.
+
+    Packets are buffered with their QTM timestamps. On every tick of a timer
+    running at the scene rate the buffers are evaluated at the current time
+    on the QTM clock, minus a delay of a couple of capture frames so that the
+    time falls between two received frames, and the streamers get one pose
+    per marker, body and segment.
+    """
+
+    def __init__(self, marker_streamer, skeleton_streamer, rigid_body_streamer, filters=None, parent=None):
+        super(ScenePlayback, self).__init__(parent)
+
+        self._marker_streamer = marker_streamer
+        self._skeleton_streamer = skeleton_streamer
+        self._rigid_body_streamer = rigid_body_streamer
+        self._filters = filters
+        self._markers = FrameBuffer()
+        self._bodies = FrameBuffer()
+        self._segments = FrameBuffer()
+        self._segment_ids = []
+        self._offset = ClockOffset()
+        self._up_axis = "z"
+        self._unit_conversion = 0.1
+
+        # Seconds the scene trails the newest frame, None for two capture frames.
+        self.delay = None
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+
+    @property
+    def active(self):
+        return self._timer.isActive()
+
+    def start(self):
+        self.clear()
+        self._up_axis = cmds.upAxis(q=True, axis=True)
+        self._timer.start(int(round(1000.0 / scene_rate())))
+
+    def stop(self):
+        self._timer.stop()
+        self.clear()
+
+    def clear(self):
+        self._markers.clear()
+        self._bodies.clear()
+        self._segments.clear()
+        self._offset.reset()
+
+    def push(self, packet):
+        time = packet.timestamp * 1e-6
+        self._offset.update(time)
+
+        markers = get_3d_array(packet)
+
+        if markers is not None:
+            self._marker_streamer.component_info, positions = markers
+
+            if self._filters is not None:
+                positions = self._filters.filter_3d(time, positions)
+
+            self._markers.push(time, positions)
+
+        bodies = get_6d_arrays(packet)
+
+        if bodies is not None:
+            self._rigid_body_streamer.component_info, positions, matrices = bodies
+            rotations = matrices_to_quaternions(matrices)
+
+            if self._filters is not None:
+                positions, rotations = self._filters.filter_6d(time, positions, rotations)
+
+            self._bodies.push(time, positions, rotations)
+
+        segments = get_skeleton_arrays(packet)
+
+        if segments is not None:
+            _, ids, positions, rotations = segments
+            self._segment_ids = ids.tolist()
+            self._segments.push(time, positions, rotations)
+
+    def _tick(self):
+        if self._offset.value is None:
+            return
+
+        if INSTRUMENTATION.enabled:
+            start = clock()
+            self._apply()
+            INSTRUMENTATION.record("playback", clock() - start)
+        else:
+            self._apply()
+
+    def _apply(self):
+        buffers = (self._markers, self._bodies, self._segments)
+        delay = self.delay
+
+        if delay is None:
+            delay = 2 * max(buffer.interval or 0.0 for buffer in buffers)
+
+        time = clock() - self._offset.value - delay
+
+        if len(self._markers):
+            positions, _ = self._sample(self._markers, time)
+            self._marker_streamer.set_positions(positions)
+
+        if len(self._bodies):
+            positions, rotations = self._sample(self._bodies, time)
+            self._rigid_body_streamer.set_poses(positions, rotations)
+
+        if len(self._segments):
+            positions, rotations = self._sample(self._segments, time)
+            self._skeleton_streamer.set_poses(self._segment_ids, positions, rotations)
+
+    def _sample(self, buffer, time):
+        positions, rotations = buffer.sample(time)
+        return MayaUtil.to_maya_axes(positions, rotations, self._up_axis, self._unit_conversion)
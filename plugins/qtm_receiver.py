@@ -0,0 +1,34 @@
+"""Maya plug-in that registers the qtmReceiver node of QTM Connect.
+
+The node is defined in receivernode.py, imported under the same name as the
+dialog imports it so that the plug-in and the dialog share the same frame
+buffer: through the package on Python 2 and as a top level module on
+Python 3, which has no implicit relative imports.
+"""
+
+import os, sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/modules/')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/modules/qualisys_python_sdk')
+
+import maya.api.OpenMaya as om
+
+if sys.version_info[0] >= 3:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+    from receivernode import NODE_ID, NODE_TYPE, ReceiverNode
+else:
+    from qtm_connect_maya.receivernode import NODE_ID, NODE_TYPE, ReceiverNode
+
+
+def maya_useNewAPI():
+    pass
+
+
+def initializePlugin(plugin):
+    om.MFnPlugin(plugin, 'Qualisys', '1.0').registerNode(
+        NODE_TYPE, NODE_ID, ReceiverNode.creator, ReceiverNode.initialize
+    )
+
+
+def uninitializePlugin(plugin):
+    om.MFnPlugin(plugin).deregisterNode(NODE_ID)
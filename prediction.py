@@ -0,0 +1,77 @@
+from collections import OrderedDict
+
+import maya.cmds as cmds
+
+from qtm.arrays import get_6d_arrays, get_skeleton_arrays
+from qtm.predict import ConstantVelocityPredictor, KalmanPredictor
+from qtm.rotation import matrices_to_quaternions
+
+from mayautil import MayaUtil
+from playback import ClockOffset
+
+MODELS = OrderedDict(
+    [("Constant velocity", ConstantVelocityPredictor), ("Kalman", KalmanPredictor)]
+)
+
+
+class PosePrediction(object):
+    """Applies rigid bodies and skeletons where they are predicted to be once
+    the frame shows up in the viewport.
+
+    Each frame is extrapolated by latency, the delay from the cameras to the
+    viewport that cannot be measured from here, plus how much later than the
+    fastest frames this frame arrived.
+    """
+
+    def __init__(self, skeleton_streamer, rigid_body_streamer, filters=None):
+        self._skeleton_streamer = skeleton_streamer
+        self._rigid_body_streamer = rigid_body_streamer
+        self._filters = filters
+        self._offset = ClockOffset()
+        self._up_axis = "z"
+        self._unit_conversion = 0.1
+        self.enabled = False
+        self.latency = 0.03
+        self.set_model(list(MODELS)[0])
+
+    @property
+    def model(self):
+        return self._model
+
+    def set_model(self, name):
+        self._model = name
+        self._bodies = MODELS[name]()
+        self._segments = MODELS[name]()
+        self.reset()
+
+    def reset(self):
+        self._up_axis = cmds.upAxis(q=True, axis=True)
+        self._bodies.reset()
+        self._segments.reset()
+        self._offset.reset()
+
+    def apply_6d(self, packet):
+        time = packet.timestamp * 1e-6
+        lookahead = self.latency + self._offset.update(time)
+        self._rigid_body_streamer.component_info, positions, matrices = get_6d_arrays(packet)
+        rotations = matrices_to_quaternions(matrices)
+
+        if self._filters is not None:
+            positions, rotations = self._filters.filter_6d(time, positions, rotations)
+
+        self._bodies.update(time, positions, rotations)
+        positions, rotations = self._predict(self._bodies, lookahead)
+        self._rigid_body_streamer.set_poses(positions, rotations)
+
+    def apply_skeletons(self, packet):
+        time = packet.timestamp * 1e-6
+        lookahead = self.latency + self._offset.update(time)
+        _, ids, positions, rotations = get_skeleton_arrays(packet)
+
+        self._segments.update(time, positions, rotations)
+        positions, rotations = self._predict(self._segments, lookahead)
+        self._skeleton_streamer.set_poses(ids, positions, rotations)
+
+    def _predict(self, predictor, lookahead):
+        positions, rotations = predictor.predict(lookahead)
+        return MayaUtil.to_maya_axes(positions, rotations, self._up_axis, self._unit_conversion)
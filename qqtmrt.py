@@ -1,61 +1,129 @@
-import json
+import collections
+import functools
 from Qt import QtNetwork
 from Qt import QtCore
 from Qt.QtCore import Signal, Property
 
-import xml2json
 from qtmparser import QtmParser
 
 from qtm.packet import QRTPacketType, QRTPacket, QRTEvent
 from qtm.packet import RTheader, RTEvent
+from qtm.settings import parse_settings
+from qtm.instrumentation import INSTRUMENTATION, clock
 import qtm
 
+
+class ConnectionState(object):
+    Disconnected = 0
+    Connecting = 1
+    Greeting = 2
+    SettingVersion = 3
+    FetchingSettings = 4
+    Connected = 5
+
+
 class QQtmRt(QtCore.QObject):
     connectedChanged = Signal(bool)
     streamingChanged = Signal(bool)
+    settingsChanged = Signal(object)
     packetReceived = Signal(QRTPacket)
     noDataReceived = Signal(QRTPacket)
     eventReceived = Signal(int)
+    connectFailed = Signal(str)
+    errorOccurred = Signal(str)
+
+    # Components requested from QTM during the handshake and available
+    # through the settings property once connected.
+    settings_components = ['3d', '6d', 'skeleton']
+
+    # Events after which QTM may have other labels, bodies or skeletons, the
+    # settings are fetched again when one arrives.
+    settings_events = (
+        QRTEvent.EventConnected,
+        QRTEvent.EventCalibrationStopped,
+        QRTEvent.EventRTfromFileStarted,
+        QRTEvent.EventCameraSettingsChanged,
+    )
 
     def __init__(self, parent=None):
         super(QQtmRt, self).__init__(parent=parent)
 
         self._connected = False
         self._streaming = False
-        self._socket = QtNetwork.QTcpSocket(parent=self)
+        self._state = ConnectionState.Disconnected
+        self._settings = None
+        self._settings_xml = None
+        self._pending = collections.deque()
+        self._timeout = 3000
+        self.requested_version = '1.19'
 
+        self._socket = QtNetwork.QTcpSocket(parent=self)
+        self._socket.connected.connect(self._socket_connected)
         self._socket.disconnected.connect(self._disconnected)
+        self._socket.error.connect(self._socket_error)
+        self._socket.readyRead.connect(self._data_received)
+
+        # A single timer guards every request that expects a reply. It is
+        # restarted when a request is sent and stopped when nothing is pending.
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._timed_out)
 
         self._handlers = {
             QRTPacketType.PacketData: self._on_data,
             QRTPacketType.PacketEvent: self._on_event,
             QRTPacketType.PacketError: self._on_error,
+            QRTPacketType.PacketCommand: self._on_reply,
+            QRTPacketType.PacketXML: self._on_reply,
             QRTPacketType.PacketNoMoreData: self._on_no_data,
         }
 
         self._receiver = qtm.Receiver(self._handlers)
 
-        self.streamingChanged.connect(self._streaming_changed)
-
     def _on_no_data(self, packet):
         self.noDataReceived.emit(packet)
 
     def _on_data(self, packet):
         self.packetReceived.emit(packet)
 
-    def _on_xml(self, packet):
-        self.packetReceived.emit(packet)
+    def _on_reply(self, response):
+        response = response.decode('utf-8')
 
-    def _on_error(self, packet):
-        self.packetReceived.emit(packet)
+        if not self._pending:
+            return
+
+        callback = self._pending.popleft()
+
+        if not self._pending:
+            self._timer.stop()
+
+        callback(response)
+
+    def _on_error(self, response):
+        response = response.decode('utf-8')
+
+        if self._pending:
+            self._fail(response)
+        else:
+            self.packetReceived.emit(response)
 
     def _on_event(self, event):
+        if event in self.settings_events:
+            self.refresh_settings()
+
         self.eventReceived.emit(event)
 
     def _disconnected(self):
+        self._reset()
         self.streaming = False
         self.connected = False
 
+    def _reset(self):
+        self._state = ConnectionState.Disconnected
+        self._pending.clear()
+        self._timer.stop()
+        self._receiver = qtm.Receiver(self._handlers)
+
     def _get_connected(self):
         return self._connected
 
@@ -84,86 +152,118 @@ class QQtmRt(QtCore.QObject):
         bool, _get_streaming, _set_streaming, notify=streamingChanged
     )
 
-    def _handshake(self):
-        response = self._wait_for_reply()
+    @property
+    def connecting(self):
+        return ConnectionState.Disconnected < self._state < ConnectionState.Connected
 
-        if response is not None and response != 'QTM RT Interface connected':
-            return False
+    @property
+    def settings(self):
+        return self._settings
 
-        self.requested_version = '1.19'
-        version = self.set_version(version=self.requested_version)
+    @property
+    def settings_xml(self):
+        """The settings as the XML text they were parsed from."""
+        return self._settings_xml
+
+    def _request(self, command, callback):
+        self._pending.append(callback)
+        self._timer.start(self._timeout)
+        self._send_command(command)
 
-        return version == 'Version set to {}'.format(self.requested_version)
+    def _send_command(self, command, command_type=QRTPacketType.PacketCommand):
+        command = QtmParser.create_command(command, command_type)
+        self._socket.write(command)
 
-    def _wait_for_reply(self, event=False):
-        response = None
-        data = bytes()
+    def _socket_connected(self):
+        # QTM greets every new client before accepting commands.
+        self._state = ConnectionState.Greeting
+        self._pending.append(self._on_greeting)
 
-        if self._socket.waitForReadyRead():
-            while True:
-                data += self._socket.readAll().data()
-                size, type_ = QtmParser.parse_header(data)
+    def _on_greeting(self, response):
+        if response != 'QTM RT Interface connected':
+            self._fail('Unexpected greeting: {}'.format(response))
+            return
 
-                while len(data) < size:
-                    self._socket.waitForReadyRead()
-                    data += self._socket.readAll().data()
+        self._state = ConnectionState.SettingVersion
+        self._request('version {}'.format(self.requested_version), self._on_version)
 
-                response = QtmParser.parse_response(type_, data[RTheader.size : size])
-                data = data[size:]
+    def _on_version(self, response):
+        if response != 'Version set to {}'.format(self.requested_version):
+            self._fail(response)
+            return
 
-                if type_ == QRTPacketType.PacketEvent:
-                    if event:
-                        return response
-                    else:
-                        self.eventReceived.emit(response)
-                else:
-                    return response
+        self._state = ConnectionState.FetchingSettings
+        self._request(
+            'getparameters {}'.format(' '.join(self.settings_components)),
+            self._on_handshake_settings,
+        )
 
-        return response
+    def _on_handshake_settings(self, xml_text):
+        self._settings = parse_settings(xml_text)
+        self._settings_xml = xml_text
+        self._state = ConnectionState.Connected
+        self.connected = True
 
-    def _send_command(self, command, command_type=QRTPacketType.PacketCommand):
-        command = QtmParser.create_command(command, command_type)
-        self._socket.write(command)
+    def _on_settings(self, callback, xml_text):
+        if xml_text != self._settings_xml:
+            self._settings = parse_settings(xml_text)
+            self._settings_xml = xml_text
+            self.settingsChanged.emit(self._settings)
 
-    def _streaming_changed(self, streaming):
-        if streaming:
-            self._socket.readyRead.connect(self._data_received)
-        else:
-            self._socket.readyRead.disconnect(self._data_received)
+        if callback is not None:
+            callback(self._settings)
 
-    def _delayed_stream_stop(self):
-        self.streaming = False
+    def _socket_error(self, error):
+        if self.connecting:
+            self._fail(self._socket.errorString())
 
-    def get_settings(self, *args):
-        if args is ():
-            args = ['all']
+    def _timed_out(self):
+        self._fail('QTM did not respond in time.')
 
-        self._send_command('getparameters {}'.format(' '.join(args)))
+    def _fail(self, message):
+        connecting = self.connecting
 
-        xml_text = self._wait_for_reply()
-        options = lambda: None
-        options.pretty = False
-        json_text = xml2json.xml2json(xml_text, options)
-        settings = json.loads(json_text)
-        settings = settings.pop('QTM_Parameters_Ver_' + self.requested_version)
+        self._reset()
+        self._socket.abort()
 
-        return settings
+        if connecting:
+            self.connectFailed.emit(message)
+        else:
+            self.errorOccurred.emit(message)
 
-    def get_latest_event(self):
-        self._send_command('getstate')
+    def _delayed_stream_stop(self):
+        self.streaming = False
+
+    def refresh_settings(self, callback=None):
+        """Fetch the settings from QTM again. settingsChanged is emitted if
+        they differ from the ones fetched before, then callback is called
+        with the settings. Returns False when not connected."""
+        if not self._connected:
+            return False
 
-        return self._wait_for_reply(event=True)
+        self._request(
+            'getparameters {}'.format(' '.join(self.settings_components)),
+            functools.partial(self._on_settings, callback),
+        )
 
-    def set_version(self, version='1.18'):
-        self._send_command('version {}'.format(version))
+        return True
 
-        return self._wait_for_reply()
+    def request_latest_event(self):
+        """Ask QTM for its latest event, which arrives through eventReceived."""
+        self._send_command('getstate')
 
     def _data_received(self):
-        self._receiver.data_received(self._socket.readAll().data())
+        if INSTRUMENTATION.enabled:
+            start = clock()
+            data = self._socket.readAll().data()
+            INSTRUMENTATION.record('read', clock() - start)
+        else:
+            data = self._socket.readAll().data()
+
+        self._receiver.data_received(data)
 
     def stream(self, *args):
-        if args is ():
+        if args == ():
             args = ['all']
 
         self._send_command('streamframes allframes {}'.format(' '.join(args)))
@@ -176,17 +276,29 @@ class QQtmRt(QtCore.QObject):
         QtCore.QTimer.singleShot(500, self._delayed_stream_stop)
 
     def connect_to_qtm(self, host='127.0.0.1', timeout=3000):
-        if self._connected:
+        """Start connecting to QTM without blocking. connectedChanged is emitted
+        once the handshake and settings fetch have completed, connectFailed if
+        any step fails or takes longer than timeout milliseconds."""
+        if self._state != ConnectionState.Disconnected:
             return False
 
+        self._timeout = timeout
+        self._state = ConnectionState.Connecting
+        self._timer.start(timeout)
         self._socket.connectToHost(host, 22223)
 
-        if self._socket.waitForConnected(timeout):
-            self.connected = self._handshake()
+        return True
 
-        return self.connected
+    def cancel(self):
+        """Abort a connection attempt that is in progress."""
+        if self.connecting:
+            self._fail('Cancelled.')
 
     def disconnect(self):
+        if self.connecting:
+            self.cancel()
+            return
+
         if not self._connected:
             return
 
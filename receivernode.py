@@ -0,0 +1,381 @@
+import os
+
+import numpy as np
+
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+
+from qtm.arrays import get_3d_array, get_6d_arrays, get_skeleton_arrays
+from qtm.packet import QRTComponentType
+from qtm.rotation import matrices_to_quaternions, quaternions_to_euler, quaternions_to_matrices
+
+from mayautil import MayaUtil
+
+PLUGIN_PATH = os.path.dirname(os.path.abspath(__file__)) + "/plugins/qtm_receiver.py"
+
+NODE_TYPE = "qtmReceiver"
+
+# From the range Autodesk keeps for ids that are not registered with them.
+NODE_ID = om.MTypeId(0x0007F3A0)
+
+
+class SharedFrame(object):
+    """Latest frame for the receiver nodes, in Maya units and axes.
+
+    Markers, bodies and segments that are NaN in a new frame keep their
+    previous values.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.sequence = 0
+        self.positions = np.zeros((0, 3))
+        self.matrices = np.zeros((0, 16))
+        self.segment_ids = np.zeros(0, dtype=np.intp)
+        self.translations = np.zeros((0, 3))
+        self.rotations = np.zeros((0, 3))
+
+    def publish(self, positions=None, matrices=None, segment_ids=None, translations=None, rotations=None):
+        """Replace the arrays that are given and advance the sequence number.
+
+        :param positions: (n, 3) marker positions.
+        :param matrices: (n, 16) Maya matrices of the rigid bodies.
+        :param segment_ids: (n,) segment ids, the logical indices of the
+            translations and rotations.
+        :param translations: (n, 3) segment translations.
+        :param rotations: (n, 3) segment rotations, xyz Euler angles in radians.
+        """
+        if positions is not None:
+            self.positions = _hold(self.positions, positions)
+
+        if matrices is not None:
+            self.matrices = _hold(self.matrices, matrices, np.eye(4).ravel())
+
+        if segment_ids is not None:
+            if not np.array_equal(segment_ids, self.segment_ids):
+                self.translations = np.zeros((0, 3))
+                self.rotations = np.zeros((0, 3))
+
+            self.segment_ids = np.asarray(segment_ids, dtype=np.intp)
+            self.translations = _hold(self.translations, translations)
+            self.rotations = _hold(self.rotations, rotations)
+
+        self.sequence += 1
+
+
+def _hold(previous, values, default=0.0):
+    values = np.array(values, dtype=np.float64)
+    missing = np.isnan(values).any(axis=1)
+
+    if missing.any():
+        if previous.shape == values.shape:
+            values[missing] = previous[missing]
+        else:
+            values[missing] = default
+
+    return values
+
+
+FRAME = SharedFrame()
+
+
+def _output_array(attribute):
+    attribute.array = True
+    attribute.usesArrayDataBuilder = True
+    attribute.writable = False
+    attribute.storable = False
+
+
+def _vector_array(name, short_name, unit):
+    unitFn = om.MFnUnitAttribute()
+    children = [unitFn.create(name + axis, short_name + axis.lower(), unit, 0.0) for axis in "XYZ"]
+    numericFn = om.MFnNumericAttribute()
+    attribute = numericFn.create(name, short_name, *children)
+    _output_array(numericFn)
+    return attribute
+
+
+def _set_array(data, attribute, indices, rows, set_element):
+    builder = om.MArrayDataBuilder(data, attribute, len(rows))
+
+    for index, row in zip(indices, rows.tolist()):
+        set_element(builder.addElement(index), row)
+
+    handle = data.outputArrayValue(attribute)
+    handle.set(builder)
+    handle.setAllClean()
+
+
+def _set_vector(element, row):
+    element.set3Double(*row)
+
+
+def _set_matrix(element, row):
+    element.setMMatrix(om.MMatrix(row))
+
+
+class ReceiverNode(om.MPxNode):
+    """Outputs the latest streamed frame as arrays that rigs connect to.
+
+    Bumping frame, once per received frame, is the only write from Python.
+    Everything downstream is pulled by Maya's evaluation from :data:`FRAME`.
+    """
+
+    frame = None
+    positions = None
+    matrices = None
+    translations = None
+    rotations = None
+
+    @staticmethod
+    def creator():
+        return ReceiverNode()
+
+    @staticmethod
+    def initialize():
+        numericFn = om.MFnNumericAttribute()
+        ReceiverNode.frame = numericFn.create("frame", "f", om.MFnNumericData.kInt, 0)
+        numericFn.storable = False
+        numericFn.keyable = False
+
+        ReceiverNode.positions = _vector_array("positions", "p", om.MFnUnitAttribute.kDistance)
+
+        matrixFn = om.MFnMatrixAttribute()
+        ReceiverNode.matrices = matrixFn.create("matrices", "m", om.MFnMatrixAttribute.kDouble)
+        _output_array(matrixFn)
+
+        ReceiverNode.translations = _vector_array("translations", "t", om.MFnUnitAttribute.kDistance)
+        ReceiverNode.rotations = _vector_array("rotations", "r", om.MFnUnitAttribute.kAngle)
+
+        ReceiverNode.addAttribute(ReceiverNode.frame)
+
+        for output in ReceiverNode._outputs():
+            ReceiverNode.addAttribute(output)
+            ReceiverNode.attributeAffects(ReceiverNode.frame, output)
+
+    @staticmethod
+    def _outputs():
+        return (
+            ReceiverNode.positions,
+            ReceiverNode.matrices,
+            ReceiverNode.translations,
+            ReceiverNode.rotations,
+        )
+
+    def compute(self, plug, data):
+        # Every output array is computed as a whole.
+        if plug.isChild:
+            plug = plug.parent()
+
+        if plug.isElement:
+            plug = plug.array()
+
+        attribute = plug.attribute()
+
+        if attribute not in ReceiverNode._outputs():
+            return
+
+        data.inputValue(ReceiverNode.frame)
+
+        if attribute == ReceiverNode.positions:
+            _set_array(data, attribute, range(len(FRAME.positions)), FRAME.positions, _set_vector)
+        elif attribute == ReceiverNode.matrices:
+            _set_array(data, attribute, range(len(FRAME.matrices)), FRAME.matrices, _set_matrix)
+        elif attribute == ReceiverNode.translations:
+            _set_array(data, attribute, FRAME.segment_ids.tolist(), FRAME.translations, _set_vector)
+        else:
+            _set_array(data, attribute, FRAME.segment_ids.tolist(), FRAME.rotations, _set_vector)
+
+        data.setClean(plug)
+
+
+class ReceiverDriver(object):
+    """Feeds streamed frames to a qtmReceiver node instead of writing the
+    transforms of markers, rigid bodies and segments one by one.
+
+    Attaching connects the transforms created by the streamers to the outputs
+    of the node: markers by label index, rigid bodies through a
+    decomposeMatrix node by body index and joints by segment id.
+    """
+
+    def __init__(self, marker_streamer, skeleton_streamer, rigid_body_streamer, filters=None):
+        self._marker_streamer = marker_streamer
+        self._skeleton_streamer = skeleton_streamer
+        self._rigid_body_streamer = rigid_body_streamer
+        self._filters = filters
+        self._node = None
+        self._frame_plug = None
+        self._connections = None
+        self._up_axis = "z"
+        self._unit_conversion = 0.1
+
+    @property
+    def active(self):
+        return self._connections is not None
+
+    def attach(self):
+        """Create the node if there is none and connect the streamed transforms."""
+        if self.active:
+            self.detach()
+
+        if not cmds.pluginInfo(PLUGIN_PATH, q=True, loaded=True):
+            cmds.loadPlugin(PLUGIN_PATH, quiet=True)
+
+        self._up_axis = cmds.upAxis(q=True, axis=True)
+        FRAME.clear()
+
+        existing = cmds.ls(type=NODE_TYPE)
+
+        if existing:
+            node = om.MSelectionList().add(existing[0]).getDependNode(0)
+        else:
+            modifier = om.MDGModifier()
+            node = modifier.createNode(NODE_TYPE)
+            modifier.renameNode(node, NODE_TYPE + "1")
+            modifier.doIt()
+
+        self._node = om.MObjectHandle(node)
+        nodeFn = om.MFnDependencyNode(node)
+        self._frame_plug = nodeFn.findPlug("frame", False)
+
+        # Kept to undo the connections and the decomposeMatrix nodes on detach.
+        self._connections = om.MDGModifier()
+        outputs = dict(
+            (name, nodeFn.findPlug(name, False))
+            for name in ("positions", "matrices", "translations", "rotations")
+        )
+        decompose = {}
+
+        for index in self._rigid_body_streamer.nodes():
+            decompose[index] = self._connections.createNode("decomposeMatrix")
+
+        self._connections.doIt()
+
+        for index, locator in self._marker_streamer.nodes().items():
+            self._connect(outputs["positions"], index, locator, "translate")
+
+        for index, body in self._rigid_body_streamer.nodes().items():
+            decomposeFn = om.MFnDependencyNode(decompose[index])
+            self._connections.connect(
+                outputs["matrices"].elementByLogicalIndex(index),
+                decomposeFn.findPlug("inputMatrix", False),
+            )
+            self._connections.connect(
+                decomposeFn.findPlug("outputTranslate", False),
+                om.MFnDependencyNode(body).findPlug("translate", False),
+            )
+            self._connections.connect(
+                decomposeFn.findPlug("outputRotate", False),
+                om.MFnDependencyNode(body).findPlug("rotate", False),
+            )
+
+        for segment_id, joint in self._skeleton_streamer.nodes().items():
+            self._connect(outputs["translations"], segment_id, joint, "translate")
+            self._connect(outputs["rotations"], segment_id, joint, "rotate")
+
+        self._connections.doIt()
+
+    def _connect(self, output, index, node, attribute):
+        self._connections.connect(
+            output.elementByLogicalIndex(index),
+            om.MFnDependencyNode(node).findPlug(attribute, False),
+        )
+
+    def detach(self):
+        """Disconnect the transforms, which keep their current values, and
+        delete the decomposeMatrix nodes. The receiver node is kept."""
+        if not self.active:
+            return
+
+        if self._node.isValid():
+            self._connections.undoIt()
+
+        self._connections = None
+        self._node = None
+        self._frame_plug = None
+
+        # The streamers have not written the transforms the node drove.
+        for streamer in (self._marker_streamer, self._skeleton_streamer, self._rigid_body_streamer):
+            streamer.invalidate_writes()
+
+    def reset(self):
+        self._up_axis = cmds.upAxis(q=True, axis=True)
+
+    def apply(self, packet):
+        """Publish all components of a packet and notify the node once."""
+        arrays = {}
+
+        if QRTComponentType.Component3d in packet.components:
+            self._marker_streamer.component_info, arrays["positions"] = get_3d_array(packet)
+
+        if QRTComponentType.Component6d in packet.components:
+            self._rigid_body_streamer.component_info, positions, matrices = get_6d_arrays(packet)
+            arrays["body_positions"] = positions
+            arrays["body_rotations"] = matrices_to_quaternions(matrices)
+
+        if QRTComponentType.ComponentSkeleton in packet.components:
+            _, ids, positions, rotations = get_skeleton_arrays(packet)
+            arrays["segment_ids"] = ids
+            arrays["segment_positions"] = positions
+            arrays["segment_rotations"] = rotations
+
+        self.publish(packet.timestamp * 1e-6, **arrays)
+
+    def publish(
+        self,
+        time,
+        positions=None,
+        body_positions=None,
+        body_rotations=None,
+        segment_ids=None,
+        segment_positions=None,
+        segment_rotations=None,
+    ):
+        """Publish a frame of decoded arrays in QTM units and axes, with the
+        rotations as x, y, z, w quaternions, and notify the node once."""
+        if not self._node.isValid():
+            self.detach()
+            return
+
+        frame = {}
+
+        if positions is not None:
+            if self._filters is not None:
+                positions = self._filters.filter_3d(time, positions)
+
+            frame["positions"], _ = MayaUtil.to_maya_axes(
+                positions, None, self._up_axis, self._unit_conversion
+            )
+
+        if body_positions is not None:
+            if self._filters is not None:
+                body_positions, body_rotations = self._filters.filter_6d(
+                    time, body_positions, body_rotations
+                )
+
+            body_positions, body_rotations = MayaUtil.to_maya_axes(
+                body_positions, body_rotations, self._up_axis, self._unit_conversion
+            )
+            frame["matrices"] = _maya_matrices(body_positions, body_rotations)
+
+        if segment_ids is not None:
+            frame["segment_ids"] = segment_ids
+            frame["translations"], rotations = MayaUtil.to_maya_axes(
+                segment_positions, segment_rotations, self._up_axis, self._unit_conversion
+            )
+            frame["rotations"] = quaternions_to_euler(rotations)
+
+        FRAME.publish(**frame)
+        self._frame_plug.setInt(FRAME.sequence)
+
+
+# Maya multiplies row vectors from the left, so the rotation is transposed
+# and the translation is the last row.
+def _maya_matrices(positions, rotations):
+    matrices = np.zeros((len(positions), 4, 4))
+    matrices[:, :3, :3] = quaternions_to_matrices(rotations).transpose(0, 2, 1)
+    matrices[:, 3, :3] = positions
+    matrices[:, 3, 3] = 1.0
+    return matrices.reshape(-1, 16)
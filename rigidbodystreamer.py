@@ -1,24 +1,42 @@
-import hashlib, os
-
-from PySide2 import QtGui
-from PySide2 import QtWidgets
+import os
+from timeit import default_timer
 
 import maya.cmds as cmds
 import maya.api.OpenMaya as om
 from maya.api.OpenMaya import MMatrix, MTransformationMatrix
 
-from mayaui import load_icon
+from componentlist import ComponentItem, ComponentListModel
 from mayautil import MayaUtil
 
+# Without numpy every body is written every frame.
+try:
+    import numpy as np
+    from qtm.arrays import get_6d_arrays
+    from qtm.changes import WriteCache
+    from qtm.rotation import matrices_to_quaternions
+except ImportError:
+    np = None
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__)) + "/assets/"
+
 
 class RigidBodyStreamer:
-    def __init__(self, qtmrt, listWidget):
+    def __init__(self, qtmrt, listView):
         self._qtm = qtmrt
-        self._listWidget = listWidget
+        self._listView = listView
+        self._model = ComponentListModel(listView)
         self._bodies = None
+        self._transform_fns = []
         self._unit_conversion = 0.1
+        self.creation_time = None
+        self.component_info = None
+        # Bodies that moved less than this, in Maya units and quaternion
+        # components, are not written.
+        self._write_cache = WriteCache(epsilon=1e-3) if np is not None else None
 
+        self._listView.setModel(self._model)
         self._qtm.connectedChanged.connect(self._connected_changed)
+        self._qtm.settingsChanged.connect(self._settings_changed)
         self._connected_changed(self._qtm.connected)
 
     def _connected_changed(self, connected):
@@ -29,15 +47,36 @@ class RigidBodyStreamer:
             self._update_ui()
         else:
             self._bodies = None
-            self._listWidget.clear()
+            self._model.clear()
+
+            if self._write_cache is not None:
+                self._write_cache.reset()
+
+    def _settings_changed(self, settings):
+        self._init()
+        self._update_ui()
+
+        if self._write_cache is not None:
+            self._write_cache.reset()
 
     def _packet_received(self, packet):
-        _, bodies = packet.get_6d()
+        if np is not None:
+            self.component_info, positions, matrices = get_6d_arrays(packet)
+            positions, rotations = MayaUtil.to_maya_axes(
+                positions,
+                matrices_to_quaternions(matrices),
+                self._up_axis,
+                self._unit_conversion,
+            )
+            self.set_poses(positions, rotations)
+            return
+
+        self.component_info, bodies = packet.get_6d()
 
         for i, body in enumerate(bodies):
             (body_position, body_rotation) = body
             rot = body_rotation.matrix
-            transformFn = self._bodies[i]["transformFn"]
+            transformFn = self._transform_fns[i]
 
             if self._up_axis == "y":
                 translation = om.MVector(
@@ -95,53 +134,83 @@ class RigidBodyStreamer:
             transformFn.setTransformation(MTransformationMatrix(matrix))
             transformFn.setTranslation(translation, om.MSpace.kTransform)
 
+    def set_poses(self, positions, rotations):
+        """Move the bodies to (n, 3) positions and (n, 4) x, y, z, w
+        quaternions given in Maya units and axes, in body order. Bodies that
+        are not tracked, NaN rows, are held and bodies that did not move are
+        not written."""
+        poses = np.hstack((positions, rotations))
+        rows = self._write_cache.changed(poses, np.flatnonzero(~np.isnan(poses).any(axis=1)))
+
+        for i, pose in zip(rows.tolist(), poses[rows].tolist()):
+            transformFn = self._transform_fns[i]
+            transformFn.setRotation(om.MQuaternion(pose[3:]), om.MSpace.kTransform)
+            transformFn.setTranslation(om.MVector(pose[:3]), om.MSpace.kTransform)
+
+    def write_stats(self):
+        """Bodies written and skipped because they did not move."""
+        return self._write_cache.stats() if self._write_cache is not None else None
+
+    def invalidate_writes(self):
+        """Write every body again, they were written outside of set_poses."""
+        if self._write_cache is not None:
+            self._write_cache.invalidate()
+
+    def nodes(self):
+        """Transforms that exist in the scene by body index."""
+        return dict(
+            (i, transformFn.object())
+            for i, transformFn in enumerate(self._transform_fns)
+            if transformFn is not None and om.MObjectHandle(transformFn.object()).isValid()
+        )
+
     def _init(self):
-        self._qtm_settings = self._qtm.get_settings("6d")
+        self._qtm_settings = self._qtm.settings
 
         if self._qtm_settings == None:
             return
 
-        self._bodies = []
-        bodies = self._qtm_settings["The_6D"].get("Body", [])
-        if type(bodies) != type([]):
-            bodies = [bodies]
-
-        for i, body in enumerate(bodies):
-            body["Index"] = i
-            self._bodies.append(body)
+        self._bodies = list(self._qtm_settings.bodies)
+        self._transform_fns = [None] * len(self._bodies)
 
     def _update_ui(self):
-        self._listWidget.clear()
-
-        for body in self._bodies:
-            icon = load_icon(
-                os.path.dirname(os.path.abspath(__file__)) + "/assets/rigidbody.svg",
-                QtGui.QColor(0x0, 0x0, 0x0),
-            )
-            item = QtWidgets.QListWidgetItem(icon, body["Name"])
-
-            self._listWidget.addItem(item)
+        self._model.update(
+            [
+                ComponentItem(body.index, body.name, ASSET_DIR + "rigidbody.svg", (0, 0, 0))
+                for body in self._bodies or []
+            ]
+        )
 
     def create(self):
         if self._bodies == None:
             return
 
+        start = default_timer()
         modifier = om.MDagModifier()
-
+        point_names = [
+            [body.name + "_" + str(i) for i in range(len(body.points))]
+            for body in self._bodies
+        ]
+        existing = MayaUtil.get_nodes_by_name(
+            [body.name for body in self._bodies]
+            + [name for names in point_names for name in names]
+        )
+        parents = []
+        points = []
+
+        # Every create, rename and reparent is queued and committed at once.
         for body in self._bodies:
-            parent = MayaUtil.get_node_by_name(body["Name"])
+            parent = existing.get(body.name)
 
             if parent is None:
                 parent = modifier.createNode("transform")
 
-                modifier.renameNode(parent, body["Name"])
-                modifier.doIt()
+                modifier.renameNode(parent, body.name)
 
-            transformFn = om.MFnTransform(parent)
+            parents.append(parent)
 
-            for i, point in enumerate(body["Point"]):
-                point_name = body["Name"] + "_" + str(i)
-                locator = MayaUtil.get_node_by_name(point_name)
+            for point_name, point in zip(point_names[body.index], body.points):
+                locator = existing.get(point_name)
 
                 if locator is None:
                     locator = modifier.createNode("locator")
@@ -149,25 +218,36 @@ class RigidBodyStreamer:
                     modifier.renameNode(locator, point_name)
 
                 modifier.reparentNode(locator, parent)
-                modifier.doIt()
-
-                pointTransformFn = om.MFnTransform(locator)
-                translation = None
-
-                if self._up_axis == "y":
-                    translation = om.MVector(
-                        -float(point["X"]) * self._unit_conversion,
-                        float(point["Z"]) * self._unit_conversion,
-                        float(point["Y"]) * self._unit_conversion,
-                    )
-                else:
-                    translation = om.MVector(
-                        float(point["X"]) * self._unit_conversion,
-                        float(point["Y"]) * self._unit_conversion,
-                        float(point["Z"]) * self._unit_conversion,
-                    )
-
-                pointTransformFn.setTranslation(translation, om.MSpace.kTransform)
-            self._bodies[body["Index"]].update(
-                {"transform": parent, "transformFn": transformFn}
+                points.append((locator, point))
+
+        modifier.doIt()
+
+        self._transform_fns = [om.MFnTransform(parent) for parent in parents]
+
+        if self._write_cache is not None:
+            self._write_cache.invalidate()
+
+        for locator, point in points:
+            pointTransformFn = om.MFnTransform(locator)
+
+            if self._up_axis == "y":
+                translation = om.MVector(
+                    -point.x * self._unit_conversion,
+                    point.z * self._unit_conversion,
+                    point.y * self._unit_conversion,
+                )
+            else:
+                translation = om.MVector(
+                    point.x * self._unit_conversion,
+                    point.y * self._unit_conversion,
+                    point.z * self._unit_conversion,
+                )
+
+            pointTransformFn.setTranslation(translation, om.MSpace.kTransform)
+
+        self.creation_time = default_timer() - start
+        om.MGlobal.displayInfo(
+            "QTM Connect: created {} rigid bodies in {:.1f} ms".format(
+                len(self._bodies), self.creation_time * 1000
             )
+        )
@@ -1,26 +1,42 @@
 import os
-
-from PySide2 import QtWidgets
-from PySide2 import QtGui
+from timeit import default_timer
 
 import maya.cmds as cmds
 import maya.api.OpenMaya as om
 
-from mayaui import load_icon
+from componentlist import ComponentItem, ComponentListModel
 from mayautil import MayaUtil
 
+# Without numpy every segment is written every frame.
+try:
+    import numpy as np
+    from qtm.arrays import get_skeleton_arrays
+    from qtm.changes import WriteCache
+except ImportError:
+    np = None
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__)) + "/assets/"
+
 
 class SkeletonStreamer:
-    def __init__(self, qtmrt, listWidget):
+    def __init__(self, qtmrt, listView):
         self._qtm = qtmrt
         self._qtm_settings = None
-        self._listWidget = listWidget
+        self._listView = listView
+        self._model = ComponentListModel(listView)
         self._unit_conversion = 0.1
         self._saved_poses = {}
         self._in_t_pose = []
         self._skeletons = []
+        self._segments = {}
+        self.creation_time = None
+        # Segments that moved less than this, in Maya units and quaternion
+        # components, are not written.
+        self._write_cache = WriteCache(epsilon=1e-3) if np is not None else None
 
+        self._listView.setModel(self._model)
         self._qtm.connectedChanged.connect(self._connected_changed)
+        self._qtm.settingsChanged.connect(self._settings_changed)
         self._connected_changed(self._qtm.connected)
 
     def _connected_changed(self, connected):
@@ -30,9 +46,26 @@ class SkeletonStreamer:
             self._update_ui()
         else:
             self._skeletons = []
-            self._listWidget.clear()
+            self._model.clear()
+
+            if self._write_cache is not None:
+                self._write_cache.reset()
+
+    def _settings_changed(self, settings):
+        self._update_ui()
+
+        if self._write_cache is not None:
+            self._write_cache.reset()
 
     def _packet_received(self, packet):
+        if np is not None:
+            _, ids, positions, rotations = get_skeleton_arrays(packet)
+            positions, rotations = MayaUtil.to_maya_axes(
+                positions, rotations, self._up_axis, self._unit_conversion
+            )
+            self.set_poses(ids, positions, rotations)
+            return
+
         _, skeletons = packet.get_skeletons()
 
         for skeleton in skeletons:
@@ -72,68 +105,81 @@ class SkeletonStreamer:
                     rotation.asEulerRotation(), om.MSpace.kTransform
                 )
 
-    def _update_ui(self):
-        self._listWidget.clear()
+    def set_poses(self, segment_ids, positions, rotations):
+        """Move the segments to (n, 3) positions and (n, 4) x, y, z, w
+        quaternions given in Maya units and axes. Segments that did not move
+        are not written."""
+        poses = np.hstack((positions, rotations))
+        rows = self._write_cache.changed(poses, np.flatnonzero(~np.isnan(poses).any(axis=1)))
+        segment_ids = np.asarray(segment_ids)
+
+        for segment_id, pose in zip(segment_ids[rows].tolist(), poses[rows].tolist()):
+            transformFn = self._segments[segment_id]["transformFn"]
+            transformFn.setTranslation(om.MVector(pose[:3]), om.MSpace.kTransform)
+            transformFn.setRotation(
+                om.MQuaternion(pose[3:]).asEulerRotation(), om.MSpace.kTransform
+            )
 
-        if self._qtm.connected:
-            self._qtm_settings = self._qtm.get_settings("skeleton")
+    def write_stats(self):
+        """Segments written and skipped because they did not move."""
+        return self._write_cache.stats() if self._write_cache is not None else None
 
-        if (
-            self._qtm_settings is None
-            or self._qtm_settings.get("Skeletons", None) is None
-        ):
-            return
+    def nodes(self):
+        """Joints that exist in the scene by segment id."""
+        return dict(
+            (segment_id, segment["MObject"])
+            for segment_id, segment in self._segments.items()
+            if om.MObjectHandle(segment["MObject"]).isValid()
+        )
 
-        self._skeletons = self._qtm_settings["Skeletons"].get("Skeleton", [])
-        if type(self._skeletons) != type([]):
-            self._skeletons = [self._skeletons]
+    def _update_ui(self):
+        if self._qtm.connected:
+            self._qtm_settings = self._qtm.settings
 
-        for skeleton in self._skeletons:
-            color = QtGui.QColor(255, 0, 0)
-            icon = load_icon(
-                os.path.dirname(os.path.abspath(__file__))
-                + "/assets/skeleton_64x64.png",
-                color,
-            )
-            item = QtWidgets.QListWidgetItem(icon, skeleton["@Name"])
+        if self._qtm_settings is None:
+            self._model.clear()
+            return
 
-            self._listWidget.addItem(item)
+        self._skeletons = self._qtm_settings.skeletons
+        self._model.update(
+            [
+                ComponentItem(
+                    skeleton.name,
+                    skeleton.name + (" [T-pose]" if self.is_in_t_pose(skeleton.name) else ""),
+                    ASSET_DIR + "skeleton_64x64.png",
+                    (255, 0, 0),
+                )
+                for skeleton in self._skeletons
+            ]
+        )
 
     def _assume_t_pose(self, segment):
-        transformFn = self._segments[int(segment["@ID"])]["transformFn"]
+        transformFn = self._segments[segment.id]["transformFn"]
+        x, y, z = segment.position
+        r_x, r_y, r_z, r_w = segment.rotation
 
         if self._up_axis == "y":
             translation = om.MVector(
-                -float(segment["Position"]["@X"]) * self._unit_conversion,
-                float(segment["Position"]["@Z"]) * self._unit_conversion,
-                float(segment["Position"]["@Y"]) * self._unit_conversion,
-            )
-            rotation = om.MQuaternion(
-                -float(segment["Rotation"]["@X"]),
-                float(segment["Rotation"]["@Z"]),
-                float(segment["Rotation"]["@Y"]),
-                float(segment["Rotation"]["@W"]),
+                -x * self._unit_conversion,
+                z * self._unit_conversion,
+                y * self._unit_conversion,
             )
+            rotation = om.MQuaternion(-r_x, r_z, r_y, r_w)
         else:
             translation = om.MVector(
-                float(segment["Position"]["@X"]) * self._unit_conversion,
-                float(segment["Position"]["@Y"]) * self._unit_conversion,
-                float(segment["Position"]["@Z"]) * self._unit_conversion,
-            )
-            rotation = om.MQuaternion(
-                float(segment["Rotation"]["@X"]),
-                float(segment["Rotation"]["@Y"]),
-                float(segment["Rotation"]["@Z"]),
-                float(segment["Rotation"]["@W"]),
+                x * self._unit_conversion,
+                y * self._unit_conversion,
+                z * self._unit_conversion,
             )
+            rotation = om.MQuaternion(r_x, r_y, r_z, r_w)
 
         transformFn.setTranslation(translation, om.MSpace.kTransform)
         transformFn.setRotation(rotation.asEulerRotation(), om.MSpace.kTransform)
 
     def _save_pose(self, segment):
-        transformFn = self._segments[int(segment["@ID"])]["transformFn"]
+        transformFn = self._segments[segment.id]["transformFn"]
 
-        self._saved_poses[int(segment["@ID"])] = {
+        self._saved_poses[segment.id] = {
             "translation": transformFn.translation(om.MSpace.kTransform),
             "rotation": transformFn.rotation(om.MSpace.kTransform),
         }
@@ -143,25 +189,28 @@ class SkeletonStreamer:
         self._segments = {}
 
         if self._qtm_settings is None and self._qtm.connected:
-            self._qtm_settings = self._qtm.get_settings("skeleton")
-
-        if (
-            self._qtm_settings is not None
-            and self._qtm_settings.get("Skeletons", None) is not None
-        ):
-            self._skeletons = self._qtm_settings["Skeletons"].get("Skeleton", [])
-
-            if type(self._skeletons) != type([]):
-                self._skeletons = [self._skeletons]
+            self._qtm_settings = self._qtm.settings
+
+        if self._qtm_settings is not None:
+            start = default_timer()
+            self._skeletons = self._qtm_settings.skeletons
+            existing = MayaUtil.get_nodes_by_name(
+                [
+                    skeleton.name + ":" + segment.name
+                    for skeleton in self._skeletons
+                    for segment in skeleton.segments
+                ]
+            )
+            t_pose_segments = []
 
             for skeleton in self._skeletons:
-                if not cmds.namespace( exists=skeleton["@Name"] ):
-                    cmds.namespace( add=skeleton["@Name"] )
+                if not cmds.namespace( exists=skeleton.name ):
+                    cmds.namespace( add=skeleton.name )
                 create = True
 
-                for segment in skeleton["Segment"]:
-                    segment_name = skeleton["@Name"] + ":" + segment["@Name"]
-                    j = MayaUtil.get_node_by_name(segment_name)
+                for segment in skeleton.segments:
+                    segment_name = skeleton.name + ":" + segment.name
+                    j = existing.get(segment_name)
 
                     if j is None:
                         j = modifier.createNode("joint")
@@ -170,51 +219,70 @@ class SkeletonStreamer:
                     else:
                         create = False
 
-                    transformFn = om.MFnTransform(j)
+                    self._segments[segment.id] = {"MObject": j}
 
-                    self._segments[int(segment["@ID"])] = {
-                        "MObject": j,
-                        "transformFn": transformFn,
-                    }
-
-                    if "@Parent_ID" in segment:
+                    if segment.parent_id is not None:
                         modifier.reparentNode(
-                            j, self._segments[int(segment["@Parent_ID"])]["MObject"]
+                            j, self._segments[segment.parent_id]["MObject"]
                         )
 
                     if create:
-                        self._assume_t_pose(segment)
+                        t_pose_segments.append(segment)
 
             modifier.doIt()
 
+            for segment in self._segments.values():
+                segment["transformFn"] = om.MFnTransform(segment["MObject"])
+
+            for segment in t_pose_segments:
+                self._assume_t_pose(segment)
+
+            self.invalidate_writes()
+
+            self.creation_time = default_timer() - start
+            om.MGlobal.displayInfo(
+                "QTM Connect: created {} skeleton segments in {:.1f} ms".format(
+                    len(self._segments), self.creation_time * 1000
+                )
+            )
+
     def t_pose(self, skeleton_name):
         for skeleton_definition in self._skeletons:
-            if skeleton_definition["@Name"] == skeleton_name:
-                for segment in skeleton_definition["Segment"]:
+            if skeleton_definition.name == skeleton_name:
+                for segment in skeleton_definition.segments:
                     self._save_pose(segment)
                     self._assume_t_pose(segment)
 
                 self._in_t_pose.append(skeleton_name)
 
+        self.invalidate_writes()
+
     def resume_pose(self, skeleton_name):
         for skeleton_definition in self._skeletons:
-            if skeleton_definition["@Name"] == skeleton_name:
-                for segment in skeleton_definition["Segment"]:
-                    if int(segment["@ID"]) in self._saved_poses:
-                        transformFn = self._segments[int(segment["@ID"])]["transformFn"]
+            if skeleton_definition.name == skeleton_name:
+                for segment in skeleton_definition.segments:
+                    if segment.id in self._saved_poses:
+                        transformFn = self._segments[segment.id]["transformFn"]
 
                         transformFn.setTranslation(
-                            self._saved_poses[int(segment["@ID"])]["translation"],
+                            self._saved_poses[segment.id]["translation"],
                             om.MSpace.kTransform,
                         )
                         transformFn.setRotation(
-                            self._saved_poses[int(segment["@ID"])]["rotation"],
+                            self._saved_poses[segment.id]["rotation"],
                             om.MSpace.kTransform,
                         )
 
         if skeleton_name in self._in_t_pose:
             self._in_t_pose.remove(skeleton_name)
 
+        self.invalidate_writes()
+
+    def invalidate_writes(self):
+        """Write every segment again, they were written outside of set_poses."""
+        if self._write_cache is not None:
+            self._write_cache.invalidate()
+
     def is_in_t_pose(self, skeleton_name):
         return skeleton_name in self._in_t_pose
 
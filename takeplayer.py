@@ -0,0 +1,267 @@
+import math
+
+import numpy as np
+
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as omanim
+
+from qtm.gaps import fill_gaps, hold_gaps, visible_markers
+from qtm.rotation import matrices_to_quaternions, quaternions_to_euler
+from qtm.takes import Take
+
+from mayautil import MayaUtil
+from playback import scene_rate, timecode_frame, timecode_seconds
+
+# Rotate orders of Maya transforms by the value of their rotateOrder.
+ROTATE_ORDERS = ("xyz", "yzx", "zxy", "xzy", "yxz", "zyx")
+
+TRANSLATE = ("translateX", "translateY", "translateZ")
+ROTATE = ("rotateX", "rotateY", "rotateZ")
+
+
+class TakePlayer(object):
+    """Shows the frame of a recorded take at the current time of the scene,
+    so that the take can be scrubbed with the time slider.
+
+    Takes recorded with timecode are placed at their timecode, through the
+    production start time code of the scene, otherwise time 0 shows the
+    first frame of the take. The frames are applied to the markers, rigid
+    bodies and skeletons the dialog has created, which must come from the
+    settings the take was recorded with.
+    """
+
+    def __init__(self, path, marker_streamer, skeleton_streamer, rigid_body_streamer):
+        self._take = Take(path)
+        self._marker_streamer = marker_streamer
+        self._skeleton_streamer = skeleton_streamer
+        self._rigid_body_streamer = rigid_body_streamer
+        self._callback = None
+        self._timecodes = None
+        self._up_axis = "z"
+        self._unit_conversion = 0.1
+
+    @property
+    def take(self):
+        return self._take
+
+    def start(self):
+        """Set the playback range to the take and follow the current time."""
+        if not len(self._take):
+            cmds.warning("The take has no frames.")
+            return
+
+        self._up_axis = cmds.upAxis(q=True, axis=True)
+        frames = self.frames()
+        cmds.playbackOptions(minTime=math.floor(frames[0]), maxTime=math.ceil(frames[-1]))
+
+        self._callback = om.MEventMessage.addEventCallback("timeChanged", self._time_changed)
+        self._time_changed()
+
+    def stop(self):
+        if self._callback is not None:
+            om.MMessage.removeCallback(self._callback)
+            self._callback = None
+
+        self._take.close()
+
+    @property
+    def has_timecode(self):
+        if self._timecodes is None:
+            self._timecodes = (
+                self._take.column("timecode") if "timecode" in self._take.columns else np.empty(0)
+            )
+
+        return len(self._timecodes) > 0 and bool(np.isfinite(self._timecodes).all())
+
+    def frames(self):
+        """Scene frame of every frame of the take."""
+        if self.has_timecode:
+            return timecode_frame(self._timecodes)
+
+        timestamps = self._take.timestamps
+        return (timestamps - timestamps[0]) * 1e-6 * scene_rate()
+
+    def index_at(self, frame):
+        """Index of the frame of the take shown at a scene frame."""
+        if self.has_timecode:
+            return self._take.index_at_timecode(timecode_seconds(frame))
+
+        return self._take.index_at(frame / scene_rate())
+
+    def _time_changed(self, *args):
+        self.show(self.index_at(omanim.MAnimControl.currentTime().asUnits(om.MTime.uiUnit())))
+
+    def bake(self):
+        """Key every frame of the take on the markers, rigid bodies and
+        joints at the scene time of the frame, which falls between scene
+        frames when the take was captured at a higher rate.
+
+        The keys are the values of the take, not of the scene, and every
+        curve gets all of its keys at once. Markers, bodies and segments
+        that are not seen are held where they were last seen, unless the gap
+        policy of the markers interpolates their gaps or keys their
+        visibility."""
+        if not len(self._take):
+            return
+
+        self._up_axis = cmds.upAxis(q=True, axis=True)
+        unit = om.MTime.uiUnit()
+        times = [om.MTime(frame, unit) for frame in self.frames().tolist()]
+        columns = self._take.columns
+
+        if "positions" in columns:
+            nodes = self._marker_streamer.nodes()
+
+            if nodes:
+                positions = self._take.column("positions")
+                policy = self._marker_streamer.gap_policy
+
+                if policy == "Interpolate on bake":
+                    positions = fill_gaps(positions)
+                elif policy == "Hide":
+                    self._key_visibility(nodes, times, visible_markers(positions))
+
+                positions, _ = self._to_maya_axes(positions, None)
+                self._key(nodes, times, hold_gaps(positions))
+
+        if "body_positions" in columns:
+            nodes = self._rigid_body_streamer.nodes()
+
+            if nodes:
+                positions, rotations = self._to_maya_axes(
+                    self._take.column("body_positions"),
+                    matrices_to_quaternions(self._take.column("body_rotations")),
+                )
+                self._key(nodes, times, hold_gaps(positions), hold_gaps(rotations))
+
+        if "segment_positions" in columns:
+            segment_columns = dict(
+                (segment_id, column)
+                for column, segment_id in enumerate(self._take.segment_ids.tolist())
+            )
+            nodes = dict(
+                (segment_columns[segment_id], node)
+                for segment_id, node in self._skeleton_streamer.nodes().items()
+                if segment_id in segment_columns
+            )
+
+            if nodes:
+                positions, rotations = self._to_maya_axes(
+                    self._take.column("segment_positions"),
+                    self._take.column("segment_rotations"),
+                )
+                self._key(nodes, times, hold_gaps(positions), hold_gaps(rotations))
+
+    def _to_maya_axes(self, positions, rotations):
+        """MayaUtil.to_maya_axes for (frames, n, 3) positions and
+        (frames, n, 4) rotations."""
+        shape = positions.shape[:-1]
+        positions, rotations = MayaUtil.to_maya_axes(
+            positions.reshape(-1, 3),
+            rotations.reshape(-1, 4) if rotations is not None else None,
+            self._up_axis,
+            self._unit_conversion,
+        )
+
+        return (
+            positions.reshape(shape + (3,)),
+            rotations.reshape(shape + (4,)) if rotations is not None else None,
+        )
+
+    def _key(self, nodes, times, positions, rotations=None):
+        """Key the translation, and the rotation when rotations are given, of
+        nodes by column of (frames, columns, 3) positions and (frames,
+        columns, 4) quaternions. Frames with NaN are not keyed."""
+        for column, node in nodes.items():
+            nodeFn = om.MFnDependencyNode(node)
+            self._key_curves(nodeFn, TRANSLATE, times, positions[:, column])
+
+            if rotations is None:
+                continue
+
+            order = ROTATE_ORDERS[nodeFn.findPlug("rotateOrder", False).asInt()]
+            angles = quaternions_to_euler(rotations[:, column], order)
+
+            # Angles that wrap around would spin the node when interpolated.
+            seen = ~np.isnan(angles).any(axis=1)
+            angles[seen] = np.unwrap(angles[seen], axis=0)
+
+            self._key_curves(nodeFn, ROTATE, times, angles)
+
+    def _key_visibility(self, nodes, times, visible):
+        """Key the visibility of nodes by column of (frames, columns) visible,
+        on the first frame and where it changes."""
+        changes = np.ones(visible.shape, dtype=bool)
+        changes[1:] = visible[1:] != visible[:-1]
+
+        for column, node in nodes.items():
+            rows = np.flatnonzero(changes[:, column])
+            self._key_curves(
+                om.MFnDependencyNode(node),
+                ("visibility",),
+                [times[row] for row in rows.tolist()],
+                visible[rows, column, np.newaxis].astype(np.float64),
+                omanim.MFnAnimCurve.kTangentStep,
+            )
+
+    def _key_curves(
+        self, nodeFn, attributes, times, values, tangent=omanim.MFnAnimCurve.kTangentGlobal
+    ):
+        """Replace the keys of the curves of attributes with the columns of
+        (frames, attributes) values, in internal units."""
+        rows = np.flatnonzero(~np.isnan(values).any(axis=1))
+
+        if not len(rows):
+            return
+
+        key_times = om.MTimeArray([times[row] for row in rows.tolist()])
+        values = values[rows]
+
+        for i, attribute in enumerate(attributes):
+            plug = nodeFn.findPlug(attribute, False)
+            curves = omanim.MAnimUtil.findAnimation(plug)
+            curveFn = omanim.MFnAnimCurve()
+
+            if len(curves):
+                curveFn.setObject(curves[0])
+            else:
+                curveFn.create(plug)
+
+            curveFn.addKeys(
+                key_times,
+                om.MDoubleArray(values[:, i].tolist()),
+                tangent,
+                tangent,
+                keepExistingKeys=False,
+            )
+
+    def show(self, index):
+        frame = self._take.frame(index)
+
+        if "positions" in frame:
+            positions, _ = MayaUtil.to_maya_axes(
+                frame["positions"], None, self._up_axis, self._unit_conversion
+            )
+            self._marker_streamer.set_positions(positions)
+
+        if "body_positions" in frame:
+            self._rigid_body_streamer.set_poses(
+                *MayaUtil.to_maya_axes(
+                    frame["body_positions"],
+                    matrices_to_quaternions(frame["body_rotations"]),
+                    self._up_axis,
+                    self._unit_conversion,
+                )
+            )
+
+        if "segment_positions" in frame:
+            self._skeleton_streamer.set_poses(
+                self._take.segment_ids,
+                *MayaUtil.to_maya_axes(
+                    frame["segment_positions"],
+                    frame["segment_rotations"],
+                    self._up_axis,
+                    self._unit_conversion,
+                )
+            )